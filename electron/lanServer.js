@@ -10,6 +10,8 @@
 //   7. [FIX C2] License salt desde variable de entorno (prepara migración JWT)
 //   8. [FIX M5] Verificación real de _licenseActive
 //   9. [FIX M6] Normalización de nombres de producto (tildes/acentos)
+//  10. Sync condicional: ETag / If-None-Match (304) y /since?delta=1 (solo filas cambiadas).
+//      Opcional: los clientes que no lo piden reciben la respuesta v3.0 de siempre.
 
 import http from 'http';
 import crypto from 'crypto';
@@ -33,6 +35,10 @@ let lastUpdateTimestamp = Date.now();
 let connectedClients = []; // SSE streams activos
 let mainWindowRef = null;
 let _processedUpdateIds = new Set(); // Deduplicación
+let productMarks = new Map();        // id -> timestamp del último cambio de esa fila
+let deletedProducts = [];            // [{ ts, id }] productos retirados del catálogo
+let deletedPrunedUntil = 0;          // Deltas anteriores a esto ya no son confiables
+const MAX_DELETED = 5000;
 
 // [FIX C1] 🔑 LAN SHARED TOKEN — Se genera al iniciar el servidor.
 // Las cajas secundarias lo reciben durante el handshake inicial (/api/ping)
@@ -60,14 +66,35 @@ export function getLanToken() {
     return _lanSharedToken;
 }
 
-function sendJSON(res, statusCode, data) {
+function sendJSON(res, statusCode, data, extraHeaders = {}) {
     res.writeHead(statusCode, {
         'Content-Type': 'application/json',
         'Access-Control-Allow-Origin': '*',
         'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-        'Access-Control-Allow-Headers': 'Content-Type, Authorization',
+        'Access-Control-Allow-Headers': 'Content-Type, Authorization, If-None-Match',
+        'Access-Control-Expose-Headers': 'ETag',
+        ...extraHeaders,
     });
-    res.end(JSON.stringify(data));
+    res.end(statusCode === 304 ? undefined : JSON.stringify(data));
+}
+
+// Estrictamente creciente: dos cambios en el mismo ms no comparten timestamp
+function nextTimestamp() {
+    lastUpdateTimestamp = Math.max(Date.now(), lastUpdateTimestamp + 1);
+    return lastUpdateTimestamp;
+}
+
+function currentETag() {
+    return `W/"${lastUpdateTimestamp}"`;
+}
+
+/** Filas cambiadas y retiradas después de `since` (null si el historial ya no alcanza). */
+function changesSince(since) {
+    if (since < deletedPrunedUntil) return null;
+    return {
+        cambios: productCache.filter(p => (productMarks.get(p.id) || 0) > since),
+        eliminados: deletedProducts.filter(d => d.ts > since).map(d => d.id),
+    };
 }
 
 /** Parsear body con límite de tamaño */
@@ -114,10 +141,27 @@ function normalizeName(name) {
 // ═══════════════════════════════════════════════════════════
 
 export function updateProductCache(products, categories, config) {
+    const ts = nextTimestamp();
+    // Marcar solo las filas que cambiaron (para /since?delta=1)
+    const previous = new Map(productCache.map(p => [p.id, JSON.stringify(p)]));
     productCache = products || [];
+    const currentIds = new Set();
+    for (const p of productCache) {
+        currentIds.add(p.id);
+        if (previous.get(p.id) !== JSON.stringify(p)) productMarks.set(p.id, ts);
+    }
+    for (const id of previous.keys()) {
+        if (!currentIds.has(id)) {
+            productMarks.delete(id);
+            deletedProducts.push({ ts, id });
+        }
+    }
+    if (deletedProducts.length > MAX_DELETED) {
+        const dropped = deletedProducts.splice(0, deletedProducts.length - MAX_DELETED);
+        deletedPrunedUntil = dropped[dropped.length - 1].ts;
+    }
     categoriesCache = categories || [];
     configCache = config || {};
-    lastUpdateTimestamp = Date.now();
 
     broadcastToClients({
         type: 'PRODUCTS_UPDATED',
@@ -145,6 +189,7 @@ function broadcastToClients(data) {
 export function processStockUpdate(updates, cajaId = 'unknown') {
     const results = [];
     const stockAlerts = [];
+    const ts = nextTimestamp();
 
     for (const update of updates) {
         // 🛡️ DEDUPLICACIÓN: generar key único por update
@@ -171,6 +216,7 @@ export function processStockUpdate(updates, cajaId = 'unknown') {
             const oldStock = product.stock || 0;
             // 🛡️ OPERACIÓN COMMUTATIVA: aplicar delta, NO valor absoluto
             product.stock = (oldStock) + (update.delta || 0);
+            productMarks.set(product.id, ts);
 
             results.push({
                 nombre: product.nombre,
@@ -192,8 +238,6 @@ export function processStockUpdate(updates, cajaId = 'unknown') {
         }
     }
 
-    lastUpdateTimestamp = Date.now();
-
     // Notificar al renderer (actualizar Dexie del PC1)
     if (mainWindowRef && !mainWindowRef.isDestroyed()) {
         mainWindowRef.webContents.send('lan-stock-update', updates);
@@ -235,7 +279,7 @@ export function startLanServer(mainWindow) {
             res.writeHead(204, {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, Authorization',
+                'Access-Control-Allow-Headers': 'Content-Type, Authorization, If-None-Match',
             });
             res.end();
             return;
@@ -272,6 +316,14 @@ export function startLanServer(mainWindow) {
             return;
         }
 
+        // Sync condicional: nada cambió desde el ETag que trae el cliente
+        const etag = currentETag();
+        const isCatalogRoute = (path === '/api/products' || path === '/api/products/since') && req.method === 'GET';
+        if (isCatalogRoute && req.headers['if-none-match'] === etag) {
+            sendJSON(res, 304, null, { ETag: etag });
+            return;
+        }
+
         // Catálogo completo
         if (path === '/api/products' && req.method === 'GET') {
             sendJSON(res, 200, {
@@ -284,22 +336,33 @@ export function startLanServer(mainWindow) {
                 },
                 timestamp: lastUpdateTimestamp,
                 total: productCache.length,
-            });
+            }, { ETag: etag });
             return;
         }
 
         // Delta sync
         if (path === '/api/products/since' && req.method === 'GET') {
             const since = parseInt(url.searchParams.get('t') || '0');
-            if (lastUpdateTimestamp > since) {
+            const delta = since > 0 && url.searchParams.get('delta') === '1' ? changesSince(since) : null;
+            if (lastUpdateTimestamp <= since) {
+                sendJSON(res, 200, { hasChanges: false, timestamp: lastUpdateTimestamp }, { ETag: etag });
+            } else if (delta) {
+                // Solo las filas tocadas desde `since` viajan por la red
                 sendJSON(res, 200, {
                     hasChanges: true,
-                    productos: productCache,
+                    cambios: delta.cambios,
+                    eliminados: delta.eliminados,
                     categorias: categoriesCache,
                     timestamp: lastUpdateTimestamp,
-                });
+                    total: productCache.length,
+                }, { ETag: etag });
             } else {
-                sendJSON(res, 200, { hasChanges: false, timestamp: lastUpdateTimestamp });
+                sendJSON(res, 200, {
+                    hasChanges: true,
+                    productos: productCache,
+                    categorias: categoriesCache,
+                    timestamp: lastUpdateTimestamp,
+                }, { ETag: etag });
             }
             return;
         }
@@ -51,13 +51,14 @@ def simulate_abono_logic(input_monto, tasa, currency_code, method_name):
     
     return render_amount
 
-# Ejecutar Test Case del Usuario
-# Venta de 5000 Bs a tasa 200
-result = simulate_abono_logic(5000, 200, 'VES', 'Punto de Venta')
+if __name__ == "__main__":
+    # Ejecutar Test Case del Usuario
+    # Venta de 5000 Bs a tasa 200
+    result = simulate_abono_logic(5000, 200, 'VES', 'Punto de Venta')
 
-if result == 5000:
-    print("\n✅ PASÓ: El sistema mostrará 'Bs 5,000.00'")
-elif result == 25:
-    print("\n❌ FALLÓ: El sistema mostrará 'Bs 25.00' (Bug persistente)")
-else:
-    print(f"\n⚠️ RESULTADO INESPERADO: {result}")
+    if result == 5000:
+        print("\n✅ PASÓ: El sistema mostrará 'Bs 5,000.00'")
+    elif result == 25:
+        print("\n❌ FALLÓ: El sistema mostrará 'Bs 25.00' (Bug persistente)")
+    else:
+        print(f"\n⚠️ RESULTADO INESPERADO: {result}")
@@ -1,17 +1,27 @@
 import json
-from decimal import Decimal
+import os
+import sys
+import tempfile
+from dinero import Dinero, centavos
+from lector_capsula import iterar_tabla, iterar_tablas
 
 # DIRECTIVA: TEST-FIN-001
 # Script de Regresión para Lógica de Tesorería
 
 def d(val):
-    return Decimal(str(val)) if val is not None else Decimal(0)
+    return Dinero.de(val)
 
 class TreasuryEngine:
-    def __init__(self):
-        self.recaudado = d(0)
-        self.ventas_brutas = d(0)
-        self.breakdown = {}
+    def __init__(self, corte_id=None):
+        # corte_id=None audita la sesion abierta; un ID audita ese Corte Z
+        self.corte_id = corte_id
+        # Acumuladores en centavos enteros (ver dinero.py); se exponen como Dinero
+        self._recaudado = 0
+        self._brutas = 0
+        self._breakdown = {}
+        # Marca de agua para auditoria incremental (++id de Dexie)
+        self.ultimo_id = 0
+        self.ultima_fecha = None
 
     def procesar_transaccion(self, tx):
         tipo = tx.get('tipo', 'VENTA')
@@ -24,25 +34,25 @@ class TreasuryEngine:
         
         # IMPORTANTE: La UI filtra por 'corteId'. 
         # Si corteId tiene valor (y no es el actual que estamos cerrando), se ignora.
-        # Aquí asumimos que estamos auditando una sesión abierta, así que corteId debe ser None/Undefined.
-        if corte_id:
-            # Si tiene corteId, ya fue cerrada.
+        # Por defecto auditamos la sesión abierta, así que corteId debe ser None/Undefined.
+        if (corte_id or None) != self.corte_id:
+            # Pertenece a otro corte (o a la sesión abierta si auditamos un corte).
             return
 
-        total = d(tx.get('total', 0))
+        total = centavos(tx.get('total', 0))
         es_credito = tx.get('esCredito', False)
-        deuda = d(tx.get('deudaPendiente', 0))
+        deuda = centavos(tx.get('deudaPendiente', 0))
 
         # --- LÓGICA DE VENTAS BRUTAS (FISCAL) ---
         # Solo sumamos si es una Venta real (no un Cobro de Deuda)
         if tipo != 'COBRO_DEUDA':
-            self.ventas_brutas += total
+            self._brutas += total
 
         # --- LÓGICA DE RECAUDADO (CAJA) ---
         
         # CASO 1: COBRO DE DEUDA (Abono independiente)
         if tipo == 'COBRO_DEUDA':
-            self.recaudado += total
+            self._recaudado += total
             self._add_breakdown('Abonos (Deuda)', total)
             return
 
@@ -51,8 +61,8 @@ class TreasuryEngine:
             # Lógica corregida 20/01/26: Priorizar 'Pagado Real' sobre flag de crédito
             pagado_implicito = total - deuda
             
-            if pagado_implicito > d('0.01'):
-                self.recaudado += pagado_implicito
+            if pagado_implicito > 1:
+                self._recaudado += pagado_implicito
                 self._add_breakdown('Efectivo (Implícito)', pagado_implicito)
             
             # El resto es crédito (no entra a caja)
@@ -61,21 +71,194 @@ class TreasuryEngine:
         # CASO 3: VENTA CONTADO (Standard)
         # Aquí idealmente sumaríamos los pagos explícitos, pero el fallback es 'Total'
         # Si hay pagos, usarlos (TODO: Expandir lógica si es necesario)
-        self.recaudado += total
+        self._recaudado += total
         self._add_breakdown('Efectivo (Venta)', total)
 
     def _add_breakdown(self, key, amount):
-        if key not in self.breakdown:
-            self.breakdown[key] = d(0)
-        self.breakdown[key] += amount
+        self._breakdown[key] = self._breakdown.get(key, 0) + amount
+
+    @property
+    def recaudado(self):
+        return Dinero(self._recaudado)
+
+    @property
+    def ventas_brutas(self):
+        return Dinero(self._brutas)
+
+    @property
+    def breakdown(self):
+        return {k: Dinero(v) for k, v in self._breakdown.items()}
 
     def reporte(self):
         return {
-            "recaudado": float(self.recaudado),
-            "ventas_brutas": float(self.ventas_brutas),
-            "detalles": {k: float(v) for k, v in self.breakdown.items()}
+            "recaudado": self._recaudado / 100,
+            "ventas_brutas": self._brutas / 100,
+            "detalles": {k: v / 100 for k, v in self._breakdown.items()}
+        }
+
+    def to_checkpoint(self):
+        # Montos como texto decimal ('90.00'): mismo formato que los checkpoints Decimal anteriores
+        return {
+            "corte_id": self.corte_id,
+            "recaudado": str(self.recaudado),
+            "ventas_brutas": str(self.ventas_brutas),
+            "breakdown": {k: str(v) for k, v in self.breakdown.items()},
+            "ultimo_id": self.ultimo_id,
+            "ultima_fecha": self.ultima_fecha
         }
 
+    @classmethod
+    def desde_checkpoint(cls, data):
+        engine = cls(corte_id=data.get("corte_id"))
+        engine._recaudado = centavos(data["recaudado"])
+        engine._brutas = centavos(data["ventas_brutas"])
+        engine._breakdown = {k: centavos(v) for k, v in data.get("breakdown", {}).items()}
+        engine.ultimo_id = data.get("ultimo_id", 0)
+        engine.ultima_fecha = data.get("ultima_fecha")
+        return engine
+
+# --- AUDITORIA DE RESPALDO REAL (STREAMING) ---
+
+def auditar_respaldo(ruta):
+    """
+    Alimenta el motor con cada venta de dexie.ventas a medida que se lee
+    la Capsula de Tiempo. La memoria no crece con el tamaño del respaldo.
+    """
+    engine = TreasuryEngine()
+    for venta in iterar_tabla(ruta, 'ventas'):
+        engine.procesar_transaccion(venta)
+    return engine
+
+# --- AUDITORIA INCREMENTAL (CHECKPOINTS) ---
+
+CHECKPOINT_DEFAULT = os.path.join('.tmp', 'treasury_checkpoint.json')
+
+def cargar_checkpoint(ruta):
+    if not os.path.exists(ruta):
+        return TreasuryEngine()
+    with open(ruta, encoding='utf-8') as f:
+        data = json.load(f)
+    if not data.get("sellado"):
+        # Checkpoint anterior: acumulaba tambien el turno abierto; se recalcula de cero
+        return TreasuryEngine(corte_id=data.get("corte_id"))
+    return TreasuryEngine.desde_checkpoint(data)
+
+def guardar_checkpoint(engine, ruta):
+    # Escritura atomica: un corte de luz no deja el checkpoint a medias
+    os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+    tmp = ruta + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({**engine.to_checkpoint(), "sellado": True}, f, indent=2)
+    os.replace(tmp, ruta)
+
+def _sellada(tx):
+    # cerrarCaja solo pone corteId a las COMPLETADA: una ANULADA sin corteId ya es definitiva
+    return bool(tx.get('corteId')) or tx.get('status') == 'ANULADA'
+
+def auditar_incremental(ventas, ruta_checkpoint=CHECKPOINT_DEFAULT):
+    """
+    Marca de agua ++id en dos capas (como rollups_ventas.py):
+    - sellada: ventas con corteId (o anuladas) antes de la primera venta del
+      turno abierto. Se guardan en el checkpoint y no se vuelven a leer.
+    - volatil: desde la primera venta sin corteId, todo se recalcula en cada
+      corrida (anularVenta cambia el status en sitio; cerrarCaja pone corteId).
+    Devuelve (motor con ambas capas, ventas selladas nuevas, ventas volatiles).
+    """
+    sellado = cargar_checkpoint(ruta_checkpoint)
+    desde = sellado.ultimo_id
+    engine = None
+    nuevas = volatiles = 0
+    for tx in ventas:
+        tx_id = tx.get('id')
+        es_int = isinstance(tx_id, int) and not isinstance(tx_id, bool)
+        if engine is None and es_int and _sellada(tx):
+            if tx_id <= desde:
+                continue
+            sellado.procesar_transaccion(tx)
+            sellado.ultimo_id = tx_id
+            sellado.ultima_fecha = tx.get('fecha')
+            nuevas += 1
+            continue
+        if engine is None:
+            # Primera venta del turno abierto: lo sellado hasta aqui queda fijo
+            engine = TreasuryEngine.desde_checkpoint(sellado.to_checkpoint())
+        engine.procesar_transaccion(tx)
+        volatiles += 1
+    guardar_checkpoint(sellado, ruta_checkpoint)
+    if engine is None:
+        engine = TreasuryEngine.desde_checkpoint(sellado.to_checkpoint())
+    return engine, nuevas, volatiles
+
+# --- AUDITORIA POR CORTE Z (UNA SOLA PASADA) ---
+
+TOLERANCIA = d('0.01')
+
+def auditar_por_corte(ventas):
+    """
+    Reparte cada venta al motor de su corteId en una sola pasada.
+    La clave None agrupa la sesion abierta (ventas sin corteId).
+    """
+    motores = {}
+    for tx in ventas:
+        clave = tx.get('corteId') or None
+        motor = motores.get(clave)
+        if motor is None:
+            motor = motores[clave] = TreasuryEngine(corte_id=clave)
+        motor.procesar_transaccion(tx)
+    return motores
+
+def conciliar_cortes(motores, cortes):
+    """
+    Compara cada motor contra su registro en la tabla 'cortes'.
+    Las ventas se marcan con report.corteRef; el registro guarda id 'Z-<ts>' y corteRef.
+    """
+    por_ref = {}
+    for corte in cortes:
+        por_ref[corte.get('corteRef') or corte.get('id')] = corte
+
+    resultados = []
+    for clave in sorted(motores, key=lambda k: (k is not None, str(k))):
+        if clave is None:
+            continue  # Sesion abierta: aun no tiene Corte Z
+        rep = motores[clave].reporte()
+        corte = por_ref.pop(clave, None)
+        fila = {"corteId": clave, **rep, "estado": "OK", "diferencias": {}}
+
+        if corte is None:
+            fila["estado"] = "SIN_REGISTRO"
+        else:
+            metodos = corte.get('metodosPago') or []
+            guardado = {
+                "ventas_brutas": corte.get('totalVentas'),
+                "recaudado": sum(m.get('value', 0) for m in metodos if m.get('name') != 'Crédito') if metodos else None
+            }
+            for campo, valor in guardado.items():
+                if valor is None:
+                    continue
+                delta = getattr(motores[clave], campo) - d(valor)
+                if abs(delta) > TOLERANCIA:
+                    fila["diferencias"][campo] = float(delta)
+            if fila["diferencias"]:
+                fila["estado"] = "DESCUADRE"
+        resultados.append(fila)
+
+    # Cortes registrados sin ninguna venta asociada
+    for ref in sorted(por_ref, key=str):
+        resultados.append({"corteId": ref, "estado": "SIN_VENTAS", "diferencias": {}})
+    return resultados
+
+def auditar_cortes_respaldo(ruta):
+    """Audita todos los Cortes Z historicos de un respaldo en una pasada de streaming."""
+    cortes = []
+    def ventas():
+        for tabla, registro in iterar_tablas(ruta, ('ventas', 'cortes')):
+            if tabla == 'ventas':
+                yield registro
+            else:
+                cortes.append(registro)
+    motores = auditar_por_corte(ventas())
+    return motores, conciliar_cortes(motores, cortes)
+
 # --- EJECUCIÓN DE PRUEBAS ---
 
 def run_tests():
@@ -116,6 +299,33 @@ def run_tests():
     # 20 + 50 + 100 = $170 (El abono no suma a bruto, la venta cerrada tampoco)
     assert res['ventas_brutas'] == 170.0, f"FALLO BRUTO: Esperado 170.0, Obtenido {res['ventas_brutas']}"
 
+    # Auditoría por corte: la venta cerrada (Caso 5) cae en su propio motor
+    motores = auditar_por_corte(scenarios)
+    assert motores[None].reporte() == res, "FALLO PARTICION: Sesion abierta difiere"
+    assert motores[999].reporte()['ventas_brutas'] == 500.0, "FALLO PARTICION: Corte 999"
+
+    # Checkpoint: recargar el estado no altera los totales
+    clon = TreasuryEngine.desde_checkpoint(json.loads(json.dumps(engine.to_checkpoint())))
+    assert clon.reporte() == res, "FALLO CHECKPOINT: Estado restaurado difiere"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta_cp = os.path.join(tmp, 'checkpoint.json')
+        cerradas = [{"id": 1, "total": 7, "corteId": "Z-1"}, {"id": 2, "total": 3, "corteId": "Z-1"}]
+        abiertas = [{"id": 3, "total": 20}, {"id": 4, "total": 5}]
+        engine, nuevas, volatiles = auditar_incremental(cerradas + abiertas, ruta_cp)
+        assert (engine.reporte()['recaudado'], nuevas, volatiles) == (25.0, 2, 2)
+
+        # Anulada despues del checkpoint: deja de contar (y ya es definitiva: se sella)
+        abiertas[0] = dict(abiertas[0], status='ANULADA')
+        engine, nuevas, volatiles = auditar_incremental(cerradas + abiertas, ruta_cp)
+        assert (engine.reporte()['recaudado'], nuevas, volatiles) == (5.0, 1, 1), "FALLO ANULACION TRAS CHECKPOINT"
+
+        # Corte Z: el turno se sella y el siguiente arranca de cero, sin borrar el checkpoint
+        selladas = [dict(v, corteId='Z-2') if v.get('status') != 'ANULADA' else v for v in abiertas]
+        engine, nuevas, volatiles = auditar_incremental(cerradas + selladas + [{"id": 5, "total": 1}], ruta_cp)
+        assert (engine.reporte()['recaudado'], nuevas, volatiles) == (1.0, 1, 1), "FALLO CORTE Z"
+        assert engine.ultimo_id == 4 and cargar_checkpoint(ruta_cp).reporte()['recaudado'] == 0
+
     print("\n[OK] PRUEBAS EXITOSAS")
     print("-" * 20)
     print(f"Total Recaudado: ${res['recaudado']}")
@@ -123,6 +333,24 @@ def run_tests():
     print("Desglose:", res['detalles'])
 
 if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == '--cortes':
+        # Uso: python scripts/audit_closing_scenarios.py --cortes respaldo.json
+        _, resultados = auditar_cortes_respaldo(sys.argv[2])
+        for fila in resultados:
+            print(f"{fila['corteId']}: {fila['estado']} {fila['diferencias'] or ''}")
+        exit(1 if any(f['estado'] != 'OK' for f in resultados) else 0)
+    if len(sys.argv) > 2 and sys.argv[1] == '--incremental':
+        # Uso: python scripts/audit_closing_scenarios.py --incremental respaldo.json [checkpoint.json]
+        ruta_cp = sys.argv[3] if len(sys.argv) > 3 else CHECKPOINT_DEFAULT
+        engine, nuevas, volatiles = auditar_incremental(iterar_tabla(sys.argv[2], 'ventas'), ruta_cp)
+        print(f"Ventas selladas nuevas: {nuevas} (hasta id {engine.ultimo_id}) | "
+              f"Turno abierto recalculado: {volatiles}")
+        print(json.dumps(engine.reporte(), indent=2))
+        exit(0)
+    if len(sys.argv) > 1:
+        # Uso: python scripts/audit_closing_scenarios.py respaldo.json
+        print(json.dumps(auditar_respaldo(sys.argv[1]).reporte(), indent=2))
+        exit(0)
     try:
         run_tests()
     except AssertionError as e:
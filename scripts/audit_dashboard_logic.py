@@ -1,81 +1,276 @@
-
 # scripts/audit_dashboard_logic.py
 import json
+import sys
+from dinero import FINO, Dinero, centavos, fino_bs_a_usd, finos, redondear
+from lector_capsula import iterar_tabla
 
-def audit_dashboard_logic():
-    print("--- AUDITORIA DASHBOARD ---")
-    
-    # 1. Simular Datos (Escenario: Venta Credito Hoy + Abono Hoy)
-    ventas = [
-        {
-            "id": "venta_1",
-            "tipo": "VENTA",
-            "status": "COMPLETADA",
-            "total": 29.00,
-            "esCredito": True,
-            "deudaPendiente": 4.00, # Pago parcial? No, el abono es separate
-            # En V4, si hay abono separado, la venta original mantiene su forma?
-            # Si el abono redujo la deuda, deudaPendiente en la venta original se actualiza?
-            # Si, pero aqui simulamos el array de ventas FLAT.
-        },
-        {
-            "id": "abono_1",
-            "tipo": "COBRO_DEUDA",
-            "status": "COMPLETADA",
-            "total": 25.00, # USD
-            "pagos": [
-                { "metodo": "Punto de Venta", "amount": 25.00, "currency": "USD" } 
-                # Simplificado, el engine normaliza
-            ]
+TOLERANCIA = 1  # centavo
+
+# Espejo de getCurrencyType (treasuryEngine.js): metodos que se cobran en Bs
+MARCAS_BS = ('bs', 'pago móvil', 'punto', 'biopago', 'transferencia')
+
+def tipo_moneda(pago):
+    if pago.get('tipo') in ('BS', 'DIVISA'):
+        return pago['tipo']
+    m = (pago.get('metodo') or pago.get('nombre') or '').lower()
+    return 'BS' if any(marca in m for marca in MARCAS_BS) else 'USD'
+
+def metodo_vuelto(metodos, bs):
+    """Espejo del Object.keys(map).find de agruparPorMetodo: primer metodo ya
+    acumulado que parezca efectivo en esa moneda, o la etiqueta por defecto."""
+    for k in metodos:
+        m = k.lower()
+        if bs and ('efectivo' in m or 'cash' in m) and ('bs' in m or 'bolívar' in m):
+            return k
+        if not bs and 'efectivo' in m and 'bs' not in m:
+            return k
+    return 'Efectivo (Bs)' if bs else 'Efectivo Divisa'
+
+
+class DashboardEngine:
+    """
+    Motor KPI de una sola pasada sobre cualquier iterable de ventas.
+    - KPIs de venta (isValidSale: excluye COBRO_DEUDA).
+    - Pie Chart por metodo (agruparPorMetodo), con cada abono neteado contra 'Crédito'.
+    - Chequeo de doble conteo: Pie sin neteo vs Pie neteado vs Venta Neta.
+    KPIs en centavos enteros; el Pie en unidades finas (dinero.FINO) porque
+    agruparPorMetodo suma montos y divide Bs / tasa sin redondear y solo cierra al final.
+    'cuadra' compara en unidades finas, antes del redondeo por metodo, con una
+    tolerancia que crece con cada conversion Bs -> USD (medio centimo de Bs / tasa).
+    """
+
+    def __init__(self):
+        self._total = 0
+        self.transacciones = 0
+        self._credito = 0
+        self._abonos = 0
+        self._abonos_neteados = 0  # solo los abonos con pagos restados de 'Crédito'
+        self._metodos = {}
+        self._total_fino = 0  # Venta Neta sin redondear, para 'cuadra'
+        self._cota_bs = 0     # Deriva maxima de las conversiones Bs -> USD (unidades finas)
+
+    def _sumar(self, metodo, fino):
+        self._metodos[metodo] = self._metodos.get(metodo, 0) + fino
+
+    def _bs_a_usd(self, f_bs, tasa):
+        # Los Bs llegan redondeados al centimo: cada conversion arrastra hasta medio centimo / tasa
+        self._cota_bs += fino_bs_a_usd(FINO // 2, tasa) + 1
+        return fino_bs_a_usd(f_bs, tasa)
+
+    @property
+    def total_ventas(self):
+        return Dinero(self._total)
+
+    @property
+    def ventas_credito(self):
+        return Dinero(self._credito)
+
+    @property
+    def abonos(self):
+        return Dinero(self._abonos)
+
+    @property
+    def map_metodos(self):
+        return {k: Dinero.desde_fino(v) for k, v in self._metodos.items()}
+
+    def procesar_venta(self, v):
+        if v.get('status') != 'COMPLETADA' or v.get('tipo') == 'ANULADO':
+            return  # isValidCashFlow
+        tipo = v.get('tipo', 'VENTA')
+        total = centavos(v.get('total') or 0)
+        deuda = centavos(v.get('deudaPendiente') or 0)
+
+        # --- KPIs (isValidSale) ---
+        if tipo == 'COBRO_DEUDA':
+            self._abonos += total
+            self._credito -= total
+        else:
+            self._total += total
+            self.transacciones += 1
+            if v.get('esCredito'):
+                self._credito += deuda - centavos(v.get('appliedToDebt') or 0)
+
+        # --- PIE CHART (agruparPorMetodo): montos exactos, sin pasar por centavos ---
+        f_total = finos(v.get('total') or 0)
+        f_deuda = finos(v.get('deudaPendiente') or 0)
+        if tipo != 'COBRO_DEUDA':
+            self._total_fino += f_total
+        es_credito_total = bool(v.get('esCredito')) and f_deuda * 100 >= f_total * 99
+        if es_credito_total:
+            self._sumar('Crédito', f_total)
+            return
+
+        pagos = v.get('pagos') or v.get('metodos') or []
+        if not isinstance(pagos, list) or not pagos:
+            # Fallback sin array de pagos
+            if v.get('esCredito'):
+                pagado = f_total - f_deuda
+                if pagado > TOLERANCIA * FINO:
+                    self._sumar('Efectivo (Implícito)', pagado)
+                if f_deuda > 0:
+                    self._sumar('Crédito', f_deuda)
+            else:
+                self._sumar('Efectivo (Legacy)', f_total)
+            return
+
+        tasa = v.get('tasa') or 1
+        for pago in pagos:
+            if pago.get('medium') == 'INTERNAL' and pago.get('tipo') != 'WALLET':
+                continue
+            metodo = pago.get('metodo') or pago.get('nombre') or 'Otros'
+            if pago.get('medium') == 'CREDIT' or pago.get('tipo') == 'CREDITO':
+                metodo = 'Crédito'
+            valor = finos(pago.get('monto') or pago.get('montoUSD') or pago.get('amount') or 0)
+            self._sumar(metodo, self._bs_a_usd(valor, tasa) if tipo_moneda(pago) == 'BS' else valor)
+
+        # FIX: el abono convierte Credito -> Caja; se resta para no contarlo dos veces
+        if tipo == 'COBRO_DEUDA':
+            self._sumar('Crédito', -f_total)
+            self._abonos_neteados += total
+
+        # Vueltos fisicos
+        cambio = finos(v.get('cambio') or 0)
+        if cambio > 0 and not v.get('vueltoCredito'):
+            dist = v.get('distribucionVuelto') or {}
+            if (dist.get('usd') or 0) > 0:
+                self._sumar(metodo_vuelto(self._metodos, False), -finos(dist['usd']))
+            if (dist.get('bs') or 0) > 0:
+                self._sumar(metodo_vuelto(self._metodos, True), -self._bs_a_usd(finos(dist['bs']), tasa))
+            if not dist.get('usd') and not dist.get('bs') and 'Efectivo Divisa' in self._metodos:
+                self._sumar('Efectivo Divisa', -cambio)
+
+        if v.get('esCredito') and f_deuda > TOLERANCIA * FINO:
+            self._sumar('Crédito', f_deuda)
+
+    def procesar(self, ventas):
+        for v in ventas:
+            self.procesar_venta(v)
+        return self
+
+    def fusionar(self, otro):
+        """Suma los parciales de otro motor (p.ej. otra terminal)."""
+        self._total += otro._total
+        self.transacciones += otro.transacciones
+        self._credito += otro._credito
+        self._abonos += otro._abonos
+        self._abonos_neteados += otro._abonos_neteados
+        self._total_fino += otro._total_fino
+        self._cota_bs += otro._cota_bs
+        for k in sorted(otro._metodos):
+            self._sumar(k, otro._metodos[k])
+        return self
+
+    def reporte(self):
+        map_metodos = self.map_metodos
+        total_pie = sum(map_metodos.values(), Dinero())
+        # Sin el FIX, el abono quedaba sumado en su metodo Y en 'Crédito'.
+        # Los abonos sin array de pagos nunca se netearon: no se devuelven.
+        total_pie_sin_neteo = total_pie + Dinero(self._abonos_neteados)
+        # Sin el redondeo por metodo (se acumula entre metodos y terminales)
+        diferencia = sum(self._metodos.values()) - self._total_fino
+        return {
+            "total_ventas": self.total_ventas,
+            "transacciones": self.transacciones,
+            "ticket_promedio": Dinero(redondear(self._total, self.transacciones)) if self.transacciones else Dinero(),
+            "ventas_credito": self.ventas_credito,
+            "map_metodos": map_metodos,
+            "total_pie": total_pie,
+            "total_pie_sin_neteo": total_pie_sin_neteo,
+            # Solo cuenta el exceso que aporta el neteo, no el que el Pie ya traia
+            "doble_conteo": total_pie_sin_neteo.c - max(total_pie.c, self._total) > TOLERANCIA,
+            "diferencia_pie": Dinero.desde_fino(diferencia),
+            "cuadra": abs(diferencia) <= TOLERANCIA * FINO + self._cota_bs,
         }
-    ]
-    
-    # 2. Logic: isValidSale (KPIs)
-    # Excludes COBRO_DEUDA
-    kpi_sales = [v for v in ventas if v["tipo"] != 'COBRO_DEUDA']
-    total_sales = sum(v["total"] for v in kpi_sales)
-    
-    # 3. Logic: agruparPorMetodo (Pie Chart)
-    # Includes COBRO_DEUDA (isValidCashFlow)
-    # Logic actual:
-    map_metodos = {"Crédito": 0, "Punto de Venta": 0}
-    
-    for v in ventas:
-        if v["tipo"] == 'VENTA' and v.get("esCredito"):
-            map_metodos["Crédito"] += v["total"]
-        
-        elif v["tipo"] == 'COBRO_DEUDA':
-            # Suma el pago
-            map_metodos["Punto de Venta"] += v["total"]
-            
-            # MISSING LOGIC: Subtract from Credit?
-    
-    total_pie = sum(map_metodos.values())
-    
-    print(f"Total Sales (Centro Dashboard): ${total_sales:.2f}")
-    print(f"Total Arqueo (Pie Chart):     ${total_pie:.2f}")
-    print(f"  - Crédito: ${map_metodos['Crédito']:.2f}")
-    print(f"  - Punto:   ${map_metodos['Punto de Venta']:.2f}")
-    
-    if total_pie > total_sales:
-        print("\n⚠️  DOUBLE COUNTING DETECTADO: El Pie Chart suma Credito + Abono ($54 vs $29)")
-        print("   Solución: Restar el Abono de la columna 'Crédito'.")
-        
-        # Simular Fix
-        map_fixed = map_metodos.copy()
-        # Abono fue 25. Restamos 25 de credito
-        map_fixed["Crédito"] -= 25.00
-        total_fixed = sum(map_fixed.values())
-        
-        print("\n--- CON FIX ---")
-        print(f"Total Arqueo: ${total_fixed:.2f}")
-        print(f"  - Crédito: ${map_fixed['Crédito']:.2f}")
-        print(f"  - Punto:   ${map_fixed['Punto de Venta']:.2f}")
-        
-        if total_fixed == total_sales:
-            print("✅ MATCH: El Pie Chart ahora coincide con la Venta Neta.")
-            return True
-            
-    return False
-
-audit_dashboard_logic()
+
+
+# --- FIXTURE: Escenario Venta Credito Hoy + Abono Hoy ---
+VENTAS_DEMO = [
+    {
+        "id": "venta_1",
+        "tipo": "VENTA",
+        "status": "COMPLETADA",
+        "total": 29.00,
+        "esCredito": True,
+        "deudaPendiente": 4.00,
+        # deudaPendiente se fija al momento de la venta (no la actualiza el abono).
+    },
+    {
+        "id": "abono_1",
+        "tipo": "COBRO_DEUDA",
+        "status": "COMPLETADA",
+        "total": 25.00, # USD
+        "pagos": [
+            { "metodo": "Punto de Venta", "amount": 25.00, "currency": "USD" }
+            # Simplificado, el engine normaliza
+        ]
+    }
+]
+
+def audit_dashboard_logic(ventas=None):
+    print("--- AUDITORIA DASHBOARD ---")
+    rep = DashboardEngine().procesar(VENTAS_DEMO if ventas is None else ventas).reporte()
+
+    print(f"Total Sales (Centro Dashboard): ${rep['total_ventas']:,.2f} ({rep['transacciones']} ventas)")
+    print(f"Total Arqueo SIN FIX (Pie):     ${rep['total_pie_sin_neteo']:,.2f}")
+    print(f"Total Arqueo CON FIX (Pie):     ${rep['total_pie']:,.2f}")
+    for metodo, valor in sorted(rep['map_metodos'].items()):
+        print(f"  - {metodo}: ${valor:,.2f}")
+
+    if rep['doble_conteo']:
+        print("\n[AVISO] DOUBLE COUNTING sin neteo: el Pie Chart suma Credito + Abono.")
+        print("        Solucion: Restar el Abono de la columna 'Crédito'.")
+
+    if rep['cuadra']:
+        print("[OK] MATCH: El Pie Chart coincide con la Venta Neta.")
+    else:
+        print("[FAIL] El Pie Chart no coincide con la Venta Neta.")
+    return rep['cuadra']
+
+def run_tests():
+    rep = DashboardEngine().procesar(VENTAS_DEMO).reporte()
+    assert rep['total_ventas'] == 29, f"FALLO KPI: Esperado 29, Obtenido {rep['total_ventas']}"
+    assert rep['total_pie_sin_neteo'] == 54, f"FALLO PIE SIN FIX: Esperado 54, Obtenido {rep['total_pie_sin_neteo']}"
+    assert rep['doble_conteo'], "FALLO: No se detecto el doble conteo"
+    assert rep['total_pie'] == 29 and rep['cuadra'], f"FALLO PIE: Esperado 29, Obtenido {rep['total_pie']}"
+
+    # Fusionar dos mitades == procesar todo de una vez
+    mitad = DashboardEngine().procesar(VENTAS_DEMO[:1]).fusionar(DashboardEngine().procesar(VENTAS_DEMO[1:]))
+    assert mitad.reporte() == rep, "FALLO FUSION"
+
+    # Vuelto: se descuenta del primer metodo de efectivo ya acumulado (no de 'Efectivo Divisa')
+    vuelto = DashboardEngine().procesar([{
+        "status": "COMPLETADA", "total": 10, "cambio": 5, "tasa": 40,
+        "pagos": [{"metodo": "Efectivo", "monto": 15}],
+        "distribucionVuelto": {"usd": 5},
+    }])
+    assert vuelto.map_metodos == {"Efectivo": 10}, f"FALLO VUELTO: {vuelto.map_metodos}"
+
+    # Sub-centavos: decimal.js suma 12.845 + 12.845 = 25.69 y redondea una sola vez
+    fiado = {"status": "COMPLETADA", "total": 12.845, "esCredito": True, "deudaPendiente": 12.845}
+    assert DashboardEngine().procesar([fiado, fiado]).map_metodos == {"Crédito": Dinero.de('25.69')}
+
+    # Redondeo por metodo: 4 metodos de 0.505 / 0.495 cierran en 2.02, pero la venta cuadra (2.00)
+    mitades = [{"status": "COMPLETADA", "total": 1, "pagos": [{"metodo": a, "monto": 0.505}, {"metodo": b, "monto": 0.495}]}
+               for a, b in (("Efectivo", "Zelle"), ("Binance", "PayPal"))]
+    redondeo = DashboardEngine().procesar(mitades).reporte()
+    assert redondeo['total_pie'] == Dinero.de('2.02') and redondeo['cuadra'], redondeo
+    assert not DashboardEngine().procesar([dict(mitades[0], total=0.9)]).reporte()['cuadra']
+
+    # Abono sin array de pagos: nunca se neteo, no hay doble conteo
+    sin_pagos = DashboardEngine().procesar([
+        {"status": "COMPLETADA", "total": 20, "pagos": [{"metodo": "Efectivo", "monto": 20}]},
+        {"status": "COMPLETADA", "tipo": "COBRO_DEUDA", "total": 5},
+    ]).reporte()
+    assert not sin_pagos['doble_conteo'], f"FALLO FALSO POSITIVO: {sin_pagos['total_pie_sin_neteo']}"
+    print("[OK] PRUEBAS EXITOSAS")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Uso: python scripts/audit_dashboard_logic.py respaldo.json
+        exit(0 if audit_dashboard_logic(iterar_tabla(sys.argv[1], 'ventas')) else 1)
+    try:
+        run_tests()
+        audit_dashboard_logic()
+    except AssertionError as e:
+        print(f"\n[FAIL] ERROR CRITICO DE LOGICA: {e}")
+        exit(1)
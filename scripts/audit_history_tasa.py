@@ -1,41 +1,58 @@
-
 # scripts/audit_history_tasa.py
+import argparse
 import json
+from dinero import Dinero, centavos
+from indice_tasas import IndiceTasas
+from lector_capsula import iterar_tabla, iterar_tablas
+
+CENTAVO = 1
 
-def audit_history_logic():
+def valor_bs(mov, indice):
+    """
+    Lógica de ModalHistorialCliente.jsx: (mov.cargoReal * (mov.tasa || tasa)).
+    Si el movimiento no guardó su tasa, se usa la vigente en su fecha (O(log n)).
+    El monto en Bs es Dinero exacto (math.convert USD -> VES, 2 decimales).
+    """
+    tasa_uso = mov.get("tasa") or indice.tasa_en(mov.get("fecha"))
+    if tasa_uso is None:
+        return None, None  # Sin historial ni tasa en config
+    return Dinero.de(mov.get("cargoReal", mov.get("total", 0))).a_bs(tasa_uso), tasa_uso
+
+def audit_history_logic(movimientos=None, indice=None):
     print("--- AUDITORIA LOGICA DE TASAS (HISTORIAL) ---")
-    
+
     # Simular configuración actual (Tasa 200)
     config = {"tasa": 200}
-    
+
     # Simular transacciones
     # Una venta vieja con tasa 100, y una nueva que usará la tasa de config
-    movimientos = [
-        {
-            "id": "old_sale",
-            "total": 29.00,
-            "tasa": 100, # Tasa vieja
-            "cargoReal": 29.00
-        },
-        {
-            "id": "new_sale",
-            "total": 10.00,
-            "tasa": 200, # Tasa actual
-            "cargoReal": 10.00
-        }
-    ]
-    
+    if movimientos is None:
+        movimientos = [
+            {
+                "id": "old_sale",
+                "total": 29.00,
+                "tasa": 100, # Tasa vieja
+                "cargoReal": 29.00
+            },
+            {
+                "id": "new_sale",
+                "total": 10.00,
+                "tasa": 200, # Tasa actual
+                "cargoReal": 10.00
+            }
+        ]
+    if indice is None:
+        # Sin historial de tasas: la vigente es la de config (comportamiento original)
+        indice = IndiceTasas(tasa_actual=config["tasa"])
+
     print(f"Tasa Actual Global: {config['tasa']}")
     print("\nProcesando Historial...")
-    
+
     for mov in movimientos:
-        # Lógica aplicada en ModalHistorialCliente.jsx:
-        # (mov.cargoReal * (mov.tasa || tasa))
-        tasa_uso = mov.get("tasa") or config["tasa"]
-        total_bs = mov["cargoReal"] * tasa_uso
-        
+        total_bs, tasa_uso = valor_bs(mov, indice)
+
         print(f"ID: {mov['id']} | USD: ${mov['cargoReal']:.2f} | Tasa: {tasa_uso} | Total Bs: {total_bs:,.2f}")
-        
+
         if mov['id'] == "old_sale":
             expected = 2900
             if total_bs == expected:
@@ -45,16 +62,185 @@ def audit_history_logic():
 
     # Resumen de Deuda Actual (Top KPI)
     # Lógica: (deuda_total * tasa_global)
-    deuda_total = sum(m["cargoReal"] for m in movimientos)
-    deuda_bs_actual = deuda_total * config["tasa"]
-    
+    deuda_total = sum((Dinero.de(m["cargoReal"]) for m in movimientos), Dinero())
+    deuda_bs_actual = deuda_total.a_bs(config["tasa"])
+
     print(f"\nResumen Superior (KPI):")
     print(f"Deuda Total USD: ${deuda_total:.2f}")
     print(f"Equivalencia Bs (Tasa {config['tasa']}): {deuda_bs_actual:,.2f} Bs")
-    
+
     if deuda_bs_actual == 7800: # (29 + 10) * 200
         print("✅ CORRECTO: El resumen usa la tasa del mercado actual.")
     else:
         print("❌ ERROR en el resumen.")
 
-audit_history_logic()
+# --- AUDITORIA MASIVA DE DEUDA/FAVOR POR CLIENTE (CUADRANTES V7) ---
+
+def simular_cliente(deuda, favor, nueva_deuda=0, vuelto=0, favor_usado=0):
+    """
+    Espejo de FinancialController.simulateCustomerUpdate. Todo en centavos
+    enteros: el redondeo HALF_UP a 2 decimales ya ocurre en centavos().
+    """
+    if favor_usado > 0:
+        favor = max(favor - favor_usado, 0)
+    if nueva_deuda > 0:
+        deuda += nueva_deuda
+    if vuelto > 0:
+        # Regla Fenix: el vuelto paga deuda primero
+        if deuda > 0:
+            if deuda >= vuelto:
+                deuda -= vuelto
+            else:
+                favor += vuelto - deuda
+                deuda = 0
+        else:
+            favor += vuelto
+    if deuda > 0 and favor > 0:
+        neto = favor - deuda
+        deuda, favor = (0, neto) if neto >= 0 else (-neto, 0)
+    return deuda, favor
+
+def clave_cliente(valor):
+    # SalesService usa parseInt(clienteId)
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+class AuditorDeudaClientes:
+    """
+    Recalcula deuda/favor de cada cliente reproduciendo sus ventas y abonos
+    en orden de ++id. El indice clienteId -> estado se construye una sola vez
+    y cada venta cuesta una busqueda O(1), sin importar cuantos clientes haya.
+    """
+
+    def __init__(self):
+        self.estado = {}       # clienteId -> (deuda, favor) recalculados, en centavos
+        self.clientes = {}     # clienteId -> registro guardado (deuda, favor, nombre)
+        self.huerfanas = 0     # ventas con clienteId que no existe en 'clientes'
+
+    def procesar_venta(self, v):
+        cid = clave_cliente(v.get('clienteId'))
+        if cid is None or v.get('status', 'COMPLETADA') == 'ANULADA':
+            return  # anularVenta revierte el impacto en el cliente
+        deuda, favor = self.estado.get(cid, (0, 0))
+
+        if v.get('tipo') == 'COBRO_DEUDA':
+            # registrarAbono: simulateCustomerUpdate(cliente, 0, abono, 0)
+            self.estado[cid] = simular_cliente(deuda, favor, vuelto=centavos(v.get('total', 0)))
+            return
+
+        favor_usado = centavos(v.get('montoSaldoFavor') or 0)
+        if favor_usado == 0:
+            favor_usado = sum(centavos(p.get('amount') or p.get('monto') or 0)
+                              for p in (v.get('payments') or v.get('pagos') or [])
+                              if p.get('medium') == 'INTERNAL' or p.get('method') == 'SALDO A FAVOR')
+        vuelto = centavos(v.get('appliedToDebt') or 0) + centavos(v.get('appliedToWallet') or 0)
+        if vuelto == 0 and v.get('vueltoCredito'):
+            vuelto = centavos(v.get('montoVueltoCredito') or 0)
+        nueva_deuda = centavos(v.get('deudaPendiente') or 0) if v.get('esCredito') else 0
+
+        self.estado[cid] = simular_cliente(deuda, favor, nueva_deuda, vuelto, favor_usado)
+
+    def registrar_cliente(self, c):
+        cid = clave_cliente(c.get('id'))
+        if cid is not None:
+            self.clientes[cid] = (centavos(c.get('deuda') or 0), centavos(c.get('favor') or 0), c.get('nombre'))
+
+    def desviaciones(self, tolerancia=CENTAVO):
+        filas = []
+        for cid, (deuda, favor, nombre) in self.clientes.items():
+            r_deuda, r_favor = self.estado.get(cid, (0, 0))
+            if abs(deuda - r_deuda) > tolerancia or abs(favor - r_favor) > tolerancia:
+                filas.append({
+                    "clienteId": cid, "nombre": nombre,
+                    "deuda": deuda / 100, "deuda_recalculada": r_deuda / 100,
+                    "favor": favor / 100, "favor_recalculado": r_favor / 100
+                })
+        self.huerfanas = sum(1 for cid in self.estado if cid not in self.clientes)
+        return sorted(filas, key=lambda f: -abs(f["deuda"] - f["deuda_recalculada"]))
+
+def auditar_deudas_respaldo(ruta):
+    """Una sola pasada de streaming sobre ventas + clientes, en el orden del archivo."""
+    auditor = AuditorDeudaClientes()
+    for tabla, registro in iterar_tablas(ruta, ('ventas', 'clientes')):
+        if tabla == 'ventas':
+            auditor.procesar_venta(registro)
+        else:
+            auditor.registrar_cliente(registro)
+    return auditor, auditor.desviaciones()
+
+def run_tests():
+    # Tasa 100 desde enero, 150 desde febrero, 200 desde marzo
+    indice = IndiceTasas([
+        ("2026-01-01T00:00:00.000Z", 100),
+        ("2026-01-15T00:00:00.000Z", 100),
+        ("2026-02-01T00:00:00.000Z", 150),
+        ("2026-03-01T00:00:00.000Z", 200),
+    ], tasa_actual=200)
+    assert len(indice) == 3, "FALLO INDICE: Los registros repetidos no deben abrir intervalos"
+    assert indice.tasa_en("2025-12-31T23:59:59.000Z") == 100
+    assert indice.tasa_en("2026-02-10T12:00:00.000Z") == 150
+    assert indice.tasa_en("2026-03-01T00:00:00.000Z") == 200
+    assert indice.tasa_en(None) == 200
+
+    # Observaciones de varias tablas fuera de orden: la racha de 100 sigue vigente en 6000
+    mezcla = IndiceTasas([(1000, 100), (5000, 100), (9000, 100), (4000, 200)])
+    assert mezcla.tasa_en(6000) == 100, f"FALLO INDICE DESORDENADO: {mezcla.tasa_en(6000)}"
+    assert mezcla.tasa_en(4500) == 200 and len(mezcla) == 3
+
+    # Movimiento sin tasa guardada: usa la vigente en su fecha, no la de config
+    total_bs, tasa_uso = valor_bs({"cargoReal": 10.0, "fecha": "2026-02-20T10:00:00.000Z"}, indice)
+    assert (total_bs, tasa_uso) == (1500.0, 150), f"FALLO TASA HISTORICA: {total_bs} @ {tasa_uso}"
+
+    # Cliente: fiado $50, abona $60 -> deuda 0, favor 10. Cliente 2 guardado con deuda fantasma.
+    auditor = AuditorDeudaClientes()
+    for v in [
+        {"id": 1, "clienteId": "7", "esCredito": True, "deudaPendiente": 50, "total": 50},
+        {"id": 2, "clienteId": 7, "tipo": "COBRO_DEUDA", "total": 60},
+        {"id": 3, "clienteId": 8, "esCredito": True, "deudaPendiente": 5, "status": "ANULADA"},
+    ]:
+        auditor.procesar_venta(v)
+    auditor.registrar_cliente({"id": 7, "nombre": "Ana", "deuda": 0, "favor": 10})
+    auditor.registrar_cliente({"id": 8, "nombre": "Luis", "deuda": 5, "favor": 0})
+    drift = auditor.desviaciones()
+    assert [f["clienteId"] for f in drift] == [8], f"FALLO DEUDA CLIENTES: {drift}"
+    print("[OK] PRUEBAS EXITOSAS")
+
+def main():
+    parser = argparse.ArgumentParser(description="Auditoria de tasa historica y deudas de clientes")
+    parser.add_argument("respaldo", nargs="?", help="Capsula de Tiempo (.json/.lcap); sin ella corren las pruebas")
+    parser.add_argument("--clientes", action="store_true",
+                        help="Recalcula deuda/favor de cada cliente desde sus ventas y abonos")
+    args = parser.parse_args()
+    if args.clientes and not args.respaldo:
+        parser.error("--clientes requiere un respaldo")
+
+    if args.clientes:
+        auditor, drift = auditar_deudas_respaldo(args.respaldo)
+        print(f"Clientes: {len(auditor.clientes)} | Con movimientos: {len(auditor.estado)} | "
+              f"Huerfanos: {auditor.huerfanas} | Con desviacion: {len(drift)}")
+        for fila in drift[:20]:
+            print(json.dumps(fila))
+        return 1 if drift else 0
+    if args.respaldo:
+        indice = IndiceTasas.desde_respaldo(args.respaldo)
+        sin_tasa = resueltos = 0
+        for venta in iterar_tabla(args.respaldo, 'ventas'):
+            if not venta.get("tasa"):
+                sin_tasa += 1
+                resueltos += valor_bs(venta, indice)[1] is not None
+        print(f"Intervalos de tasa: {len(indice)} | Ventas sin tasa: {sin_tasa} | Resueltas: {resueltos}")
+        print(f"Cache: {indice.info_cache()}")
+        return 0
+    try:
+        run_tests()
+    except AssertionError as e:
+        print(f"\n[FAIL] ERROR CRITICO DE LOGICA: {e}")
+        return 1
+    audit_history_logic()
+    return 0
+
+if __name__ == "__main__":
+    # Uso: python scripts/audit_history_tasa.py [respaldo.json] [--clientes]
+    exit(main())
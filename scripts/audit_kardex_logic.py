@@ -0,0 +1,240 @@
+# scripts/audit_kardex_logic.py
+import json
+import os
+import sys
+import time
+from array import array
+
+import numpy as np
+
+from lector_capsula import iterar_tablas
+from treasury_columnar import Codificador
+
+# DIRECTIVA: AUDIT_KARDEX_SOP (directivas/audit_kardex_SOP.md)
+# Motor de Replay del Kardex.
+# Carga los logs con productId (Dexie V8) en columnas, los ordena por
+# producto una sola vez (orden estable = orden ++id) y reconstruye el stock
+# corrido de todos los productos en un barrido lineal vectorizado:
+#   - SALTO: stockFinal no sigue al movimiento anterior (+/- cantidad)
+#   - DRIFT: productos.stock != ultimo stockFinal del Kardex
+#   - NEGATIVO: ventanas de movimientos con stockFinal < 0
+#   - HUERFANO: logs de un productId que no existe ni fue eliminado
+
+TOLERANCIA = 0.001 + 1e-9  # fixFloat redondea a 3 decimales (productos por peso)
+REPORTE_DEFAULT = os.path.join('.tmp', 'audit_report.json')
+ENTRADA, SALIDA, CIERRE = 1, -1, 0
+MAX_DETALLE = 50
+
+
+def direccion(tipo):
+    """Mismo criterio semantico que KardexRow (ModalKardex.jsx)."""
+    tipo = str(tipo or '').upper()
+    if 'ELIMINADO' in tipo:
+        return CIERRE  # PRODUCTO_ELIMINADO: cantidad 0, stockFinal 0
+    if 'ENTRADA' in tipo or 'DEVOLUCION' in tipo or 'COMPRA' in tipo:
+        return ENTRADA
+    return SALIDA
+
+
+def clave_producto(valor):
+    # eliminarProducto usa Number(id) || id
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return str(valor)
+
+
+def _num(valor):
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class KardexReplay:
+
+    def __init__(self):
+        self.productos = Codificador()
+        self.producto, self.log_id = array('q'), array('q')
+        self.cantidad, self.stock_final = array('d'), array('d')
+        self.dir = array('b')
+        self.stock = {}          # codigo -> productos.stock
+        self.nombres = {}        # codigo -> nombre (productos o primer log)
+        self.eliminados = set()  # codigos con PRODUCTO_ELIMINADO
+        self._dirs = {}
+
+    def agregar_log(self, r):
+        pid = r.get('productId')
+        if pid is None:
+            return  # Logs de caja / ventas / cortes: no son Kardex
+        tipo = r.get('tipo')
+        d = self._dirs.get(tipo)
+        if d is None:
+            d = self._dirs[tipo] = direccion(tipo)
+        codigo = self.productos.codigo(clave_producto(pid))
+        self.producto.append(codigo)
+        self.log_id.append(r['id'] if isinstance(r.get('id'), int) else -1)
+        self.cantidad.append(abs(_num(r.get('cantidad'))))
+        self.stock_final.append(_num(r.get('stockFinal')))
+        self.dir.append(d)
+        if d == CIERRE:
+            self.eliminados.add(codigo)
+        if codigo not in self.nombres:
+            self.nombres[codigo] = r.get('producto')
+
+    def agregar_producto(self, p):
+        codigo = self.productos.codigo(clave_producto(p.get('id')))
+        self.stock[codigo] = _num(p.get('stock'))
+        self.nombres[codigo] = p.get('nombre')
+
+    def replay(self):
+        n_prod = len(self.productos.valores)
+        producto = np.frombuffer(self.producto, dtype=np.int64)
+        orden = np.argsort(producto, kind='stable')
+        p = producto[orden]
+        ids = np.frombuffer(self.log_id, dtype=np.int64)[orden]
+        cant = np.frombuffer(self.cantidad, dtype=np.float64)[orden]
+        final = np.frombuffer(self.stock_final, dtype=np.float64)[orden]
+        d = np.frombuffer(self.dir, dtype=np.int8)[orden].astype(np.float64)
+        n = len(p)
+
+        inicio = np.ones(n, dtype=bool)
+        inicio[1:] = p[1:] != p[:-1]
+        fin = np.ones(n, dtype=bool)
+        fin[:-1] = inicio[1:]
+        grupos = np.flatnonzero(inicio)
+
+        # Encadenamiento: cada stockFinal debe ser el anterior +/- cantidad
+        movimiento = d * cant
+        esperado = np.empty(n)
+        esperado[1:] = final[:-1] + movimiento[1:]
+        salto = ~inicio & (d != CIERRE) & (np.abs(final - esperado) > TOLERANCIA)
+
+        # Stock reconstruido: base (stockPrevio del primer log) + suma de movimientos
+        base = final[grupos] - movimiento[grupos]
+        reconstruido = base + np.add.reduceat(movimiento, grupos) if n else base
+        ultimo = final[fin]
+        con_logs = p[grupos]
+
+        # Ventanas de stock negativo (consecutivas dentro del mismo producto)
+        neg = final < -TOLERANCIA
+        abre = neg & (inicio | ~np.r_[False, neg[:-1]])
+        cierra = neg & (fin | ~np.r_[neg[1:], False])
+
+        return self._hallazgos(n_prod, p, ids, final, esperado, salto, con_logs, ultimo, reconstruido,
+                               np.flatnonzero(abre), np.flatnonzero(cierra), fin)
+
+    def _hallazgos(self, n_prod, p, ids, final, esperado, salto, con_logs, ultimo, reconstruido, abre, cierra, fin):
+        valores = self.productos.valores
+        saltos_por_producto = np.bincount(p[salto], minlength=n_prod)
+        logs_por_producto = np.bincount(p, minlength=n_prod)
+
+        drift, huerfanos = [], []
+        kardex = dict(zip(con_logs.tolist(), zip(ultimo.tolist(), reconstruido.tolist())))
+        for codigo, (k_final, k_recon) in kardex.items():
+            if codigo not in self.stock:
+                if codigo not in self.eliminados:
+                    huerfanos.append({"productId": valores[codigo], "producto": self.nombres.get(codigo),
+                                      "logs": int(logs_por_producto[codigo])})
+                continue
+            stock = self.stock[codigo]
+            if abs(stock - k_final) > TOLERANCIA or saltos_por_producto[codigo]:
+                drift.append({
+                    "productId": valores[codigo], "producto": self.nombres.get(codigo),
+                    "stock": stock, "stock_kardex": round(k_final, 3), "stock_reconstruido": round(k_recon, 3),
+                    "saltos": int(saltos_por_producto[codigo]),
+                })
+        drift.sort(key=lambda f: -abs(f["stock"] - f["stock_reconstruido"]))
+        sin_kardex = sum(1 for c, s in self.stock.items() if c not in kardex and abs(s) > TOLERANCIA)
+
+        # Entre una ventana y la siguiente no hay negativos: el minimo de [abre_k, abre_k+1) es el de la ventana
+        minimos = np.minimum.reduceat(final, abre) if len(abre) else np.empty(0)
+        ventanas = [{
+            "productId": valores[p[a]], "producto": self.nombres.get(int(p[a])),
+            "desde_log": int(ids[a]), "hasta_log": int(ids[b]), "movimientos": int(b - a + 1),
+            "minimo": round(float(minimos[k]), 3),
+            "abierta": bool(fin[b]),  # Sigue en negativo al ultimo movimiento
+        } for k, a, b in ((k, abre[k], cierra[k]) for k in np.argsort(minimos, kind='stable')[:MAX_DETALLE])]
+
+        saltos = [{"productId": valores[p[i]], "log": int(ids[i]), "stockFinal": round(float(final[i]), 3),
+                   "esperado": round(float(esperado[i]), 3)} for i in np.flatnonzero(salto)[:MAX_DETALLE].tolist()]
+
+        return {
+            "resumen": {
+                "logs_kardex": len(p),
+                "productos": len(self.stock),
+                "productos_con_logs": len(kardex),
+                "productos_sin_kardex": sin_kardex,
+                "productos_eliminados": len(self.eliminados),
+                "drift": len(drift),
+                "saltos": int(salto.sum()),
+                "ventanas_negativas": len(abre),
+                "huerfanos": len(huerfanos),
+            },
+            "drift": drift[:MAX_DETALLE],
+            "saltos": saltos,
+            "ventanas_negativas": ventanas,
+            "huerfanos": huerfanos[:MAX_DETALLE],
+        }
+
+
+def auditar_kardex_respaldo(ruta):
+    """Una pasada de streaming sobre productos + logs (en el orden del archivo)."""
+    motor = KardexReplay()
+    for tabla, registro in iterar_tablas(ruta, ('productos', 'logs')):
+        if tabla == 'logs':
+            motor.agregar_log(registro)
+        else:
+            motor.agregar_producto(registro)
+    return motor.replay()
+
+
+def run_tests():
+    motor = KardexReplay()
+    for p in [{"id": 1, "nombre": "Harina", "stock": 7}, {"id": 2, "nombre": "Arroz", "stock": 5},
+              {"id": 3, "nombre": "Queso", "stock": 1.5}]:
+        motor.agregar_producto(p)
+    logs = [
+        (1, 'ENTRADA_INICIAL', 1, 10, 10), (2, 'SALIDA_VENTA', 1, 3, 7),
+        (3, 'ENTRADA_INICIAL', 2, 2, 2), (4, 'SALIDA_VENTA', 2, 4, -2),      # Vende sin stock
+        (5, 'SALIDA_VENTA', 2, 1, -3), (6, 'ENTRADA_EDICION', 2, 8, 5),
+        (7, 'SALIDA_VENTA', "3", 0.5, 2.0),                                 # productId string, base 2.5
+        (8, 'SALIDA_VENTA', 9, 1, 4),                                       # Producto inexistente
+        (9, 'ENTRADA_INICIAL', 10, 4, 4), (10, 'PRODUCTO_ELIMINADO', 10, 0, 0),
+        (11, 'APERTURA_CAJA', None, 20, 0),
+    ]
+    for i, tipo, pid, cant, final in logs:
+        motor.agregar_log({"id": i, "tipo": tipo, "productId": pid, "cantidad": cant, "stockFinal": final})
+    rep = motor.replay()
+    res = rep["resumen"]
+    assert res["logs_kardex"] == 10, f"FALLO FILTRO: {res}"
+    assert res["saltos"] == 0, f"FALLO ENCADENAMIENTO: {rep['saltos']}"
+    assert [f["productId"] for f in rep["drift"]] == [3], f"FALLO DRIFT: {rep['drift']}"
+    assert rep["drift"][0]["stock_reconstruido"] == 2.0
+    v = rep["ventanas_negativas"]
+    assert len(v) == 1 and (v[0]["desde_log"], v[0]["hasta_log"], v[0]["minimo"], v[0]["abierta"]) == (4, 5, -3, False), v
+    assert [h["productId"] for h in rep["huerfanos"]] == [9], f"FALLO HUERFANOS: {rep['huerfanos']}"
+
+    # Movimiento borrado del historial (eliminarMovimiento) -> salto detectado
+    motor.agregar_log({"id": 12, "tipo": 'SALIDA_VENTA', "productId": 1, "cantidad": 2, "stockFinal": 3})
+    rep = motor.replay()
+    assert rep["resumen"]["saltos"] == 1 and rep["saltos"][0]["esperado"] == 5, rep["saltos"]
+    print("[OK] PRUEBAS EXITOSAS")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        run_tests()
+        exit(0)
+    # Uso: python scripts/audit_kardex_logic.py respaldo.json [reporte.json]
+    salida = sys.argv[2] if len(sys.argv) > 2 else REPORTE_DEFAULT
+    t0 = time.perf_counter()
+    rep = auditar_kardex_respaldo(sys.argv[1])
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump(rep, f, indent=2)
+    print(f"Kardex auditado en {time.perf_counter() - t0:.1f}s -> {salida}")
+    for k, v in rep["resumen"].items():
+        print(f"  - {k}: {v:,}")
+    limpio = not (rep["resumen"]["drift"] or rep["resumen"]["huerfanos"])
+    exit(0 if limpio else 1)
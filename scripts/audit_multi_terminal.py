@@ -0,0 +1,112 @@
+# scripts/audit_multi_terminal.py
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from audit_closing_scenarios import TreasuryEngine
+from audit_dashboard_logic import DashboardEngine
+from dinero import Dinero
+from lector_capsula import iterar_tablas
+
+# DIRECTIVA: TEST-FIN-001
+# Auditoria Multi-Terminal.
+# Cada Capsula de Tiempo (una por caja, identificada por _meta.terminal) se
+# audita en su propio proceso. Los parciales (Dinero, centavos enteros) se
+# fusionan en orden fijo (terminal, archivo): el consolidado es determinista.
+
+
+def auditar_terminal(ruta):
+    """Worker: una pasada de streaming que alimenta Tesoreria y Dashboard a la vez."""
+    meta = {}
+    ventas_vistas = 0
+    engine = TreasuryEngine()
+    dashboard = DashboardEngine()
+
+    for tabla, registro in iterar_tablas(ruta, ('ventas', '_meta')):
+        if tabla == '_meta':
+            meta.update(registro or {})
+            continue
+        ventas_vistas += 1
+        engine.procesar_transaccion(registro)
+        dashboard.procesar_venta(registro)
+
+    return {
+        "ruta": ruta,
+        "terminal": meta.get('terminal') or meta.get('origen') or os.path.basename(ruta),
+        "ventas": ventas_vistas,
+        "recaudado": engine.recaudado,
+        "ventas_brutas": engine.ventas_brutas,
+        "breakdown": engine.breakdown,
+        "dashboard": dashboard,
+    }
+
+
+def _sumar(destino, origen):
+    for k in sorted(origen):
+        destino[k] = destino.get(k, Dinero()) + origen[k]
+
+
+def consolidar(parciales):
+    """Fusiona los parciales en orden (terminal, ruta), sin depender del orden de llegada."""
+    parciales = sorted(parciales, key=lambda p: (str(p["terminal"]), p["ruta"]))
+    total = {
+        "ventas": 0,
+        "recaudado": Dinero(),
+        "ventas_brutas": Dinero(),
+        "breakdown": {},
+        "dashboard": DashboardEngine(),
+    }
+    for p in parciales:
+        total["ventas"] += p["ventas"]
+        for campo in ("recaudado", "ventas_brutas"):
+            total[campo] += p[campo]
+        _sumar(total["breakdown"], p["breakdown"])
+        total["dashboard"].fusionar(p["dashboard"])
+    return parciales, total
+
+
+def imprimir_reporte(parciales, total):
+    print("=" * 60)
+    print("AUDITORIA CONSOLIDADA MULTI-TERMINAL")
+    print("=" * 60)
+    for p in parciales:
+        print(f"[{p['terminal']}] ventas={p['ventas']:,} | Recaudado: ${p['recaudado']:,.2f} | "
+              f"Brutas: ${p['ventas_brutas']:,.2f} | KPI Dashboard: ${p['dashboard'].total_ventas:,.2f}")
+    print("-" * 60)
+    print(f"Terminales:      {len(parciales)}")
+    print(f"Ventas leidas:   {total['ventas']:,}")
+    print(f"Total Recaudado: ${total['recaudado']:,.2f}")
+    print(f"Ventas Brutas:   ${total['ventas_brutas']:,.2f}")
+    for k, v in total["breakdown"].items():
+        print(f"  - {k}: ${v:,.2f}")
+
+    rep = total["dashboard"].reporte()
+    print(f"Total Sales (Dashboard): ${rep['total_ventas']:,.2f}")
+    print(f"Total Arqueo (Pie):      ${rep['total_pie']:,.2f}")
+    if rep["doble_conteo"]:
+        # Informativo (como audit_dashboard_logic): el neteo de abonos ya lo corrige
+        print(f"[AVISO] DOUBLE COUNTING sin neteo: el Pie sumaria ${rep['total_pie_sin_neteo']:,.2f} "
+              "(abono en su metodo Y en 'Crédito').")
+    if not rep["cuadra"]:
+        # Pagos que no suman el total de la venta; el redondeo Bs ya esta descontado
+        print(f"[FAIL] DESCUADRE: El Pie Chart difiere de la Venta Neta en ${rep['diferencia_pie']:,.2f} "
+              "(mas que el redondeo Bs -> USD permitido).")
+        return False
+    print(f"[OK] El Pie Chart coincide con la Venta Neta en todas las terminales "
+          f"(redondeo: ${rep['diferencia_pie']:,.2f}).")
+    return True
+
+
+def auditar_terminales(rutas, workers=None):
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parciales = list(pool.map(auditar_terminal, rutas))
+    return consolidar(parciales)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Auditoria paralela de respaldos de varias terminales")
+    parser.add_argument("respaldos", nargs="+", help="Capsulas de Tiempo (.json), una por terminal")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (por defecto: CPUs)")
+    args = parser.parse_args()
+
+    parciales, total = auditar_terminales(args.respaldos, args.workers)
+    exit(0 if imprimir_reporte(parciales, total) else 1)
@@ -0,0 +1,169 @@
+# scripts/audit_pagos_batch.py
+import argparse
+import csv
+import math
+import os
+import sys
+
+import numpy as np
+
+from lector_capsula import iterar_tabla
+
+# DIRECTIVA: Normalizacion de Pagos (ModalAbono -> useSalesProcessor)
+# Version masiva de simulate_abono_logic (audit_abono_logic.py) y
+# simulate_render_logic (audit_ui_render.py). Recorre cada entrada de
+# 'pagos' de cada venta, re-deriva la normalizacion en bloques NumPy y
+# escribe SOLO las filas donde lo guardado y lo re-derivado no coinciden.
+#
+# Reglas re-derivadas (SalesService.registrarAbono / procesarVenta):
+#   amount = monto = round(monto || montoBS || amountBS)
+#   currency = p.currency || (p.tipo === 'BS' ? 'VES' : 'USD')
+#   montoUSD = monto / tasa si VES, si no monto
+
+TOLERANCIA = 0.01 + 1e-9
+TAM_LOTE = 1 << 18
+SALIDA_DEFAULT = os.path.join('.tmp', 'pagos_discrepancias.csv')
+NAN = float('nan')
+
+COLUMNAS = ['venta_id', 'indice', 'metodo', 'currency', 'monto', 'amount',
+            'montoUSD', 'usd_derivado', 'monto_original', 'rate', 'motivos']
+
+
+def _num(valor):
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return NAN
+
+
+def _es_ves(p):
+    moneda = p.get('currency') or p.get('ticker') or ('VES' if p.get('tipo') == 'BS' else 'USD')
+    return moneda in ('VES', 'BS')
+
+
+class _Lote:
+    """Acumula pagos en listas planas y los evalua en bloque con NumPy."""
+
+    def __init__(self):
+        self.ids, self.indices, self.metodos = [], [], []
+        self.monto, self.amount, self.monto_usd = [], [], []
+        self.original, self.rate, self.ves = [], [], []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def agregar(self, venta_id, indice, p, original, tasa):
+        self.ids.append(venta_id)
+        self.indices.append(indice)
+        self.metodos.append(p.get('metodo') or p.get('method') or p.get('nombre') or '')
+        self.monto.append(_num(p.get('monto') or p.get('montoBS') or p.get('amountBS')))
+        self.amount.append(_num(p.get('amount')))
+        self.monto_usd.append(_num(p.get('montoUSD')))
+        # Objeto crudo de ModalAbono ('metodos') que origino este pago procesado
+        self.original.append(_num(original.get('monto')) if original else NAN)
+        self.rate.append(_num(p.get('rate') or tasa or 1))
+        self.ves.append(_es_ves(p))
+
+    def evaluar(self, writer):
+        monto = np.array(self.monto)
+        amount = np.array(self.amount)
+        monto_usd = np.array(self.monto_usd)
+        original = np.array(self.original)
+        rate = np.array(self.rate)
+        ves = np.array(self.ves, dtype=bool)
+
+        # Nominal: monto o, si falta, amount (mismo orden de fallback que el UI)
+        nominal = np.where(np.isnan(monto), amount, monto)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            usd_derivado = np.where(ves, nominal / np.where(rate > 0, rate, 1.0), nominal)
+        # math.round (HALF_UP) del monto tecleado en ModalAbono
+        original_redondeado = np.floor(original * 100 + 0.5) / 100
+
+        dif_amount = np.abs(amount - monto) > TOLERANCIA            # NaN compara False
+        dif_usd = np.abs(monto_usd - usd_derivado) > TOLERANCIA
+        dif_original = np.abs(amount - original_redondeado) > TOLERANCIA
+        malas = np.flatnonzero(dif_amount | dif_usd | dif_original)
+
+        for i in malas:
+            motivos = [m for m, mask in (('AMOUNT_VS_MONTO', dif_amount), ('MONTO_USD', dif_usd),
+                                         ('NORMALIZACION', dif_original)) if mask[i]]
+            writer.writerow([self.ids[i], self.indices[i], self.metodos[i], 'VES' if ves[i] else 'USD',
+                             _fmt(monto[i]), _fmt(amount[i]), _fmt(monto_usd[i]), _fmt(usd_derivado[i]),
+                             _fmt(original[i]), _fmt(rate[i]), '|'.join(motivos)])
+        return len(malas)
+
+
+def _fmt(x):
+    return '' if math.isnan(x) else round(float(x), 4)
+
+
+def validar_pagos(ventas, salida, tam_lote=TAM_LOTE):
+    """
+    Recorre los pagos de todas las ventas y escribe en 'salida' (CSV) solo las
+    discrepancias. Devuelve (pagos_revisados, discrepancias).
+    """
+    writer = csv.writer(salida)
+    writer.writerow(COLUMNAS)
+    lote = _Lote()
+    revisados = discrepancias = 0
+
+    for v in ventas:
+        pagos = v.get('pagos') or v.get('payments') or []
+        if not isinstance(pagos, list):
+            continue
+        crudos = v.get('metodos')
+        # Solo se emparejan por posicion si 'metodos' es el origen de 'pagos'
+        crudos = crudos if isinstance(crudos, list) and len(crudos) == len(pagos) and crudos is not pagos else None
+        for i, p in enumerate(pagos):
+            if not isinstance(p, dict):
+                continue
+            original = crudos[i] if crudos and crudos[i] is not p else None
+            lote.agregar(v.get('id'), i, p, original, v.get('tasa'))
+        if len(lote) >= tam_lote:
+            revisados += len(lote)
+            discrepancias += lote.evaluar(writer)
+            lote = _Lote()
+
+    if len(lote):
+        revisados += len(lote)
+        discrepancias += lote.evaluar(writer)
+    return revisados, discrepancias
+
+
+def run_tests():
+    import io
+    ventas = [
+        # Abono correcto: 5000 Bs a tasa 200 (caso de audit_abono_logic.py)
+        {"id": 1, "tipo": "COBRO_DEUDA", "tasa": 200,
+         "metodos": [{"metodo": "Punto de Venta", "monto": 5000, "montoUSD": 25, "currency": "VES"}],
+         "pagos": [{"metodo": "Punto de Venta", "amount": 5000, "monto": 5000, "currency": "VES", "rate": 200}]},
+        # Bug historico: se guardo montoUSD como nominal
+        {"id": 2, "tipo": "COBRO_DEUDA", "tasa": 200,
+         "metodos": [{"metodo": "Punto de Venta", "monto": 5000, "montoUSD": 25, "currency": "VES"}],
+         "pagos": [{"metodo": "Punto de Venta", "amount": 25, "monto": 5000, "currency": "VES", "rate": 200}]},
+        # montoUSD inconsistente con la tasa
+        {"id": 3, "tasa": 100, "pagos": [{"metodo": "Pago Movil", "monto": 1000, "montoUSD": 5, "tipo": "BS"}]},
+    ]
+    salida = io.StringIO()
+    revisados, malas = validar_pagos(ventas, salida, tam_lote=2)
+    filas = list(csv.DictReader(io.StringIO(salida.getvalue())))
+    assert revisados == 3 and malas == 2, f"FALLO: revisados={revisados} malas={malas}"
+    assert filas[0]['venta_id'] == '2' and 'NORMALIZACION' in filas[0]['motivos'], filas[0]
+    assert filas[1]['venta_id'] == '3' and filas[1]['motivos'] == 'MONTO_USD', filas[1]
+    print("[OK] PRUEBAS EXITOSAS")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        run_tests()
+        exit(0)
+    parser = argparse.ArgumentParser(description="Validador masivo de normalizacion de pagos")
+    parser.add_argument("respaldo", help="Capsula de Tiempo (.json)")
+    parser.add_argument("--salida", default=SALIDA_DEFAULT, help="CSV con las filas en desacuerdo")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.salida) or '.', exist_ok=True)
+    with open(args.salida, 'w', newline='', encoding='utf-8') as f:
+        revisados, malas = validar_pagos(iterar_tabla(args.respaldo, 'ventas'), f)
+    print(f"Pagos revisados: {revisados:,} | Discrepancias: {malas:,} -> {args.salida}")
+    exit(1 if malas else 0)
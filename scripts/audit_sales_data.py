@@ -1,18 +1,262 @@
-import sqlite3
+# scripts/audit_sales_data.py
 import json
 import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from lector_capsula import RespaldoInvalido, iterar_tablas
+
+# DIRECTIVA: TIME_CAPSULE_SOP
+# Lector offline de los datos Dexie de una caja.
+# Vuelca las tablas de una Capsula de Tiempo a un SQLite local con los MISMOS
+# indices que declara src/db.js, para que las auditorias hagan consultas
+# indexadas (por fecha, corteId, clienteId, status) en vez de barridos lineales.
+#   - Cada tabla: clave primaria + columnas indexadas + 'datos' (registro JSON).
+#   - Los campos no indexados se consultan con json_extract(datos, '$.campo').
+#   - Carga en streaming (lector_capsula) e indices creados al final.
+#
+# LevelDB: la carpeta IndexedDB de Chromium guarda los valores serializados
+# con V8 (y bloques Snappy); no se lee aqui. Exportar la Capsula desde la app.
+
+DESTINO_DEFAULT = os.path.join('.tmp', 'respaldo.sqlite')
+TAM_LOTE = 10_000
+
+# Esquema vigente de src/db.js (V6 + V8/V9 logs + V18 cajaId)
+ESQUEMA_DEXIE = {
+    'productos': '++id, nombre, codigo, categoria, stock',
+    'ventas': '++id, fecha, corteId, clienteId, status, cajaId',
+    'clientes': '++id, nombre, documento, deuda, favor',
+    'logs': '++id, tipo, fecha, usuarioId, productId, producto',
+    'cortes': 'id, fecha, idApertura, cajaId',
+    'outbox': '++id, collection, status, timestamp',
+}
+
+
+def columnas_dexie(definicion):
+    """'++id, fecha, corteId' -> ('id', ['fecha', 'corteId'])"""
+    campos = [c.strip() for c in definicion.split(',')]
+    return campos[0].lstrip('+&'), campos[1:]
+
+
+def es_leveldb(ruta):
+    if not os.path.isdir(ruta):
+        return False
+    nombres = os.listdir(ruta)
+    return 'CURRENT' in nombres or any(n.endswith(('.ldb', '.log')) for n in nombres)
+
+
+def _celda(valor):
+    # Tipos que SQLite no acepta directo (IndexedDB indexa arrays; Dexie guarda booleanos)
+    if isinstance(valor, bool):
+        return int(valor)
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, separators=(',', ':'))
+    return valor
+
+
+def _clave_cliente(valor):
+    # SalesService guarda clienteId como numero o string segun el origen; SQLite no
+    # tipa las columnas y "7" != 7: se unifican al insertar (como indice_ventas._clave)
+    if isinstance(valor, str) and valor.strip().isdigit():
+        return int(valor)
+    return _celda(valor)
+
+
+# Columnas que guardan un id de cliente (clientes.id es la clave primaria)
+COLUMNAS_CLIENTE = {('ventas', 'clienteId'), ('clientes', 'id')}
+
+
+def cargar_respaldo(ruta, destino=DESTINO_DEFAULT, tablas=tuple(ESQUEMA_DEXIE)):
+    """
+    Carga las tablas pedidas del respaldo en un SQLite indexado y devuelve la conexion.
+    Dos registros con la misma clave: gana el ultimo (la restauracion real, con
+    bulkAdd, fallaria; ver verificar_capsula.py).
+    """
+    if es_leveldb(ruta):
+        raise RespaldoInvalido(
+            f"{ruta} es una carpeta IndexedDB (LevelDB). Sus valores estan serializados con V8 "
+            "y no se leen offline: exporte una Capsula de Tiempo (TIME_CAPSULE_SOP).")
+    if destino != ':memory:':
+        os.makedirs(os.path.dirname(os.path.abspath(destino)), exist_ok=True)
+    con = sqlite3.connect(destino)
+    # Es un derivado reconstruible: sin journal durante la carga
+    con.execute("PRAGMA journal_mode=OFF")
+    con.execute("PRAGMA synchronous=OFF")
+
+    esquema = {t: columnas_dexie(ESQUEMA_DEXIE[t]) for t in tablas}
+    sentencias = {}
+    for tabla, (pk, indices) in esquema.items():
+        cols = ', '.join(f'"{c}"' for c in [pk] + indices + ['datos'])
+        con.execute(f'DROP TABLE IF EXISTS "{tabla}"')
+        definicion = ', '.join(f'"{c}"' for c in indices)
+        con.execute(f'CREATE TABLE "{tabla}" ("{pk}" PRIMARY KEY, {definicion}, datos TEXT NOT NULL)')
+        marcas = ', '.join('?' * (len(indices) + 2))
+        sentencias[tabla] = f'INSERT OR REPLACE INTO "{tabla}" ({cols}) VALUES ({marcas})'
+    con.execute("DROP TABLE IF EXISTS meta")
+    con.execute("CREATE TABLE meta (clave TEXT PRIMARY KEY, valor TEXT)")
+
+    lotes = {t: [] for t in esquema}
+    filas = dict.fromkeys(esquema, 0)
+
+    def volcar(tabla):
+        con.executemany(sentencias[tabla], lotes[tabla])
+        filas[tabla] += len(lotes[tabla])
+        lotes[tabla].clear()
+
+    meta = {}
+    for tabla, registro in iterar_tablas(ruta, list(esquema) + ['_meta']):
+        if tabla == '_meta':
+            meta = registro or {}
+            continue
+        pk, indices = esquema[tabla]
+        lote = lotes[tabla]
+        lote.append([(_clave_cliente if (tabla, c) in COLUMNAS_CLIENTE else _celda)(registro.get(c))
+                     for c in [pk] + indices]
+                    + [json.dumps(registro, separators=(',', ':'), ensure_ascii=False)])
+        if len(lote) >= TAM_LOTE:
+            volcar(tabla)
+    for tabla in esquema:
+        volcar(tabla)
+
+    for tabla, (_, indices) in esquema.items():
+        for c in indices:
+            con.execute(f'CREATE INDEX "idx_{tabla}_{c}" ON "{tabla}" ("{c}")')
+    con.executemany("INSERT INTO meta VALUES (?, ?)", [
+        ('origen', os.path.abspath(ruta)), ('schema_version', meta.get('schema_version')),
+        ('cargado', time.strftime('%Y-%m-%dT%H:%M:%S')), ('filas', json.dumps(filas)),
+    ])
+    con.commit()
+    con.execute("ANALYZE")
+    return con
+
+
+# --- Consultas indexadas ---
+
+def _registros(cursor):
+    return [json.loads(fila[0]) for fila in cursor]
+
+
+def ventas_de_corte(con, corte_id):
+    return _registros(con.execute("SELECT datos FROM ventas WHERE corteId = ? ORDER BY id", (corte_id,)))
+
+
+def ventas_de_cliente(con, cliente_id, desde=None, hasta=None):
+    """Ventas de un cliente, opcionalmente en [desde, hasta) por fecha ISO."""
+    sql, params = "SELECT datos FROM ventas WHERE clienteId = ?", [_clave_cliente(cliente_id)]
+    if desde:
+        sql, params = sql + " AND fecha >= ?", params + [desde]
+    if hasta:
+        sql, params = sql + " AND fecha < ?", params + [hasta]
+    return _registros(con.execute(sql + " ORDER BY fecha", params))
+
+
+def ventas_entre(con, desde, hasta, status=None):
+    sql, params = "SELECT datos FROM ventas WHERE fecha >= ? AND fecha < ?", [desde, hasta]
+    if status:
+        sql, params = sql + " AND status = ?", params + [status]
+    return _registros(con.execute(sql + " ORDER BY fecha", params))
+
+
+def resumen(con):
+    """Conteos y huecos referenciales basicos, todo via indices."""
+    filas = json.loads(con.execute("SELECT valor FROM meta WHERE clave = 'filas'").fetchone()[0])
+    return {
+        "filas": filas,
+        "ventas_por_status": dict(con.execute(
+            "SELECT COALESCE(status, '(sin status)'), COUNT(*) FROM ventas GROUP BY status")),
+        "ventas_sin_corte": con.execute("SELECT COUNT(*) FROM ventas WHERE corteId IS NULL").fetchone()[0],
+        "cortes_sin_registro": [r[0] for r in con.execute(
+            "SELECT DISTINCT corteId FROM ventas WHERE corteId IS NOT NULL AND corteId NOT IN "
+            "(SELECT json_extract(datos, '$.corteRef') FROM cortes)")],
+        "clientes_inexistentes": [r[0] for r in con.execute(
+            "SELECT DISTINCT clienteId FROM ventas WHERE clienteId IS NOT NULL "
+            "AND clienteId NOT IN (SELECT id FROM clientes)")],
+    }
+
+
+def audit_database(ruta, destino=DESTINO_DEFAULT):
+    t0 = time.perf_counter()
+    con = cargar_respaldo(ruta, destino)
+    rep = resumen(con)
+    print(f"Respaldo cargado en {time.perf_counter() - t0:.1f}s -> {destino}")
+    for tabla, n in rep["filas"].items():
+        print(f"  - {tabla}: {n:,}")
+    print(f"Ventas por status: {rep['ventas_por_status']}")
+    print(f"Ventas sin corte (turno abierto): {rep['ventas_sin_corte']:,}")
+    if rep["cortes_sin_registro"]:
+        print(f"[ALERTA] corteId sin registro en 'cortes' (el ultimo puede ser el turno en curso): "
+              f"{rep['cortes_sin_registro'][:10]}")
+    if rep["clientes_inexistentes"]:
+        print(f"[ALERTA] Ventas de clientes inexistentes: {rep['clientes_inexistentes'][:10]}")
+    con.close()
+    return rep
+
+
+def run_tests():
+    capsula = {
+        "dexie": {
+            "productos": [{"id": 1, "nombre": "HARINA", "codigo": "750", "stock": 3}],
+            "ventas": [
+                {"id": 100, "fecha": "2026-01-05T10:00:00.000Z", "corteId": "Z-000001", "clienteId": 7,
+                 "status": "COMPLETADA", "total": 5, "esCredito": True},
+                {"id": 101, "fecha": "2026-01-06T10:00:00.000Z", "corteId": "Z-000001", "clienteId": None,
+                 "status": "ANULADA", "total": 2},
+                {"id": 102, "fecha": "2026-01-07T10:00:00.000Z", "clienteId": 7, "status": "COMPLETADA", "total": 1},
+                {"id": 103, "fecha": "2026-01-07T11:00:00.000Z", "corteId": "Z-000002", "clienteId": 9,
+                 "status": "COMPLETADA", "total": 4},
+                # clienteId como string (origen web): es el mismo cliente 7
+                {"id": 104, "fecha": "2026-01-08T10:00:00.000Z", "clienteId": "7", "status": "ANULADA", "total": 1},
+            ],
+            # Formato String Legacy
+            "clientes": json.dumps([{"id": 7, "nombre": "ANA", "deuda": 5, "favor": 0}]),
+            "logs": [{"id": 1, "tipo": "SALIDA_VENTA", "productId": 1, "fecha": "2026-01-05T10:00:00.000Z"}],
+            "cortes": [{"id": "Z-1767607200000", "corteRef": "Z-000001", "fecha": "2026-01-06T23:00:00.000Z"}],
+            "outbox": [],
+        },
+        "_meta": {"schema_version": "v2-unified"},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, 'capsula.json')
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(capsula, f)
+        con = cargar_respaldo(ruta, ':memory:')
+
+        rep = resumen(con)
+        assert rep["filas"] == {"productos": 1, "ventas": 5, "clientes": 1, "logs": 1, "cortes": 1, "outbox": 0}, rep
+        assert rep["ventas_por_status"] == {"ANULADA": 2, "COMPLETADA": 3}
+        assert rep["ventas_sin_corte"] == 2
+        assert rep["cortes_sin_registro"] == ["Z-000002"] and rep["clientes_inexistentes"] == [9], rep
+
+        assert [v["id"] for v in ventas_de_corte(con, "Z-000001")] == [100, 101]
+        assert [v["id"] for v in ventas_de_cliente(con, "7", desde="2026-01-06")] == [102, 104]
+        assert [v["id"] for v in ventas_entre(con, "2026-01-05", "2026-01-07", "COMPLETADA")] == [100]
+        assert ventas_de_corte(con, "Z-000001")[0]["esCredito"] is True  # El registro JSON viaja intacto
+
+        indices = {r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {"idx_ventas_fecha", "idx_ventas_corteId", "idx_ventas_status", "idx_cortes_fecha"} <= indices
+        con.close()
 
-# Since this is an Electron app using Dexie (IndexedDB), 
-# I can't easily query IndexedDB from a Python script on the host.
-# HOWEVER, the user might have some debug logs or I can try to find if there's a local backup.
-# Actually, the best way is to ask the user or use a browser-side check if I had the tool.
-# But wait, I can check if there are any .json export files in the workspace.
+        # Carpeta IndexedDB copiada de una caja -> error explicito
+        leveldb = os.path.join(tmp, 'file__0.indexeddb.leveldb')
+        os.makedirs(leveldb)
+        open(os.path.join(leveldb, 'CURRENT'), 'w').close()
+        try:
+            cargar_respaldo(leveldb, ':memory:')
+            raise AssertionError("FALLO: LevelDB aceptado")
+        except RespaldoInvalido:
+            pass
+    print("[OK] PRUEBAS EXITOSAS")
 
-def audit_database():
-    print("Listing files in .tmp to see if there are any relevant data exports...")
-    # This script is a placeholder to remind me I can't reach IndexedDB directly
-    # But I can look at the code for common patterns.
-    pass
 
 if __name__ == "__main__":
-    audit_database()
+    if len(sys.argv) == 1:
+        run_tests()
+        exit(0)
+    # Uso: python scripts/audit_sales_data.py respaldo.json [destino.sqlite]
+    try:
+        audit_database(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else DESTINO_DEFAULT)
+    except RespaldoInvalido as e:
+        print(f"ERROR: {e}")
+        exit(1)
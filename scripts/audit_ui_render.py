@@ -25,18 +25,19 @@ def simulate_render_logic(pago_obj, tasa):
     
     return render_buggy, render_fixed
 
-# CASO DE PRUEBA: Abono de 5000 Bs (Tasa 200) -> $25
-# Como quedo el objeto tras mi fix anterior:
-pago_test = {
-    "metodo": "Punto de Venta",
-    "monto": 5000,       # Nominal (Bs)
-    "montoUSD": 25,      # Normalizado ($)
-    "ticker": "VES"
-}
+if __name__ == "__main__":
+    # CASO DE PRUEBA: Abono de 5000 Bs (Tasa 200) -> $25
+    # Como quedo el objeto tras mi fix anterior:
+    pago_test = {
+        "metodo": "Punto de Venta",
+        "monto": 5000,       # Nominal (Bs)
+        "montoUSD": 25,      # Normalizado ($)
+        "ticker": "VES"
+    }
 
-buggy, fixed = simulate_render_logic(pago_test, 200)
+    buggy, fixed = simulate_render_logic(pago_test, 200)
 
-if buggy == "≈ $5000.00":
-    print("\n✅ BUG REPRODUCIDO: El sistema muestra el monto en Bs como si fueran Dolares.")
-else:
-    print("\n❌ NO SE REPRODUJO: Revisa la logica.")
+    if buggy == "≈ $5000.00":
+        print("\n✅ BUG REPRODUCIDO: El sistema muestra el monto en Bs como si fueran Dolares.")
+    else:
+        print("\n❌ NO SE REPRODUJO: Revisa la logica.")
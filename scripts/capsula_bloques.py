@@ -0,0 +1,278 @@
+# scripts/capsula_bloques.py
+import argparse
+import gzip
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+from lector_capsula import RespaldoInvalido, estructura, iterar_tablas
+
+# DIRECTIVA: TIME_CAPSULE_SOP
+# Capsula por Bloques (.lcap): misma informacion que 'v2-unified', pero cada
+# tabla se guarda en bloques comprimidos independientes y un indice (TOC) al
+# final del archivo dice donde esta cada uno:
+#
+#   b'LCAP1\n' | bloque | bloque | ... | TOC (JSON, gzip) | offset TOC (<Q) | b'LCAPTOC1'
+#
+# Bloque = JSON array de hasta FILAS_POR_BLOQUE registros, comprimido con
+# gzip (stdlib) o zstd (si 'zstandard' esta instalado). Las ventas se agrupan
+# por mes de 'fecha': leer un mes solo descomprime sus bloques.
+# lector_capsula.iterar_tablas detecta el formato, asi que todas las
+# auditorias leen .lcap sin cambios. Para restaurar en la app se vuelve a
+# 'v2-unified' con a_json().
+
+MAGIA = b'LCAP1\n'
+MAGIA_TOC = b'LCAPTOC1'
+FORMATO = 'lcap-1'
+FILAS_POR_BLOQUE = 5_000
+PARTICION_MENSUAL = {'ventas'}
+_COLA = struct.Struct('<Q')
+
+
+def es_capsula_bloques(ruta):
+    with open(ruta, 'rb') as f:
+        return f.read(len(MAGIA)) == MAGIA
+
+
+def _compresor(nombre):
+    if nombre == 'gzip':
+        return lambda datos: gzip.compress(datos, compresslevel=6), gzip.decompress
+    if nombre == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=3).compress, zstandard.ZstdDecompressor().decompress
+    raise ValueError(f"Compresion desconocida: {nombre}")
+
+
+def mes_de(registro):
+    fecha = registro.get('fecha') if isinstance(registro, dict) else None
+    return fecha[:7] if isinstance(fecha, str) and len(fecha) >= 7 else None
+
+
+class EscritorBloques:
+    """Escribe una .lcap registro a registro; cierra() agrega el TOC."""
+
+    def __init__(self, destino, compresion='gzip', filas_por_bloque=FILAS_POR_BLOQUE):
+        self.comprimir, _ = _compresor(compresion)
+        self.compresion = compresion
+        self.filas_por_bloque = filas_por_bloque
+        self.f = open(destino, 'wb')
+        self.f.write(MAGIA)
+        self.tablas = {}        # tabla -> {"filas", "bloques": [...]}
+        self.buffers = {}       # (tabla, mes) -> [registros]
+        self.raiz = {"_meta": None, "localStorage": None}
+
+    def agregar(self, tabla, registro):
+        self.tablas.setdefault(tabla, {"filas": 0, "bloques": []})
+        clave = (tabla, mes_de(registro) if tabla in PARTICION_MENSUAL else None)
+        buf = self.buffers.setdefault(clave, [])
+        buf.append(registro)
+        if len(buf) >= self.filas_por_bloque:
+            self._volcar(clave)
+
+    def tabla_vacia(self, tabla):
+        self.tablas.setdefault(tabla, {"filas": 0, "bloques": []})
+
+    def _volcar(self, clave):
+        registros = self.buffers.pop(clave, None)
+        if not registros:
+            return
+        tabla, mes = clave
+        crudo = json.dumps(registros, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        datos = self.comprimir(crudo)
+        bloque = {"offset": self.f.tell(), "largo": len(datos), "filas": len(registros),
+                  "crc32": zlib.crc32(datos)}
+        if tabla in PARTICION_MENSUAL:
+            bloque["mes"] = mes
+        ids = [r.get('id') for r in registros if isinstance(r, dict) and isinstance(r.get('id'), int)]
+        if ids:
+            bloque["id_min"], bloque["id_max"] = min(ids), max(ids)
+        self.f.write(datos)
+        self.tablas[tabla]["bloques"].append(bloque)
+        self.tablas[tabla]["filas"] += len(registros)
+
+    def cerrar(self):
+        for clave in list(self.buffers):
+            self._volcar(clave)
+        toc = {"formato": FORMATO, "compresion": self.compresion, "tablas": self.tablas, **self.raiz}
+        inicio = self.f.tell()
+        self.f.write(gzip.compress(json.dumps(toc, ensure_ascii=False).encode('utf-8')))
+        self.f.write(_COLA.pack(inicio) + MAGIA_TOC)
+        self.f.close()
+
+
+class CapsulaBloques:
+    """Lectura con acceso directo: solo se descomprimen los bloques pedidos."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with open(ruta, 'rb') as f:
+            if f.read(len(MAGIA)) != MAGIA:
+                raise RespaldoInvalido(f"{ruta} no es una Capsula por Bloques")
+            f.seek(-(_COLA.size + len(MAGIA_TOC)), os.SEEK_END)
+            cola = f.read()
+            if cola[_COLA.size:] != MAGIA_TOC:
+                raise RespaldoInvalido("Capsula por Bloques truncada (sin TOC)")
+            inicio = _COLA.unpack(cola[:_COLA.size])[0]
+            f.seek(inicio)
+            self.toc = json.loads(gzip.decompress(f.read()[:-len(cola)]))
+        if self.toc.get("formato") != FORMATO:
+            raise RespaldoInvalido(f"Formato no soportado: {self.toc.get('formato')}")
+        _, self.descomprimir = _compresor(self.toc["compresion"])
+        self.meta = self.toc.get("_meta")
+        self.local_storage = self.toc.get("localStorage")
+
+    def tablas(self):
+        return list(self.toc["tablas"])
+
+    def filas(self, tabla):
+        return self.toc["tablas"].get(tabla, {"filas": 0})["filas"]
+
+    def meses(self, tabla='ventas'):
+        return sorted({b.get("mes") or '' for b in self.toc["tablas"].get(tabla, {"bloques": []})["bloques"]})
+
+    def bloques(self, tabla, meses=None):
+        bloques = self.toc["tablas"].get(tabla, {"bloques": []})["bloques"]
+        if meses is not None:
+            meses = set(meses)
+            bloques = [b for b in bloques if b.get("mes") in meses]
+        return bloques
+
+    def iterar(self, tabla, meses=None):
+        """Registros de la tabla (o solo de esos meses 'YYYY-MM'), en orden de bloque."""
+        with open(self.ruta, 'rb') as f:
+            for b in self.bloques(tabla, meses):
+                f.seek(b["offset"])
+                datos = f.read(b["largo"])
+                if zlib.crc32(datos) != b["crc32"]:
+                    raise RespaldoInvalido(f"Bloque danado en {tabla} (offset {b['offset']})")
+                yield from json.loads(self.descomprimir(datos))
+
+    def iterar_tablas(self, tablas):
+        """Mismo contrato que lector_capsula.iterar_tablas (incluye '_meta' y 'localStorage')."""
+        tablas = set(tablas)
+        for clave in ('_meta', 'localStorage'):
+            if clave in tablas and self.toc.get(clave) is not None:
+                yield clave, self.toc[clave]
+        for tabla in self.toc["tablas"]:
+            if tabla in tablas:
+                for registro in self.iterar(tabla):
+                    yield tabla, registro
+
+    def a_json(self, destino):
+        """Reconstruye la Capsula 'v2-unified' (la que acepta restaurarCapsulaDeTiempo)."""
+        with open(destino, 'w', encoding='utf-8') as f:
+            f.write('{"dexie":{')
+            for i, tabla in enumerate(self.tablas()):
+                f.write(('"' if i == 0 else ',"') + tabla + '":[')
+                for j, registro in enumerate(self.iterar(tabla)):
+                    if j:
+                        f.write(',')
+                    f.write(json.dumps(registro, separators=(',', ':'), ensure_ascii=False))
+                f.write(']')
+            f.write('}')
+            for clave in ('localStorage', '_meta'):
+                if self.toc.get(clave) is not None:
+                    f.write(f',"{clave}":' + json.dumps(self.toc[clave], ensure_ascii=False))
+            f.write('}')
+
+
+def convertir(ruta, destino, compresion='gzip', filas_por_bloque=FILAS_POR_BLOQUE):
+    """Capsula JSON (v2-unified o legacy) -> .lcap, en una sola pasada de streaming."""
+    _, en_archivo = estructura(ruta)
+    escritor = EscritorBloques(destino, compresion, filas_por_bloque)
+    for tabla in en_archivo:
+        escritor.tabla_vacia(tabla)  # Conserva el orden de las tablas y las vacias
+    for tabla, registro in iterar_tablas(ruta, list(en_archivo) + ['_meta', 'localStorage']):
+        if tabla in ('_meta', 'localStorage'):
+            escritor.raiz[tabla] = registro
+        else:
+            escritor.agregar(tabla, registro)
+    escritor.cerrar()
+    return CapsulaBloques(destino)
+
+
+def run_tests():
+    ventas = [{"id": i, "fecha": f"2026-0{1 + i // 4}-0{1 + i % 4}T10:00:00.000Z", "total": i} for i in range(10)]
+    ventas.append({"id": 10, "total": 1})  # Sin fecha
+    capsula = {
+        "dexie": {"productos": [{"id": 1, "nombre": "AZÚCAR \"REFINADA\""}], "ventas": ventas,
+                  "clientes": json.dumps([{"id": 7}]), "outbox": []},
+        "localStorage": {"listo-config": "{\"tasa\":100}"},
+        "_meta": {"schema_version": "v2-unified", "origen": "LISTO_POS"},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, 'capsula.json')
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(capsula, f)
+        lcap = os.path.join(tmp, 'capsula.lcap')
+        cap = convertir(ruta, lcap, filas_por_bloque=3)
+
+        assert cap.tablas() == ["productos", "ventas", "clientes", "outbox"]
+        assert cap.meses() == ['', '2026-01', '2026-02', '2026-03']
+        assert [v["id"] for v in cap.iterar('ventas', ['2026-02'])] == [4, 5, 6, 7]
+        assert len(cap.bloques('ventas', ['2026-02'])) == 2  # 3 + 1 filas
+        assert cap.filas('ventas') == 11 and list(cap.iterar('clientes')) == [{"id": 7}]
+
+        # Las auditorias leen la .lcap por lector_capsula sin cambios
+        assert [r["id"] for _, r in iterar_tablas(lcap, ['productos', 'outbox'])] == [1]
+        assert dict(iterar_tablas(lcap, ['_meta']))['_meta']["origen"] == "LISTO_POS"
+
+        # Ida y vuelta: mismo contenido que el original (String Legacy normalizado a array)
+        vuelta = os.path.join(tmp, 'vuelta.json')
+        cap.a_json(vuelta)
+        with open(vuelta, encoding='utf-8') as f:
+            reconstruida = json.load(f)
+        capsula["dexie"]["clientes"] = [{"id": 7}]
+        ordenadas = sorted(reconstruida["dexie"]["ventas"], key=lambda v: v["id"])
+        assert ordenadas == ventas and reconstruida["localStorage"] == capsula["localStorage"]
+        assert {t: v for t, v in reconstruida["dexie"].items() if t != 'ventas'} == \
+            {t: v for t, v in capsula["dexie"].items() if t != 'ventas'}
+
+        # Bloque danado -> error explicito, no datos silenciosamente corruptos
+        with open(lcap, 'r+b') as f:
+            f.seek(cap.bloques('productos')[0]["offset"] + 5)
+            f.write(b'\x00')
+        try:
+            list(CapsulaBloques(lcap).iterar('productos'))
+            raise AssertionError("FALLO CRC")
+        except RespaldoInvalido:
+            pass
+    print("[OK] PRUEBAS EXITOSAS")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capsula de Tiempo <-> Capsula por Bloques (.lcap)")
+    parser.add_argument("origen")
+    parser.add_argument("destino", help=".lcap para convertir; .json para volver a v2-unified")
+    parser.add_argument("--compresion", choices=("gzip", "zstd"), default="gzip")
+    parser.add_argument("--filas", type=int, default=FILAS_POR_BLOQUE, help="Registros por bloque")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    try:
+        if es_capsula_bloques(args.origen):
+            CapsulaBloques(args.origen).a_json(args.destino)
+        else:
+            cap = convertir(args.origen, args.destino, args.compresion, args.filas)
+            for tabla in cap.tablas():
+                print(f"  - {tabla}: {cap.filas(tabla):,} filas en {len(cap.bloques(tabla))} bloque(s)")
+    except ImportError:
+        print("ERROR: zstandard not installed. Use --compresion gzip.")
+        exit(1)
+    except RespaldoInvalido as e:
+        print(f"ERROR: {e}")
+        exit(1)
+    antes, despues = os.path.getsize(args.origen), os.path.getsize(args.destino)
+    print(f"{args.destino}: {despues / 1e6:,.1f} MB (origen {antes / 1e6:,.1f} MB) "
+          f"en {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        run_tests()
+        exit(0)
+    main()
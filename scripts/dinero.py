@@ -0,0 +1,226 @@
+# scripts/dinero.py
+import sys
+from decimal import Decimal, ROUND_HALF_UP
+from fractions import Fraction
+from functools import lru_cache
+
+# DIRECTIVA: TEST-FIN-001
+# Dinero en centavos enteros para los motores de auditoria.
+# Espejo de src/utils/mathCore.js (decimal.js): math.round y math.convert
+# redondean HALF_UP (empate -> lejos de cero) a 2 decimales. Con enteros
+# las sumas son exactas y los bucles calientes no construyen Decimal(str()).
+#
+# - centavos(val): numero/cadena/None del POS -> int de centavos.
+# - Dinero: valor inmutable (__slots__) para reportes, comparaciones y checkpoints.
+# - Las conversiones Bs -> USD que NO redondea la app (Pie Chart: valor.div(tasa))
+#   se acumulan en unidades FINAS (1e-8 USD) y se redondean al final.
+# - finos(val): como centavos() pero a unidades finas. El Pie suma d(venta.total)
+#   sin redondear (12.845 no es 12.85 hasta toDecimalPlaces): sus entradas no
+#   pasan por centavos().
+
+ESCALA = 100
+FINO = 10 ** 6  # Unidades finas por centavo
+CENTAVO = Decimal('0.01')
+
+
+def centavos(val):
+    """Mismo criterio que d(): None -> 0. Redondeo HALF_UP como mathCore.round."""
+    if val is None:
+        return 0
+    if isinstance(val, Dinero):
+        return val.c
+    if isinstance(val, (int, float)):
+        # Camino rapido: montos del POS ya vienen a 2 decimales
+        x = val * 100
+        c = round(x)
+        if abs(x - c) < 1e-6:
+            return int(c)
+    return int(Decimal(str(val)).quantize(CENTAVO, rounding=ROUND_HALF_UP) * 100)
+
+
+def finos(val):
+    """Numero/cadena/None -> int de unidades finas (exacto hasta 1e-8, como d())."""
+    if val is None:
+        return 0
+    if isinstance(val, Dinero):
+        return val.c * FINO
+    if isinstance(val, int):
+        return val * ESCALA * FINO
+    if isinstance(val, float):
+        x = val * ESCALA * FINO
+        f = round(x)
+        if abs(x - f) < 1e-3:
+            return int(f)
+    return int((Decimal(str(val)) * ESCALA * FINO).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def redondear(num, den):
+    """num / den en enteros, HALF_UP (empate -> lejos de cero)."""
+    if den < 0:
+        num, den = -num, -den
+    q, r = divmod(abs(num), den)
+    if 2 * r >= den:
+        q += 1
+    return q if num >= 0 else -q
+
+
+@lru_cache(maxsize=4096)
+def fraccion_tasa(tasa):
+    """Tasa exacta como (numerador, denominador) desde su representacion decimal."""
+    return Decimal(str(tasa)).as_integer_ratio()
+
+
+def bs_a_fino(c_bs, tasa):
+    """Centavos de Bs -> unidades finas de USD, sin redondear a centavos (valor.div(tasa))."""
+    return fino_bs_a_usd(c_bs * FINO, tasa)
+
+
+def fino_bs_a_usd(f_bs, tasa):
+    """Unidades finas de Bs -> unidades finas de USD (valor.div(tasa))."""
+    num, den = fraccion_tasa(tasa)
+    return redondear(f_bs * den, num) if num else 0
+
+
+class Dinero:
+    __slots__ = ('c',)
+
+    def __init__(self, c=0):
+        self.c = c
+
+    @classmethod
+    def de(cls, val):
+        return cls(centavos(val))
+
+    @classmethod
+    def desde_fino(cls, unidades):
+        """Cierra un acumulado fino a centavos (toDecimalPlaces(2), HALF_UP)."""
+        return cls(redondear(unidades, FINO))
+
+    # --- mathCore.convert (redondea a 2 decimales) ---
+    def a_bs(self, tasa):
+        num, den = fraccion_tasa(tasa)
+        return Dinero(redondear(self.c * num, den))
+
+    def a_usd(self, tasa):
+        num, den = fraccion_tasa(tasa)
+        return Dinero(redondear(self.c * den, num) if num else 0)
+
+    def por(self, factor):
+        """math.round(math.mul(self, factor))."""
+        num, den = fraccion_tasa(factor)
+        return Dinero(redondear(self.c * num, den))
+
+    # --- Aritmetica ---
+    def __add__(self, otro):
+        return Dinero(self.c + (otro.c if isinstance(otro, Dinero) else centavos(otro)))
+
+    def __radd__(self, otro):
+        # sum() arranca en 0
+        return Dinero(self.c + centavos(otro))
+
+    def __sub__(self, otro):
+        return Dinero(self.c - (otro.c if isinstance(otro, Dinero) else centavos(otro)))
+
+    def __rsub__(self, otro):
+        return Dinero(centavos(otro) - self.c)
+
+    def __neg__(self):
+        return Dinero(-self.c)
+
+    def __abs__(self):
+        return Dinero(abs(self.c))
+
+    def __bool__(self):
+        return self.c != 0
+
+    # --- Comparaciones exactas (sin redondear al otro lado) ---
+    def _cmp(self, otro):
+        if isinstance(otro, Dinero):
+            return self.c, otro.c
+        if isinstance(otro, int):
+            return self.c, otro * ESCALA
+        if isinstance(otro, (float, Decimal, Fraction)):
+            # float por su texto (como new Decimal(x) en decimal.js), no por su binario
+            return Fraction(self.c, ESCALA), Fraction(Decimal(str(otro)) if isinstance(otro, float) else otro)
+        if otro is None or isinstance(otro, str):
+            raise TypeError(f"No se puede comparar Dinero con {type(otro).__name__}")
+        return NotImplemented
+
+    def __eq__(self, otro):
+        par = self._cmp(otro)
+        return par if par is NotImplemented else par[0] == par[1]
+
+    def __lt__(self, otro):
+        a, b = self._cmp(otro)
+        return a < b
+
+    def __le__(self, otro):
+        a, b = self._cmp(otro)
+        return a <= b
+
+    def __gt__(self, otro):
+        a, b = self._cmp(otro)
+        return a > b
+
+    def __ge__(self, otro):
+        a, b = self._cmp(otro)
+        return a >= b
+
+    def __hash__(self):
+        # Igual al hash de int/float/Decimal del mismo valor
+        return hash(Fraction(self.c, ESCALA))
+
+    # --- Salida ---
+    def decimal(self):
+        return Decimal(self.c).scaleb(-2)
+
+    def __float__(self):
+        return self.c / ESCALA
+
+    def __str__(self):
+        return str(self.decimal())
+
+    def __repr__(self):
+        return f"Dinero('{self}')"
+
+    def __format__(self, spec):
+        return format(self.decimal(), spec)
+
+
+def run_tests():
+    # Redondeo HALF_UP de mathCore.round (1.005 -> 1.01, -1.005 -> -1.01), no el de float
+    assert [centavos(x) for x in (1.005, -1.005, '2.675', 0.1 + 0.2, None, 29)] == [101, -101, 268, 30, 0, 2900]
+    assert Dinero.de(0.1) + 0.2 == Dinero.de(0.3) == 0.3
+    assert sum((Dinero.de(x) for x in [0.1] * 10), Dinero()) == 1
+
+    # mathCore.convert: USD->VES y VES->USD redondean a 2 decimales
+    assert Dinero.de(29).a_bs(100) == 2900
+    assert Dinero.de(5000).a_usd(36.37) == Dinero.de('137.48')  # 137.4752...
+    assert Dinero.de(10).a_usd(0) == 0  # Division segura
+    assert Dinero.de('19.99').por(3) == Dinero.de('59.97')
+
+    # Pie Chart: se acumula sin redondear y se cierra una sola vez (3 x 100/3 = 100.00, no 99.99)
+    tercio = bs_a_fino(centavos(100), 3)
+    assert Dinero.desde_fino(3 * tercio) == 100
+    assert Dinero.desde_fino(3 * Dinero.de(100).a_usd(3).c * FINO) == Dinero.de('99.99')
+    # Sub-centavos exactos hasta el cierre: 12.845 + 0.005 = 12.85 (no 12.85 + 0.01 = 12.86)
+    assert [finos(x) for x in (12.845, '0.005', None, 2)] == [1284500000, 500000, 0, 200000000]
+    assert Dinero.desde_fino(finos(12.845) + finos(0.005)) == Dinero.de('12.85')
+    assert fino_bs_a_usd(finos('100.005'), 1) == finos('100.005')
+
+    # Comparaciones exactas contra otros numeros y hash coherente
+    assert Dinero.de(1) != 1.001 and Dinero.de(1) < 1.001 and Dinero.de(1) == Decimal('1.00')
+    assert hash(Dinero.de(1500)) == hash(1500) == hash(1500.0)
+    assert f"{Dinero.de(1234.5):,.2f}" == '1,234.50' and str(Dinero(-5)) == '-0.05'
+    assert float(Dinero.de('7.35')) == 7.35
+    print("[OK] PRUEBAS EXITOSAS")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        run_tests()
+        exit(0)
+    # Uso: python scripts/dinero.py 1.005 [tasa]
+    valor = Dinero.de(sys.argv[1])
+    print(f"{sys.argv[1]} -> {valor}" + (f" | Bs: {valor.a_bs(sys.argv[2])} | USD: {valor.a_usd(sys.argv[2])}"
+                                          if len(sys.argv) > 2 else ''))
@@ -0,0 +1,357 @@
+# scripts/exportar_columnar.py
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from array import array
+
+import numpy as np
+
+from lector_capsula import iterar_tablas
+from treasury_columnar import ColumnasVentas, Codificador, a_centavos, cierre_columnar
+
+# DIRECTIVA: TIME_CAPSULE_SOP
+# Export columnar de una Capsula de Tiempo (se convierte UNA vez por respaldo).
+# Cada columna queda en un archivo binario plano que se abre con np.memmap:
+# las auditorias leen solo las columnas y particiones que usan, sin parsear
+# el JSON de nuevo.
+#   destino/esquema.json                      <- tipos, vocabularios, origen
+#   destino/ventas/mes=2026-01/total.bin      <- int64 centavos
+#   destino/ventas/mes=2026-01/corteId.bin    <- int32 codigo (-1 = sin valor)
+#   destino/productos/todo/nombre.bin + .off  <- texto UTF-8 + offsets
+# Parquet (pyarrow) es opcional: --parquet escribe la misma estructura en
+# .parquet para herramientas externas. Sin pyarrow el export NumPy basta.
+
+DESTINO_DEFAULT = os.path.join('.tmp', 'columnar')
+TAM_BLOQUE = 50_000
+SIN_PARTICION = 'todo'
+NAT = np.iinfo(np.int64).min  # datetime64 NaT
+
+# tipo: entero (int64, -1 si falta), real (float64), centavos (int64),
+# bool (int8), fecha (datetime64[ms]), cat (int32 + vocabulario), texto (UTF-8)
+COLUMNAS = {
+    'ventas': [('id', 'entero'), ('fecha', 'fecha'), ('tipo', 'cat', 'VENTA'), ('status', 'cat', 'COMPLETADA'),
+               ('corteId', 'cat'), ('clienteId', 'cat'), ('cajaId', 'cat'), ('total', 'centavos'),
+               ('deudaPendiente', 'centavos'), ('esCredito', 'bool'), ('tasa', 'real')],
+    'productos': [('id', 'entero'), ('codigo', 'texto'), ('nombre', 'texto'), ('categoria', 'cat'),
+                  ('stock', 'real'), ('costo', 'centavos'), ('precio', 'centavos')],
+    'clientes': [('id', 'entero'), ('nombre', 'texto'), ('documento', 'texto'),
+                 ('deuda', 'centavos'), ('favor', 'centavos')],
+    'logs': [('id', 'entero'), ('fecha', 'fecha'), ('tipo', 'cat'), ('productId', 'cat'),
+             ('cantidad', 'real'), ('stockFinal', 'real')],
+    'cortes': [('id', 'texto'), ('corteRef', 'cat'), ('fecha', 'fecha'), ('cajaId', 'cat'),
+               ('totalVentas', 'centavos')],
+}
+PARTICION_MENSUAL = {'ventas'}
+
+DTYPES = {'entero': np.int64, 'real': np.float64, 'centavos': np.int64, 'bool': np.int8,
+          'fecha': 'datetime64[ms]', 'cat': np.int32}
+
+
+def particion(registro):
+    fecha = registro.get('fecha')
+    return f"mes={fecha[:7]}" if isinstance(fecha, str) and len(fecha) >= 7 else 'mes=sin-fecha'
+
+
+def _entero(v):
+    return v if isinstance(v, int) and not isinstance(v, bool) else -1
+
+
+def _real(v):
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def _centavos(v):
+    try:
+        return a_centavos(v)
+    except (ArithmeticError, TypeError, ValueError):
+        return 0
+
+
+def _fechas(valores):
+    """ISO (con 'Z') -> int64 ms. Bloque vectorizado; si hay basura, fila a fila."""
+    limpias = [v.rstrip('Z') if isinstance(v, str) else 'NaT' for v in valores]
+    try:
+        return np.array(limpias, dtype='datetime64[ms]').view(np.int64)
+    except ValueError:
+        out = np.full(len(limpias), NAT, dtype=np.int64)
+        for i, v in enumerate(limpias):
+            try:
+                out[i] = np.datetime64(v, 'ms').astype(np.int64)
+            except ValueError:
+                pass
+        return out
+
+
+class _Particion:
+    """Buffer de una particion de una tabla: se vuelca a disco por bloques (memoria acotada)."""
+
+    def __init__(self, directorio, columnas, vocab):
+        self.directorio = directorio
+        self.columnas = columnas
+        self.vocab = vocab
+        self.filas = []
+        self.total = 0
+        self.offsets = {c[0]: 0 for c in columnas if c[1] == 'texto'}
+        os.makedirs(directorio, exist_ok=True)
+
+    def volcar(self):
+        if not self.filas:
+            return
+        for col in self.columnas:
+            nombre, tipo = col[0], col[1]
+            valores = [r.get(nombre) for r in self.filas]
+            ruta = os.path.join(self.directorio, nombre)
+            if tipo == 'texto':
+                datos = [('' if v is None else str(v)).encode('utf-8') for v in valores]
+                fines = np.cumsum([len(b) for b in datos], dtype=np.int64) + self.offsets[nombre]
+                self.offsets[nombre] = int(fines[-1])
+                with open(ruta + '.bin', 'ab') as f:
+                    f.write(b''.join(datos))
+                with open(ruta + '.off', 'ab') as f:
+                    f.write(fines.tobytes())
+                continue
+            if tipo == 'cat':
+                defecto = col[2] if len(col) > 2 else None
+                cod = self.vocab[nombre].codigo
+                datos = array('i', (-1 if v is None else cod(v)
+                                    for v in (x if x not in (None, '') else defecto for x in valores)))
+            elif tipo == 'centavos':
+                datos = array('q', map(_centavos, valores))
+            elif tipo == 'entero':
+                datos = array('q', map(_entero, valores))
+            elif tipo == 'real':
+                datos = array('d', map(_real, valores))
+            elif tipo == 'bool':
+                datos = array('b', (1 if v else 0 for v in valores))
+            else:
+                datos = _fechas(valores)
+            with open(ruta + '.bin', 'ab') as f:
+                f.write(datos.tobytes())
+        self.total += len(self.filas)
+        self.filas.clear()
+
+
+def firma_origen(ruta):
+    st = os.stat(ruta)
+    return {"ruta": os.path.abspath(ruta), "bytes": st.st_size, "mtime": int(st.st_mtime)}
+
+
+def exportar(ruta, destino=DESTINO_DEFAULT, tablas=tuple(COLUMNAS), forzar=False):
+    """Convierte el respaldo a columnas en disco. Si ya existe un export del mismo archivo, no hace nada."""
+    ruta_esquema = os.path.join(destino, 'esquema.json')
+    firma = firma_origen(ruta)
+    previas = {}
+    if os.path.exists(ruta_esquema):
+        with open(ruta_esquema, encoding='utf-8') as f:
+            previo = json.load(f)
+        if previo.get("origen") == firma:
+            if not forzar and set(tablas) <= set(previo["tablas"]):
+                return ExportColumnar(destino)
+            previas = previo["tablas"]  # Mismo respaldo: se conservan las otras tablas
+
+    vocab = {t: {c[0]: Codificador() for c in COLUMNAS[t] if c[1] == 'cat'} for t in tablas}
+    particiones = {t: {} for t in tablas}
+    for t in tablas:
+        # Un export viejo de la misma tabla se reemplaza completo
+        _limpiar(os.path.join(destino, t))
+
+    for tabla, registro in iterar_tablas(ruta, tablas):
+        clave = particion(registro) if tabla in PARTICION_MENSUAL else SIN_PARTICION
+        part = particiones[tabla].get(clave)
+        if part is None:
+            part = particiones[tabla][clave] = _Particion(
+                os.path.join(destino, tabla, clave), COLUMNAS[tabla], vocab[tabla])
+        part.filas.append(registro)
+        if len(part.filas) >= TAM_BLOQUE:
+            part.volcar()
+
+    esquema = {"origen": firma, "creado": time.strftime('%Y-%m-%dT%H:%M:%S'), "tablas": previas}
+    for tabla in tablas:
+        for part in particiones[tabla].values():
+            part.volcar()
+        esquema["tablas"][tabla] = {
+            "columnas": [[c[0], c[1]] for c in COLUMNAS[tabla]],
+            "particiones": {k: p.total for k, p in sorted(particiones[tabla].items())},
+            "vocabularios": {c: v.valores for c, v in vocab[tabla].items()},
+        }
+    with open(ruta_esquema, 'w', encoding='utf-8') as f:
+        json.dump(esquema, f, ensure_ascii=False, default=str)
+    return ExportColumnar(destino)
+
+
+def _limpiar(directorio):
+    if not os.path.isdir(directorio):
+        return
+    for raiz, _, archivos in os.walk(directorio, topdown=False):
+        for a in archivos:
+            if a.endswith(('.bin', '.off', '.parquet')):
+                os.remove(os.path.join(raiz, a))
+        if not os.listdir(raiz):
+            os.rmdir(raiz)
+
+
+class ExportColumnar:
+    """Lectura de un export: columnas mapeadas en memoria, solo las particiones pedidas."""
+
+    def __init__(self, directorio=DESTINO_DEFAULT):
+        self.directorio = directorio
+        with open(os.path.join(directorio, 'esquema.json'), encoding='utf-8') as f:
+            self.esquema = json.load(f)
+
+    def particiones(self, tabla, meses=None):
+        """meses: iterable de 'YYYY-MM' (solo tablas mensuales). None = todas."""
+        todas = self.esquema["tablas"][tabla]["particiones"]
+        if meses is None:
+            return [p for p, n in todas.items() if n]
+        pedidas = {f"mes={m}" for m in meses}
+        return [p for p, n in todas.items() if n and p in pedidas]
+
+    def tipo(self, tabla, columna):
+        return dict(self.esquema["tablas"][tabla]["columnas"])[columna]
+
+    def vocabulario(self, tabla, columna):
+        return self.esquema["tablas"][tabla]["vocabularios"][columna]
+
+    def columna(self, tabla, columna, meses=None):
+        """np.memmap de solo lectura (una particion) o concatenacion de las pedidas."""
+        tipo = self.tipo(tabla, columna)
+        if tipo == 'texto':
+            return self.texto(tabla, columna, meses)
+        partes = [np.memmap(os.path.join(self.directorio, tabla, p, columna + '.bin'), dtype=DTYPES[tipo], mode='r')
+                  for p in self.particiones(tabla, meses)]
+        if not partes:
+            return np.empty(0, dtype=DTYPES[tipo])
+        return partes[0] if len(partes) == 1 else np.concatenate(partes)
+
+    def texto(self, tabla, columna, meses=None):
+        valores = []
+        for p in self.particiones(tabla, meses):
+            base = os.path.join(self.directorio, tabla, p, columna)
+            fines = np.fromfile(base + '.off', dtype=np.int64)
+            with open(base + '.bin', 'rb') as f:
+                datos = f.read()
+            inicio = 0
+            for fin in fines.tolist():
+                valores.append(datos[inicio:fin].decode('utf-8'))
+                inicio = fin
+        return valores
+
+    def columnas_ventas(self, meses=None):
+        """ColumnasVentas (treasury_columnar) directo del export, sin releer el JSON."""
+        col = lambda c: self.columna('ventas', c, meses)
+        return ColumnasVentas(
+            total=col('total'), deuda=col('deudaPendiente'), es_credito=col('esCredito').astype(bool),
+            tipo=col('tipo').astype(np.int16), status=col('status').astype(np.int16),
+            corte=col('corteId').astype(np.int64),
+            tipos=self.vocabulario('ventas', 'tipo'), estados=self.vocabulario('ventas', 'status'),
+            cortes=self.vocabulario('ventas', 'corteId'),
+        )
+
+
+def exportar_parquet(export, destino=None):
+    """Misma estructura en Parquet (requiere pyarrow). Las categorias quedan como diccionario."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    destino = destino or export.directorio
+    for tabla, info in export.esquema["tablas"].items():
+        for p in export.particiones(tabla):
+            mes = [p[4:]] if p.startswith('mes=') else None
+            datos = {}
+            for nombre, tipo in info["columnas"]:
+                valores = export.columna(tabla, nombre, mes)
+                if tipo == 'cat':
+                    datos[nombre] = pa.DictionaryArray.from_arrays(
+                        pa.array(np.asarray(valores), mask=np.asarray(valores) < 0),
+                        pa.array([str(v) for v in info["vocabularios"][nombre]]))
+                elif tipo == 'texto':
+                    datos[nombre] = pa.array(valores, type=pa.string())
+                else:
+                    datos[nombre] = pa.array(np.asarray(valores))
+            os.makedirs(os.path.join(destino, tabla, p), exist_ok=True)
+            pq.write_table(pa.table(datos), os.path.join(destino, tabla, p, 'datos.parquet'))
+
+
+def run_tests():
+    from audit_closing_scenarios import TreasuryEngine
+
+    ventas = [
+        {"id": 1, "fecha": "2026-01-30T10:00:00.000Z", "tipo": "VENTA", "total": 10.5, "esCredito": False,
+         "corteId": "Z-000001", "clienteId": 3},
+        {"id": 2, "fecha": "2026-01-31T10:00:00.000Z", "tipo": "VENTA", "status": "ANULADA", "total": 4,
+         "corteId": "Z-000001"},
+        {"id": 3, "fecha": "2026-02-01T10:00:00.000Z", "tipo": "VENTA", "total": 20, "esCredito": True,
+         "deudaPendiente": 15.25, "clienteId": 3},
+        {"id": 4, "fecha": "2026-02-02T10:00:00.000Z", "tipo": "COBRO_DEUDA", "total": 5, "clienteId": "7"},
+        {"id": 5, "total": 1},  # Sin fecha ni tipo/status (defaults del POS)
+    ]
+    capsula = {"dexie": {
+        "productos": [{"id": 1, "nombre": "AZÚCAR", "codigo": "750", "stock": 2.5, "precio": 1.1},
+                      {"id": 2, "nombre": "ARROZ", "stock": 0}],
+        "ventas": ventas,
+    }}
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, 'capsula.json')
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(capsula, f)
+        exp = exportar(ruta, os.path.join(tmp, 'col'), ('productos', 'ventas'))
+
+        assert exp.particiones('ventas') == ['mes=2026-01', 'mes=2026-02', 'mes=sin-fecha'], exp.particiones('ventas')
+        assert exp.columna('ventas', 'id', ['2026-02']).tolist() == [3, 4]
+        assert exp.columna('ventas', 'total').tolist() == [1050, 400, 2000, 500, 100]
+        fechas = exp.columna('ventas', 'fecha')
+        assert str(fechas[0]) == '2026-01-30T10:00:00.000' and np.isnat(fechas[-1])
+        clientes = exp.vocabulario('ventas', 'clienteId')
+        assert [clientes[c] if c >= 0 else None for c in exp.columna('ventas', 'clienteId').tolist()] == \
+            [3, None, 3, "7", None]
+        assert exp.columna('productos', 'nombre') == ['AZÚCAR', 'ARROZ']
+        assert exp.columna('productos', 'codigo') == ['750', '']
+
+        # Mismo cierre que el motor fila a fila, leyendo solo el export
+        engine = TreasuryEngine()
+        for tx in ventas:
+            engine.procesar_transaccion(tx)
+        recaudado, brutas, _ = cierre_columnar(exp.columnas_ventas())
+        assert (recaudado, brutas) == (a_centavos(engine.recaudado), a_centavos(engine.ventas_brutas))
+
+        # Re-ejecucion sobre el mismo respaldo: se reutiliza el export
+        marca = os.path.getmtime(os.path.join(tmp, 'col', 'esquema.json'))
+        exportar(ruta, os.path.join(tmp, 'col'), ('ventas',))
+        assert os.path.getmtime(os.path.join(tmp, 'col', 'esquema.json')) == marca, "FALLO CACHE"
+    print("[OK] PRUEBAS EXITOSAS")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export columnar (NumPy/Parquet) de una Capsula de Tiempo")
+    parser.add_argument("respaldo")
+    parser.add_argument("--destino", default=DESTINO_DEFAULT)
+    parser.add_argument("--tablas", default=','.join(COLUMNAS), help="Lista separada por comas")
+    parser.add_argument("--parquet", action="store_true", help="Escribir tambien .parquet (requiere pyarrow)")
+    parser.add_argument("--forzar", action="store_true", help="Reexportar aunque el respaldo no haya cambiado")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    exp = exportar(args.respaldo, args.destino, tuple(args.tablas.split(',')), args.forzar)
+    print(f"Export listo en {time.perf_counter() - t0:.1f}s -> {args.destino}")
+    for tabla, info in exp.esquema["tablas"].items():
+        print(f"  - {tabla}: {sum(info['particiones'].values()):,} filas en {len(info['particiones'])} particion(es)")
+    if args.parquet:
+        try:
+            exportar_parquet(exp)
+            print("Parquet escrito junto a las columnas.")
+        except ImportError:
+            print("ERROR: pyarrow not installed. El export NumPy quedo completo.")
+            exit(1)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        run_tests()
+        exit(0)
+    main()
@@ -0,0 +1,417 @@
+# scripts/fuzz_tesoreria.py
+import argparse
+import copy
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from audit_closing_scenarios import TreasuryEngine
+from audit_dashboard_logic import DashboardEngine, tipo_moneda
+from dinero import FINO, centavos, fino_bs_a_usd, finos, redondear
+
+# DIRECTIVA: TEST-FIN-001
+# Fuzzer diferencial de Tesoreria. Genera combinaciones aleatorias de
+# ventas/abonos/creditos y compara:
+#   - pie:       Pie Chart de agruparPorMetodo (treasuryEngine.js) contra su
+#                espejo Python (DashboardEngine.map_metodos), metodo a metodo.
+#   - recaudado: TreasuryEngine.recaudado contra la suma del Pie sin 'Crédito'
+#                (el mismo cruce que conciliar_cortes hace con metodosPago).
+# Referencia 'js': un worker Node persistente (fuzz_tesoreria_worker.js) por
+# proceso, con lotes NDJSON por stdin/stdout. Referencia 'espejo': el Pie
+# sale de DashboardEngine (sin Node; solo corre el chequeo 'recaudado').
+# Cada discrepancia se reduce a un caso minimo antes de reportarla.
+
+SALIDA_DEFAULT = os.path.join('.tmp', 'fuzz_tesoreria.json')
+WORKER_JS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fuzz_tesoreria_worker.js')
+MAX_EJEMPLOS = 20  # Casos reducidos por bloque (la reduccion cuesta cientos de evaluaciones)
+
+METODOS_USD = ['Efectivo', 'Efectivo Divisa', 'Zelle', 'Binance']
+METODOS_BS = ['Efectivo (Bs)', 'Pago Móvil', 'Punto de Venta', 'Biopago', 'Transferencia']
+TASAS = [1, 36.5, 40.12, 199.99, 200, 345.678]
+
+
+class ReferenciaNoDisponible(RuntimeError):
+    pass
+
+
+# --- Generador ---
+
+def _monto(rnd):
+    r = rnd.random()
+    if r < 0.05:
+        return 0.01
+    if r < 0.15:
+        return rnd.randint(1, 100)
+    if r < 0.20:
+        return round(rnd.uniform(0.01, 50), 3)  # Mas decimales de los que guarda el POS
+    return round(rnd.uniform(0.01, 500), 2)
+
+
+def _pago(rnd, usd, tasa):
+    """Un pago por 'usd' dolares en un metodo al azar (Bs se expresa en Bs)."""
+    en_bs = rnd.random() < 0.45
+    metodo = rnd.choice(METODOS_BS if en_bs else METODOS_USD)
+    monto = round(usd * tasa, 2) if en_bs else round(usd, 2)
+    p = {rnd.choice(('monto', 'monto', 'amount', 'montoUSD')): monto, 'metodo': metodo}
+    r = rnd.random()
+    if r < 0.1:
+        p['tipo'] = 'BS' if en_bs else 'DIVISA'
+    elif r < 0.13:
+        p['medium'] = rnd.choice(('INTERNAL', 'CREDIT'))
+    elif r < 0.15:
+        p['tipo'] = rnd.choice(('WALLET', 'CREDITO'))
+    if rnd.random() < 0.05:
+        p['nombre'] = p.pop('metodo')
+    return p
+
+
+def generar_venta(rnd, vid):
+    tipo = 'COBRO_DEUDA' if rnd.random() < 0.2 else 'VENTA'
+    total = _monto(rnd)
+    tasa = rnd.choice(TASAS)
+    v = {"id": vid, "tipo": tipo, "total": total, "tasa": tasa}
+    r = rnd.random()
+    v['status'] = 'COMPLETADA' if r < 0.9 else ('ANULADA' if r < 0.95 else None)
+    if v['status'] is None:
+        del v['status']  # Registros legacy sin status
+    if rnd.random() < 0.02:
+        v['tipo'] = 'ANULADO'
+
+    deuda = 0
+    if tipo == 'VENTA' and rnd.random() < 0.35:
+        v['esCredito'] = True
+        deuda = rnd.choice((total, round(total * rnd.random(), 2), 0))
+        v['deudaPendiente'] = deuda
+    pagado = round(total - deuda, 2)
+
+    if rnd.random() < 0.1:
+        return v  # Legacy: sin array de pagos
+
+    partes = rnd.randint(1, 3)
+    cortes = sorted(round(pagado * rnd.random(), 2) for _ in range(partes - 1))
+    limites = [0] + cortes + [pagado]
+    v['pagos'] = [_pago(rnd, limites[i + 1] - limites[i], tasa) for i in range(partes)]
+
+    if rnd.random() < 0.2:
+        # Pago de mas con vuelto fisico (o a credito)
+        cambio = _monto(rnd)
+        v['pagos'].append({'metodo': 'Efectivo Divisa', 'monto': cambio})
+        v['cambio'] = cambio
+        r = rnd.random()
+        if r < 0.4:
+            v['distribucionVuelto'] = {'usd': cambio, 'bs': 0}
+        elif r < 0.7:
+            v['distribucionVuelto'] = {'usd': 0, 'bs': round(cambio * tasa, 2)}
+        elif r < 0.8:
+            v['vueltoCredito'] = True
+    return v
+
+
+def generar_caso(rnd, vid=1):
+    return [generar_venta(rnd, vid + i) for i in range(rnd.choice((1, 1, 1, 2, 3, 5)))]
+
+
+# --- Motores ---
+
+class ReferenciaEspejo:
+    """agruparPorMetodo segun el espejo Python (sin Node)."""
+    nombre = 'espejo'
+
+    def calcular(self, casos):
+        return [[{"name": k, "value": float(v)} for k, v in DashboardEngine().procesar(c).map_metodos.items()]
+                for c in casos]
+
+    def cerrar(self):
+        pass
+
+
+class ReferenciaJS:
+    """Worker Node persistente: un proceso por ReferenciaJS, lotes por stdin/stdout."""
+    nombre = 'js'
+
+    def __init__(self, worker=WORKER_JS):
+        if not shutil.which('node'):
+            raise ReferenciaNoDisponible("Node.js no esta instalado")
+        self.proc = subprocess.Popen(['node', worker], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     encoding='utf-8', bufsize=1 << 20)
+        self.lote = 0
+        saludo = json.loads(self.proc.stdout.readline() or '{"error": "el worker no respondio"}')
+        if 'error' in saludo:
+            self.cerrar()
+            raise ReferenciaNoDisponible(f"{saludo['error']} (ejecutar 'npm install')")
+
+    def calcular(self, casos):
+        self.lote += 1
+        self.proc.stdin.write(json.dumps({"lote": self.lote, "casos": casos}) + '\n')
+        self.proc.stdin.flush()
+        resp = json.loads(self.proc.stdout.readline())
+        assert resp["lote"] == self.lote, "Worker desincronizado"
+        return resp["resultados"]
+
+    def cerrar(self):
+        if self.proc.stdin:
+            self.proc.stdin.close()
+        self.proc.wait(timeout=10)
+
+
+def crear_referencia(nombre):
+    return ReferenciaJS() if nombre == 'js' else ReferenciaEspejo()
+
+
+# --- Comparacion ---
+
+def _pie_centavos(resultado):
+    return {r["name"]: centavos(r["value"]) for r in resultado}
+
+
+def discrepancias(caso, resultado, referencia):
+    """Lista de chequeos fallidos para un caso, dado el Pie de la referencia."""
+    if isinstance(resultado, dict) and 'error' in resultado:
+        return [{"chequeo": 'excepcion', "detalle": resultado['error']}]
+    fallas = []
+    pie_ref = _pie_centavos(resultado)
+    if referencia == 'js':
+        pie_py = {k: v.c for k, v in DashboardEngine().procesar(caso).map_metodos.items()}
+        if pie_py != pie_ref:
+            dif = {k: (pie_py.get(k), pie_ref.get(k)) for k in sorted(set(pie_py) | set(pie_ref))
+                   if pie_py.get(k) != pie_ref.get(k)}
+            fallas.append({"chequeo": 'pie', "detalle": {k: {"python": a, "js": b} for k, (a, b) in dif.items()}})
+
+    engine = TreasuryEngine()
+    for v in caso:
+        engine.procesar_transaccion(v)
+    recaudado_pie = sum(c for k, c in pie_ref.items() if k != 'Crédito')
+    # Cada pago en Bs y cada metodo del Pie redondean por separado: hasta 1 centavo por cada uno
+    pagos = sum(len(v['pagos']) for v in caso if isinstance(v.get('pagos'), list))
+    if abs(engine.recaudado.c - recaudado_pie) > max(1, len(pie_ref) + pagos):
+        fallas.append({"chequeo": 'recaudado',
+                       "detalle": {"treasury": engine.recaudado.c, "pie": recaudado_pie}})
+    return fallas
+
+
+# --- Reduccion (shrinking) ---
+
+# Claves que definen la venta; quitarlas cambia el caso, no lo simplifica
+FIJAS_VENTA = {'id', 'total', 'tasa', 'status'}  # Sin status es otra causa (legacy)
+FIJAS_PAGO = {'metodo', 'nombre', 'monto', 'amount', 'montoUSD'}
+
+
+def _simplificaciones(caso):
+    """Candidatos mas simples: menos ventas, menos pagos y menos claves opcionales."""
+    if len(caso) > 1:
+        for i in range(len(caso)):
+            yield caso[:i] + caso[i + 1:]
+    for i, v in enumerate(caso):
+        def con(nueva, i=i):
+            return caso[:i] + [nueva] + caso[i + 1:]
+        for j in range(len(v.get('pagos') or [])):
+            nueva = copy.deepcopy(v)
+            pago = nueva['pagos'].pop(j)
+            yield con(nueva)
+            # El mismo pago fuera, descontado del total: la venta sigue cuadrando
+            usd = redondear(_usd_fino(pago, v.get('tasa') or 1), FINO)
+            if 0 < usd <= centavos(v.get('total')):
+                yield con({**nueva, 'total': (centavos(v.get('total')) - usd) / 100})
+        for k in v:
+            if k not in FIJAS_VENTA:
+                yield con({c: x for c, x in v.items() if c != k})
+        for j, p in enumerate(v.get('pagos') or []):
+            for k in p:
+                if k not in FIJAS_PAGO:
+                    nueva = copy.deepcopy(v)
+                    del nueva['pagos'][j][k]
+                    yield con(nueva)
+
+
+def _usd_fino(pago, tasa):
+    f = finos(pago.get('monto') or pago.get('montoUSD') or pago.get('amount') or 0)
+    return fino_bs_a_usd(f, tasa) if tipo_moneda(pago) == 'BS' else f
+
+
+def coherente(venta):
+    """
+    Pagos (Bs a la tasa de la venta) + deuda == total + vuelto, a 1 centavo por
+    pago. Una venta incoherente hace discrepar a los motores por construccion.
+    """
+    pagos = venta.get('pagos')
+    if not isinstance(pagos, list) or not pagos:
+        return True
+    fino = sum(_usd_fino(p, venta.get('tasa') or 1) for p in pagos)
+    deuda = centavos(venta.get('deudaPendiente') or 0) if venta.get('esCredito') else 0
+    esperado = centavos(venta.get('total') or 0) - deuda + centavos(venta.get('cambio') or 0)
+    return abs(fino - esperado * FINO) <= len(pagos) * FINO
+
+
+def encoger(caso, falla, max_evaluaciones=3000):
+    """
+    Reduccion voraz: aplica la primera simplificacion que siga fallando, hasta
+    el punto fijo. Si el caso original era coherente, los candidatos tambien
+    deben serlo (quitar un pago o el total no es la causa, solo la esconde).
+    """
+    exigir = all(coherente(v) for v in caso)
+    actual, evaluaciones = caso, 0
+    mejoro = True
+    while mejoro and evaluaciones < max_evaluaciones:
+        mejoro = False
+        for candidato in _simplificaciones(actual):
+            if exigir and not all(coherente(v) for v in candidato):
+                continue
+            evaluaciones += 1
+            if falla(candidato):
+                actual, mejoro = candidato, True
+                break
+            if evaluaciones >= max_evaluaciones:
+                break
+    return actual
+
+
+def _forma(venta):
+    """Rasgos que cambian la logica (no los montos ni que campo trae el monto)."""
+    rasgos = [f"{k}={venta.get(k, '<falta>')}" for k in ('tipo', 'status') if k in venta or k == 'status']
+    rasgos += [k for k in ('esCredito', 'cambio', 'vueltoCredito') if venta.get(k)]
+    dist = venta.get('distribucionVuelto') or {}
+    rasgos += [f"vuelto_{k}" for k in ('usd', 'bs') if dist.get(k)]
+    pagos = venta.get('pagos') if isinstance(venta.get('pagos'), list) else []
+    marcas = sorted({f"{k}={p[k]}" for p in pagos for k in ('medium', 'tipo') if k in p})
+    if pagos:
+        rasgos.append(f"pagos[{','.join(marcas)}]")
+    return ' '.join(rasgos)
+
+
+def _firma(chequeo, minimo):
+    """Misma causa raiz = mismo chequeo y misma forma del caso minimo (claves, tipo y status)."""
+    return f"{chequeo}: " + ' | '.join(sorted({_forma(v) for v in minimo}))
+
+
+# --- Corrida ---
+
+def fuzz_bloque(args):
+    """Worker del pool: (semilla, bloque, casos, tam_lote, referencia) -> resumen parcial."""
+    semilla, bloque, n, tam_lote, nombre_ref = args
+    rnd = random.Random(f"{semilla}:{bloque}")
+    ref = crear_referencia(nombre_ref)
+    conteo, ejemplos, revisados = {}, {}, 0
+    try:
+        while revisados < n:
+            casos = [generar_caso(rnd) for _ in range(min(tam_lote, n - revisados))]
+            for caso, res in zip(casos, ref.calcular(casos)):
+                for f in discrepancias(caso, res, ref.nombre):
+                    conteo[f["chequeo"]] = conteo.get(f["chequeo"], 0) + 1
+                    if len(ejemplos) >= MAX_EJEMPLOS:
+                        continue
+                    chequeo = f["chequeo"]
+                    def sigue_fallando(c):
+                        return any(x["chequeo"] == chequeo for x in discrepancias(c, ref.calcular([c])[0], ref.nombre))
+                    minimo = encoger(caso, sigue_fallando)
+                    falla_min = next(x for x in discrepancias(minimo, ref.calcular([minimo])[0], ref.nombre)
+                                     if x["chequeo"] == chequeo)
+                    ejemplos.setdefault(_firma(chequeo, minimo), {"chequeo": chequeo, "caso": minimo,
+                                                            "detalle": falla_min["detalle"], "original": caso})
+            revisados += len(casos)
+    finally:
+        ref.cerrar()
+    return {"casos": revisados, "conteo": conteo, "ejemplos": ejemplos}
+
+
+def fuzz(casos, procesos=None, semilla=0, tam_lote=2000, referencia='js', bloque=50_000):
+    procesos = procesos or os.cpu_count() or 1
+    tareas = [(semilla, i, min(bloque, casos - i * bloque), tam_lote, referencia)
+              for i in range((casos + bloque - 1) // bloque)]
+    total = {"casos": 0, "conteo": {}, "ejemplos": {}, "referencia": referencia, "semilla": semilla}
+    t0 = time.perf_counter()
+    if procesos == 1:
+        parciales = map(fuzz_bloque, tareas)
+    else:
+        pool = ProcessPoolExecutor(procesos)
+        parciales = (f.result() for f in as_completed([pool.submit(fuzz_bloque, t) for t in tareas]))
+    for p in parciales:
+        total["casos"] += p["casos"]
+        for k, c in p["conteo"].items():
+            total["conteo"][k] = total["conteo"].get(k, 0) + c
+        for firma, ej in p["ejemplos"].items():
+            # El ejemplo mas chico por firma
+            previo = total["ejemplos"].get(firma)
+            if previo is None or len(json.dumps(ej["caso"])) < len(json.dumps(previo["caso"])):
+                total["ejemplos"][firma] = ej
+    if procesos != 1:
+        pool.shutdown()
+    total["segundos"] = round(time.perf_counter() - t0, 2)
+    total["casos_por_s"] = round(total["casos"] / total["segundos"]) if total["segundos"] else None
+    return total
+
+
+def run_tests():
+    # Generador determinista por semilla
+    assert generar_caso(random.Random(7)) == generar_caso(random.Random(7))
+
+    # Un caso consistente: Treasury y el Pie coinciden
+    venta = {"id": 1, "tipo": "VENTA", "status": "COMPLETADA", "total": 10, "tasa": 40,
+             "pagos": [{"metodo": "Pago Móvil", "monto": 200}, {"metodo": "Zelle", "monto": 5}]}
+    ref = ReferenciaEspejo()
+    assert discrepancias([venta], ref.calcular([[venta]])[0], 'espejo') == []
+
+    # Venta legacy sin status: TreasuryEngine la cuenta, isValidCashFlow no
+    sin_status = {k: v for k, v in venta.items() if k != 'status'}
+    fallas = discrepancias([sin_status], ref.calcular([[sin_status]])[0], 'espejo')
+    assert [f["chequeo"] for f in fallas] == ['recaudado'], fallas
+
+    # Reduccion: de un caso ruidoso queda solo lo necesario para fallar
+    ruido = [dict(venta, id=2), dict(sin_status, pagos=venta["pagos"] + [{"metodo": "Efectivo", "monto": 3}],
+                                     cambio=3, distribucionVuelto={"usd": 3, "bs": 0})]
+    def falla(c):
+        return any(f["chequeo"] == 'recaudado' for f in discrepancias(c, ref.calcular([c])[0], 'espejo'))
+    minimo = encoger(ruido, falla)
+    assert len(minimo) == 1 and 'status' not in minimo[0] and falla(minimo) and len(minimo[0]) <= 3, minimo
+
+    # El Pie de la referencia JS se compara metodo a metodo contra el espejo
+    pie_mal = [{"name": "Pago Móvil", "value": 5.0}, {"name": "Zelle", "value": 5.0}, {"name": "Otros", "value": 0}]
+    assert [f["chequeo"] for f in discrepancias([venta], pie_mal, 'js')] == ['pie']
+
+    res = fuzz(300, procesos=1, semilla=1, tam_lote=100, referencia='espejo')
+    assert res["casos"] == 300 and all(e["caso"] for e in res["ejemplos"].values())
+    print("[OK] PRUEBAS EXITOSAS")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuzzer diferencial TreasuryEngine vs treasuryEngine.js")
+    parser.add_argument("--casos", type=int, default=1_000_000)
+    parser.add_argument("--procesos", type=int, default=None, help="Por defecto: todos los nucleos")
+    parser.add_argument("--lote", type=int, default=2000, help="Casos por mensaje al worker Node")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--referencia", choices=('js', 'espejo'), default='js')
+    parser.add_argument("--salida", default=SALIDA_DEFAULT)
+    args = parser.parse_args()
+
+    try:
+        crear_referencia(args.referencia).cerrar()
+    except ReferenciaNoDisponible as e:
+        print(f"[ERROR] Referencia JS no disponible: {e}")
+        print("        Usar --referencia espejo para correr solo el chequeo 'recaudado'.")
+        exit(2)
+
+    res = fuzz(args.casos, args.procesos, args.semilla, args.lote, args.referencia)
+    os.makedirs(os.path.dirname(args.salida) or '.', exist_ok=True)
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(res, f, indent=2, ensure_ascii=False)
+
+    print(f"Casos: {res['casos']:,} en {res['segundos']}s ({res['casos_por_s']:,}/s) | referencia: {res['referencia']}")
+    for chequeo, n in sorted(res["conteo"].items()):
+        print(f"  - {chequeo}: {n:,} casos en desacuerdo")
+    for firma, ej in sorted(res["ejemplos"].items()):
+        print(f"[FAIL] {firma}")
+        print(f"       caso minimo: {json.dumps(ej['caso'], ensure_ascii=True)}")
+        print(f"       detalle:     {json.dumps(ej['detalle'], ensure_ascii=True)}")
+    print(f"Reporte: {args.salida}")
+    exit(1 if res["conteo"] else 0)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        run_tests()
+        exit(0)
+    main()
@@ -0,0 +1,43 @@
+// Script: fuzz_tesoreria_worker.js
+// Objetivo: Worker persistente para scripts/fuzz_tesoreria.py.
+// Carga src/utils/reports/treasuryEngine.js UNA vez y responde lotes NDJSON:
+//   stdin : {"lote": n, "casos": [[venta, ...], ...]}
+//   stdout: {"lote": n, "resultados": [agruparPorMetodo(caso), ...]}
+// Requiere `npm install` (decimal.js).
+import { register } from 'node:module';
+import readline from 'node:readline';
+
+// Vite resuelve imports sin extension ('../../types/financial'); Node ESM no.
+register('data:text/javascript,' + encodeURIComponent(`
+export async function resolve(spec, ctx, next) {
+    try {
+        return await next(spec, ctx);
+    } catch (e) {
+        if (e.code === 'ERR_MODULE_NOT_FOUND' && /^\\.\\.?\\//.test(spec) && !/\\.[cm]?js$/.test(spec)) {
+            return next(spec + '.js', ctx);
+        }
+        throw e;
+    }
+}`), import.meta.url);
+
+let motor;
+try {
+    motor = await import('../src/utils/reports/treasuryEngine.js');
+} catch (e) {
+    process.stdout.write(JSON.stringify({ error: String(e.message || e) }) + '\n');
+    process.exit(1);
+}
+process.stdout.write(JSON.stringify({ listo: true }) + '\n');
+
+const rl = readline.createInterface({ input: process.stdin });
+for await (const linea of rl) {
+    const { lote, casos } = JSON.parse(linea);
+    const resultados = casos.map(ventas => {
+        try {
+            return motor.agruparPorMetodo(ventas);
+        } catch (e) {
+            return { error: String(e.message || e) };
+        }
+    });
+    process.stdout.write(JSON.stringify({ lote, resultados }) + '\n');
+}
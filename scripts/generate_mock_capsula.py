@@ -0,0 +1,376 @@
+# scripts/generate_mock_capsula.py
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+# DIRECTIVA: Datos de Carga (Capsula de Tiempo sintetica)
+# Genera un respaldo 'v2-unified' a escala de produccion (1M+ productos) con
+# productos, ventas, clientes, logs (Kardex) y cortes coherentes entre si:
+#   - productos.stock == ultimo logs.stockFinal de cada productId
+#   - clientes.deuda == fiados - abonos (FinancialController)
+#   - cortes.totalVentas / metodosPago == TreasuryEngine por corteId
+# Todo se genera por bloques con NumPy (semilla fija = archivo identico) y
+# cada tabla se escribe en su propio archivo temporal; la memoria depende del
+# numero de productos y clientes, no del numero de ventas.
+
+CATEGORIES = ['ALIMENTOS', 'BEBIDAS', 'SNACKS', 'LIMPIEZA', 'PERSONAL', 'HOGAR']
+METODOS = [('Efectivo Divisa', 'DIVISA'), ('Zelle', 'DIVISA'), ('Pago Móvil', 'BS'),
+           ('Punto de Venta', 'BS'), ('Efectivo Bs', 'BS')]
+PESOS_METODOS = [0.35, 0.10, 0.30, 0.20, 0.05]
+# Orden de db.tables (src/db.js), el mismo que produce generarCapsulaDeTiempo
+TABLAS = ('productos', 'ventas', 'clientes', 'config', 'logs',
+          'tickets_espera', 'outbox', 'cortes', 'caja_sesion')
+
+DIA_MS = 86_400_000
+CAJA = 'caja-1'
+P_CREDITO, P_ABONO, P_ANULADA = 0.05, 0.03, 0.02
+TAM_BLOQUE = 10_000
+
+
+def iso(ts):
+    """epoch ms (escalar o array) -> ISO 8601 con 'Z', como timeProvider.toISOString."""
+    fechas = np.datetime_as_string(np.asarray(ts, dtype='int64').astype('datetime64[ms]'), unit='ms')
+    return np.char.add(fechas, 'Z').tolist()
+
+
+def generar_productos(rng, inicio, n):
+    """Bloque de productos con id inicio..inicio+n-1. Montos en centavos (margen 30-60%)."""
+    costo = rng.integers(50, 2001, n)
+    return {
+        "id": np.arange(inicio, inicio + n),
+        "categoria": rng.integers(0, len(CATEGORIES), n),
+        "costo": costo,
+        "precio": np.rint(costo * rng.uniform(1.3, 1.6, n)).astype(np.int64),
+        "stock": rng.integers(0, 151, n),
+    }
+
+
+def nombre_producto(pid, categoria):
+    return f"PRODUCTO {pid} - {CATEGORIES[categoria]}"
+
+
+class _Parte:
+    """Arreglo JSON de una tabla, escrito por bloques en un archivo temporal."""
+
+    def __init__(self, carpeta, tabla):
+        self.ruta = os.path.join(carpeta, tabla + '.part')
+        self.archivo = open(self.ruta, 'w', encoding='utf-8')
+        self.filas = 0
+
+    def escribir(self, registros):
+        texto = ','.join(json.dumps(r, separators=(',', ':')) for r in registros)
+        if not texto:
+            return
+        if self.filas:
+            self.archivo.write(',')
+        self.archivo.write(texto)
+        self.filas += len(registros)
+
+    def cerrar(self):
+        self.archivo.close()
+
+
+class GeneradorCapsula:
+
+    def __init__(self, productos=1_000_000, ventas=1_000_000, clientes=5_000, dias=90,
+                 semilla=42, inicio='2026-01-01', tam_bloque=TAM_BLOQUE):
+        if ventas > dias * DIA_MS // 2:
+            raise ValueError("Demasiadas ventas para el rango de dias (ids por milisegundo).")
+        self.n_productos, self.n_ventas, self.n_clientes = productos, ventas, clientes
+        self.dias, self.semilla, self.tam = dias, semilla, tam_bloque
+        self.rng = np.random.default_rng(semilla)
+        self.t0 = int(np.datetime64(inicio, 'ms').astype(np.int64))
+        # Tasa Bs/USD: caminata aleatoria diaria con deriva positiva
+        self.tasas = np.round(36 * np.exp(np.cumsum(self.rng.normal(0.002, 0.004, dias))), 2)
+
+        # Estado O(productos + clientes)
+        self.categoria = np.empty(productos, dtype=np.int64)
+        self.costo = np.empty(productos, dtype=np.int64)
+        self.precio = np.empty(productos, dtype=np.int64)
+        self.stock = np.empty(productos, dtype=np.int64)
+        self.deuda = [0] * (clientes + 1)   # centavos, indice = clienteId
+        self.deudores = []                  # clienteIds con deuda > 0 (swap-remove)
+        self.pos_deudor = {}
+        self.log_id = 0
+        self.correlativo = 0
+        self.dia_abierto = None
+        self.acum = None
+
+    # --- Clientes con deuda (seleccion O(1)) ---
+
+    def _agregar_deudor(self, cid):
+        if cid not in self.pos_deudor:
+            self.pos_deudor[cid] = len(self.deudores)
+            self.deudores.append(cid)
+
+    def _quitar_deudor(self, cid):
+        i = self.pos_deudor.pop(cid)
+        ultimo = self.deudores.pop()
+        if ultimo != cid:
+            self.deudores[i] = ultimo
+            self.pos_deudor[ultimo] = i
+
+    # --- Cortes Z (uno por dia; el ultimo dia queda como sesion abierta) ---
+
+    def _corte_ref(self, dia):
+        return None if dia == self.dias - 1 else f"Z-{dia:06d}"
+
+    def _acumular(self, dia, cortes_parte):
+        if dia != self.dia_abierto:
+            self._cerrar_dia(cortes_parte)
+            self.dia_abierto = dia
+            self.acum = {"brutas": 0, "credito": 0, "metodos": {}, "ventas": 0}
+        return self.acum
+
+    def _cerrar_dia(self, cortes_parte):
+        dia, acum = self.dia_abierto, self.acum
+        if dia is None or self._corte_ref(dia) is None:
+            return
+        cierre = self.t0 + (dia + 1) * DIA_MS - 1
+        metodos = [{"name": k, "value": v / 100} for k, v in sorted(acum["metodos"].items())]
+        if acum["credito"]:
+            metodos.append({"name": 'Crédito', "value": acum["credito"] / 100})
+        cortes_parte.escribir([{
+            "id": f"Z-{cierre}",
+            "corteRef": self._corte_ref(dia),
+            "fecha": iso(cierre),
+            "idApertura": f"AP-{self.t0 + dia * DIA_MS}",
+            "cajaId": CAJA,
+            "tasaReferencia": float(self.tasas[dia]),
+            "totalVentas": acum["brutas"] / 100,
+            "metodosPago": metodos,
+            "ventasCount": acum["ventas"],
+        }])
+
+    # --- Bloques ---
+
+    def _logs_iniciales(self, logs, ids, fecha):
+        filas = []
+        for pid, cat, stock in zip(ids.tolist(), self.categoria[ids - 1].tolist(), self.stock[ids - 1].tolist()):
+            self.log_id += 1
+            filas.append({
+                "id": self.log_id, "fecha": fecha, "tipo": 'ENTRADA_INICIAL', "productId": pid,
+                "producto": nombre_producto(pid, cat), "cantidad": stock, "stockFinal": stock,
+                "referencia": 'INICIO', "detalle": 'Stock Inicial', "usuarioId": 'sys', "usuarioNombre": 'Sistema',
+            })
+        logs.escribir(filas)
+
+    def _bloque_ventas(self, inicio, n, partes):
+        rng = self.rng
+        # ids = timeProvider.timestamp(): estrictamente crecientes dentro de [t0, t0 + dias)
+        paso = self.dias * DIA_MS // self.n_ventas
+        idx = np.arange(inicio, inicio + n, dtype=np.int64)
+        ts = self.t0 + idx * paso + rng.integers(0, paso, n)
+        dia = (ts - self.t0) // DIA_MS
+        tasa = self.tasas[dia]
+        fechas = iso(ts)
+
+        sorteo = rng.random(n)
+        credito = sorteo < P_CREDITO
+        abono = (sorteo >= P_CREDITO) & (sorteo < P_CREDITO + P_ABONO)
+        anulada = (sorteo >= P_CREDITO + P_ABONO) & (sorteo < P_CREDITO + P_ABONO + P_ANULADA)
+        cliente = rng.integers(1, self.n_clientes + 1, n)
+        fraccion = rng.uniform(0.2, 1.25, n)      # >= 1 liquida la deuda
+        elegido = rng.random(n)
+        metodo = rng.choice(len(METODOS), n, p=PESOS_METODOS)
+
+        n_items = rng.integers(1, 6, n)
+        venta_de_item = np.repeat(np.arange(n), n_items)
+        pid = rng.integers(1, self.n_productos + 1, len(venta_de_item))
+        cant = rng.integers(1, 4, len(venta_de_item))
+        subtotal = self.precio[pid - 1] * cant
+        total = np.bincount(venta_de_item, weights=subtotal, minlength=n).astype(np.int64)
+
+        # Abonos: orden estricto por id contra la deuda viva de cada cliente
+        monto_abono = np.zeros(n, dtype=np.int64)
+        for i in np.flatnonzero(credito | abono).tolist():
+            if credito[i]:
+                cid = int(cliente[i])
+                self.deuda[cid] += int(total[i])
+                self._agregar_deudor(cid)
+            elif self.deudores:
+                cid = self.deudores[int(elegido[i] * len(self.deudores))]
+                cliente[i] = cid
+                monto = min(self.deuda[cid], max(1, int(self.deuda[cid] * fraccion[i])))
+                monto_abono[i] = monto
+                self.deuda[cid] -= monto
+                if not self.deuda[cid]:
+                    self._quitar_deudor(cid)
+            else:
+                abono[i] = False  # Sin deudores: queda como venta de contado
+        efectiva = ~abono & ~anulada
+
+        # Kardex: stockFinal corrido por producto, en orden de venta
+        item_ok = efectiva[venta_de_item]
+        p, q = pid[item_ok] - 1, cant[item_ok]
+        orden = np.argsort(p, kind='stable')
+        ps, qs = p[orden], q[orden]
+        acum = np.cumsum(qs)
+        cortes_grupo = np.flatnonzero(np.r_[True, ps[1:] != ps[:-1]]) if len(ps) else np.array([], dtype=np.int64)
+        base = np.repeat(acum[cortes_grupo] - qs[cortes_grupo], np.diff(np.r_[cortes_grupo, len(ps)]))
+        stock_final = np.empty(len(ps), dtype=np.int64)
+        stock_final[orden] = self.stock[ps] - (acum - base)
+        self.stock -= np.bincount(p, weights=q, minlength=self.n_productos).astype(np.int64)
+
+        # Serializacion (unico paso por fila)
+        ventas, logs = [], []
+        items_py = list(zip(pid.tolist(), cant.tolist(), self.precio[pid - 1].tolist(),
+                            self.costo[pid - 1].tolist(), self.categoria[pid - 1].tolist()))
+        finales = iter(stock_final.tolist())
+        pos = 0
+        filas = zip(ts.tolist(), fechas, dia.tolist(), tasa.tolist(), total.tolist(), monto_abono.tolist(),
+                    n_items.tolist(), metodo.tolist(), cliente.tolist(),
+                    credito.tolist(), abono.tolist(), anulada.tolist())
+        for t, fecha, dd, tasa_d, tot, m_abono, k, met, cid, es_credito, es_abono, es_anulada in filas:
+            propios = items_py[pos:pos + k]
+            pos += k
+            self.correlativo += 1
+            acum_dia = self._acumular(dd, partes['cortes'])
+            nombre_met, tipo_met = METODOS[met]
+            es_bs = tipo_met == 'BS'
+            venta = {
+                "id": t, "idVenta": f"F-{self.correlativo:08d}", "fecha": fecha,
+                "tipo": 'COBRO_DEUDA' if es_abono else 'VENTA', "status": 'ANULADA' if es_anulada else 'COMPLETADA',
+                "corteId": None if es_anulada else self._corte_ref(dd), "cajaId": CAJA, "tasa": tasa_d,
+            }
+            if es_abono:
+                usd = m_abono / 100
+                nominal = round(usd * tasa_d, 2) if es_bs else usd
+                venta.update({
+                    "total": usd, "clienteId": cid, "clienteNombre": f"CLIENTE {cid}", "items": [],
+                    "metodos": [{"metodo": nombre_met, "monto": nominal, "montoUSD": usd,
+                                 "currency": 'VES' if es_bs else 'USD', "tipo": tipo_met}],
+                    "pagos": [{"metodo": nombre_met, "amount": nominal, "monto": nominal,
+                               "currency": 'VES' if es_bs else 'USD', "rate": tasa_d}],
+                })
+                venta["payments"] = venta["pagos"]
+                acum_dia["metodos"][nombre_met] = acum_dia["metodos"].get(nombre_met, 0) + m_abono
+                ventas.append(venta)
+                continue
+
+            usd = tot / 100
+            venta["items"] = [{"id": i_pid, "nombre": nombre_producto(i_pid, i_cat), "cantidad": i_cant,
+                               "precio": i_precio / 100, "costo": i_costo / 100}
+                              for i_pid, i_cant, i_precio, i_costo, i_cat in propios]
+            venta["total"] = usd
+            venta["totalBS"] = round(usd * tasa_d, 2)
+            if es_credito:
+                venta.update({"esCredito": True, "deudaPendiente": usd, "clienteId": cid,
+                              "clienteNombre": f"CLIENTE {cid}", "pagos": [], "payments": []})
+            else:
+                nominal = venta["totalBS"] if es_bs else usd
+                venta.update({
+                    "esCredito": False, "deudaPendiente": 0, "clienteId": None,
+                    "pagos": [{"metodo": nombre_met, "monto": nominal, "tipo": tipo_met}],
+                    "payments": [{"method": nombre_met, "amount": nominal, "currency": 'VES' if es_bs else 'USD',
+                                  "medium": 'CASH' if 'Efectivo' in nombre_met else 'DIGITAL', "rate": tasa_d}],
+                })
+            ventas.append(venta)
+            if es_anulada:
+                continue
+
+            acum_dia["brutas"] += tot
+            acum_dia["ventas"] += 1
+            if es_credito:
+                acum_dia["credito"] += tot
+            else:
+                acum_dia["metodos"][nombre_met] = acum_dia["metodos"].get(nombre_met, 0) + tot
+            for i_pid, i_cant, _, _, i_cat in propios:
+                self.log_id += 1
+                logs.append({
+                    "id": self.log_id, "fecha": fecha, "tipo": 'SALIDA_VENTA', "productId": i_pid,
+                    "producto": nombre_producto(i_pid, i_cat), "cantidad": i_cant, "stockFinal": next(finales),
+                    "referencia": venta["idVenta"], "detalle": 'Venta', "usuarioId": 'sys',
+                    "usuarioNombre": 'Sistema', "meta": {"tasaSnapshot": tasa_d},
+                })
+        partes['ventas'].escribir(ventas)
+        partes['logs'].escribir(logs)
+
+    def _productos(self, parte):
+        for inicio in range(0, self.n_productos, self.tam):
+            fin = min(inicio + self.tam, self.n_productos)
+            parte.escribir([
+                {"id": i + 1, "codigo": f"IMP-{i + 1:03d}", "nombre": nombre_producto(i + 1, cat),
+                 "categoria": CATEGORIES[cat], "costo": costo / 100, "precio": precio / 100,
+                 "stock": stock, "minimo": 10, "tipoUnidad": 'unidad'}
+                for i, cat, costo, precio, stock in zip(
+                    range(inicio, fin), self.categoria[inicio:fin].tolist(), self.costo[inicio:fin].tolist(),
+                    self.precio[inicio:fin].tolist(), self.stock[inicio:fin].tolist())
+            ])
+
+    def _clientes(self, parte):
+        for inicio in range(1, self.n_clientes + 1, self.tam):
+            fin = min(inicio + self.tam, self.n_clientes + 1)
+            parte.escribir([
+                {"id": cid, "nombre": f"CLIENTE {cid}", "documento": f"V-{10_000_000 + cid}",
+                 "deuda": self.deuda[cid] / 100, "favor": 0}
+                for cid in range(inicio, fin)
+            ])
+
+    def escribir(self, salida):
+        carpeta_salida = os.path.dirname(os.path.abspath(salida))
+        os.makedirs(carpeta_salida, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=carpeta_salida) as tmp:
+            partes = {t: _Parte(tmp, t) for t in TABLAS}
+
+            for inicio in range(0, self.n_productos, self.tam):
+                bloque = generar_productos(self.rng, inicio + 1, min(self.tam, self.n_productos - inicio))
+                fin = inicio + len(bloque["id"])
+                for campo in ("categoria", "costo", "precio", "stock"):
+                    getattr(self, campo)[inicio:fin] = bloque[campo]
+                self._logs_iniciales(partes['logs'], bloque["id"], iso(self.t0 - DIA_MS))
+
+            for inicio in range(0, self.n_ventas, self.tam):
+                self._bloque_ventas(inicio, min(self.tam, self.n_ventas - inicio), partes)
+            self._cerrar_dia(partes['cortes'])
+
+            self._productos(partes['productos'])
+            self._clientes(partes['clientes'])
+            partes['config'].escribir([{"key": 'general', "tasa": float(self.tasas[-1])}])
+            apertura = self.t0 + (self.dias - 1) * DIA_MS
+            partes['caja_sesion'].escribir([{"key": CAJA, "isAbierta": True, "idApertura": f"AP-{apertura}",
+                                             "fechaApertura": iso(apertura)}])
+            for parte in partes.values():
+                parte.cerrar()
+            self._ensamblar(salida, partes)
+        return {t: p.filas for t, p in partes.items()}
+
+    def _ensamblar(self, salida, partes):
+        meta = {"version_software": '1.4.0', "fecha": iso(self.t0 + self.dias * DIA_MS), "origen": 'LISTO_POS',
+                "schema_version": 'v2-unified', "terminal": 'MOCK', "semilla": self.semilla}
+        with open(salida, 'w', encoding='utf-8') as f:
+            f.write('{"dexie":{')
+            for i, tabla in enumerate(TABLAS):
+                f.write(f'{"," if i else ""}"{tabla}":[')
+                with open(partes[tabla].ruta, encoding='utf-8') as parte:
+                    shutil.copyfileobj(parte, f, 1 << 20)
+                f.write(']')
+            f.write('},"localStorage":{},"_meta":')
+            f.write(json.dumps(meta, separators=(',', ':')))
+            f.write('}')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generador de Capsulas de Tiempo sinteticas para pruebas de carga")
+    parser.add_argument("--productos", type=int, default=1_000_000)
+    parser.add_argument("--ventas", type=int, default=1_000_000)
+    parser.add_argument("--clientes", type=int, default=5_000)
+    parser.add_argument("--dias", type=int, default=90, help="Dias de operacion (un Corte Z por dia)")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--inicio", default='2026-01-01', help="Fecha del primer dia (YYYY-MM-DD)")
+    parser.add_argument("--salida", default=os.path.join('.tmp', 'mock_capsula.json'))
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    filas = GeneradorCapsula(args.productos, args.ventas, args.clientes, args.dias,
+                             args.semilla, args.inicio).escribir(args.salida)
+    mb = os.path.getsize(args.salida) / 1e6
+    print(f"SUCCESS: {args.salida} ({mb:,.1f} MB) en {time.perf_counter() - t0:.1f}s")
+    for tabla, n in filas.items():
+        if n:
+            print(f"  - {tabla}: {n:,}")
@@ -1,38 +1,58 @@
-import pandas as pd
-import random
+import argparse
+import csv
+
+import numpy as np
+
+from generate_mock_capsula import CATEGORIES, TAM_BLOQUE, generar_productos
 
 # Configuration
 TOTAL_PRODUCTS = 300
-CATEGORIES = ['ALIMENTOS', 'BEBIDAS', 'SNACKS', 'LIMPIEZA', 'PERSONAL', 'HOGAR']
-
-def generate_data():
-    data = []
-    for i in range(1, TOTAL_PRODUCTS + 1):
-        cat = random.choice(CATEGORIES)
-        cost = round(random.uniform(0.5, 20.0), 2)
-        price = round(cost * random.uniform(1.3, 1.6), 2) # 30-60% margin
-        stock = random.randint(0, 150)
-        
-        item = {
-            "codigo": f"IMP-{i:03d}",
-            "nombre": f"PRODUCTO IMPORTADO {i} - {cat}",
-            "categoria": cat,
-            "costo": cost,
-            "precio": price,
-            "stock": stock,
-            "minimo": 10
-        }
-        data.append(item)
-    return data
+COLUMNS = ["codigo", "nombre", "categoria", "costo", "precio", "stock", "minimo"]
+XLSX_MAX_ROWS = 1_048_575  # 1,048,576 filas por hoja menos el encabezado
+
+def generate_data(total=TOTAL_PRODUCTS, seed=None, chunk=TAM_BLOQUE):
+    """Filas del Excel de importacion, generadas por bloques (memoria constante)."""
+    rng = np.random.default_rng(seed)
+    for start in range(0, total, chunk):
+        block = generar_productos(rng, start + 1, min(chunk, total - start))
+        for i, cat, cost, price, stock in zip(block["id"].tolist(), block["categoria"].tolist(),
+                                              block["costo"].tolist(), block["precio"].tolist(),
+                                              block["stock"].tolist()):
+            yield [f"IMP-{i:03d}", f"PRODUCTO IMPORTADO {i} - {CATEGORIES[cat]}", CATEGORIES[cat],
+                   cost / 100, price / 100, stock, 10]
+
+def write_csv(filename, rows):
+    with open(filename, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(rows)
+
+def write_xlsx(filename, rows):
+    from openpyxl import Workbook
+    # write_only: las filas se vuelcan a disco a medida que llegan
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Productos")
+    ws.append(COLUMNS)
+    for row in rows:
+        ws.append(row)
+    wb.save(filename)
 
 def main():
+    parser = argparse.ArgumentParser(description="Excel/CSV de productos para probar la importacion masiva")
+    parser.add_argument("--total", type=int, default=TOTAL_PRODUCTS)
+    parser.add_argument("--seed", type=int, default=None, help="Semilla (misma semilla = mismo archivo)")
+    parser.add_argument("--format", choices=("xlsx", "csv"), default="xlsx")
+    args = parser.parse_args()
+
     try:
-        df = pd.DataFrame(generate_data())
-        filename = "mock_products_300.xlsx"
-        df.to_excel(filename, index=False)
-        print(f"SUCCESS: Generated {filename} with {TOTAL_PRODUCTS} products.")
+        if args.format == "xlsx" and args.total > XLSX_MAX_ROWS:
+            raise ValueError(f"XLSX admite maximo {XLSX_MAX_ROWS:,} productos; use --format csv")
+        filename = f"mock_products_{args.total}.{args.format}"
+        writer = write_xlsx if args.format == "xlsx" else write_csv
+        writer(filename, generate_data(args.total, args.seed))
+        print(f"SUCCESS: Generated {filename} with {args.total} products.")
     except ImportError:
-        print("ERROR: pandas or openpyxl not installed.")
+        print("ERROR: openpyxl not installed.")
     except Exception as e:
         print(f"ERROR: {e}")
 
@@ -0,0 +1,94 @@
+# scripts/indice_tasas.py
+from bisect import bisect_right
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from lector_capsula import iterar_tablas
+
+# DIRECTIVA: Tasa Historica (ModalHistorialCliente.jsx)
+# Reconstruye la tasa vigente en cada fecha a partir de las huellas que deja
+# el sistema: venta.tasa, logs.meta.tasaSnapshot y cortes.tasaReferencia.
+# Los cambios se guardan como intervalos ordenados; cada consulta es un
+# bisect O(log n) con cache LRU por timestamp.
+
+
+def a_timestamp(fecha):
+    """ISO 8601 (timeProvider.toISOString) o epoch en ms -> epoch ms (float)."""
+    if fecha is None:
+        return None
+    if isinstance(fecha, (int, float)):
+        return float(fecha)
+    try:
+        dt = datetime.fromisoformat(str(fecha).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp() * 1000
+
+
+def _tasa_valida(valor):
+    try:
+        tasa = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return tasa if tasa > 0 else None
+
+
+class IndiceTasas:
+    """Intervalos [inicio, siguiente_inicio) -> tasa vigente."""
+
+    def __init__(self, observaciones=(), tasa_actual=None, tam_cache=65536):
+        # Ordenar primero: ventas, logs y cortes se intercalan en el tiempo
+        puntos = sorted(
+            (ts, tasa) for ts, tasa in
+            ((a_timestamp(f), _tasa_valida(t)) for f, t in observaciones)
+            if ts is not None and tasa is not None
+        )
+        # Solo los cambios de tasa abren un intervalo nuevo (colapsa las rachas)
+        self.inicios, self.tasas = [], []
+        for ts, tasa in puntos:
+            if not self.tasas or self.tasas[-1] != tasa:
+                self.inicios.append(ts)
+                self.tasas.append(tasa)
+        self.tasa_actual = _tasa_valida(tasa_actual)
+        self._tasa_ts = lru_cache(maxsize=tam_cache)(self._buscar)
+
+    def __len__(self):
+        return len(self.tasas)
+
+    def _buscar(self, ts):
+        if not self.tasas:
+            return self.tasa_actual
+        i = bisect_right(self.inicios, ts) - 1
+        # Antes del primer registro se asume la primera tasa conocida
+        return self.tasas[max(i, 0)]
+
+    def tasa_en(self, fecha):
+        """Tasa vigente en 'fecha'; sin fecha valida -> tasa actual (config.tasa)."""
+        ts = a_timestamp(fecha)
+        if ts is None:
+            return self.tasa_actual if self.tasa_actual is not None else self._buscar(float('inf'))
+        return self._tasa_ts(ts)
+
+    def info_cache(self):
+        return self._tasa_ts.cache_info()
+
+    @classmethod
+    def desde_respaldo(cls, ruta, tasa_actual=None):
+        """Construye el indice en una sola pasada de streaming sobre el respaldo."""
+        def observaciones():
+            nonlocal tasa_actual
+            for tabla, r in iterar_tablas(ruta, ('ventas', 'logs', 'cortes', 'config')):
+                if tabla == 'ventas':
+                    yield r.get('fecha'), r.get('tasa')
+                elif tabla == 'logs':
+                    meta = r.get('meta') or {}
+                    yield r.get('fecha'), meta.get('tasaSnapshot') or meta.get('tasa')
+                elif tabla == 'cortes':
+                    yield r.get('fecha'), r.get('tasaReferencia')
+                elif tabla == 'config' and r.get('key') == 'general' and tasa_actual is None:
+                    tasa_actual = r.get('tasa')
+        indice = cls(observaciones())
+        indice.tasa_actual = _tasa_valida(tasa_actual)
+        return indice
@@ -0,0 +1,246 @@
+# scripts/indice_ventas.py
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from array import array
+
+import numpy as np
+
+from indice_tasas import a_timestamp
+from lector_capsula import iterar_tabla
+from treasury_columnar import Codificador, a_centavos
+
+# DIRECTIVA: Indice de Ventas (consultas ad-hoc sobre un respaldo)
+# Una pasada de streaming sobre dexie.ventas construye:
+#   - fecha (epoch ms) ordenada + permutacion -> rangos con searchsorted
+#   - corteId / clienteId / status -> dict valor -> tramo de posiciones (CSR)
+#   - id y total (centavos) por posicion, para responder sin releer el JSON
+# El indice se guarda junto al respaldo (respaldo.json.indice-<sha1>.npz):
+# si el archivo cambia, cambia el hash y se reconstruye solo.
+# 'posicion' = orden de la venta dentro de dexie.ventas (orden ++id).
+
+CAMPOS = ('corteId', 'clienteId', 'status')
+SIN_FECHA = np.iinfo(np.int64).max  # Las ventas sin fecha quedan al final del orden
+TAM_LECTURA = 1 << 20
+
+
+def hash_archivo(ruta):
+    h = hashlib.sha1()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(TAM_LECTURA), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def ruta_cache(ruta, firma):
+    return f"{ruta}.indice-{firma[:16]}.npz"
+
+
+def _clave(valor):
+    # SalesService guarda clienteId como numero o string segun el origen: se unifican
+    if isinstance(valor, str) and valor.isdigit():
+        return int(valor)
+    return valor
+
+
+class _Grupos:
+    """valor -> posiciones (ascendentes), en formato CSR: un solo array + offsets."""
+
+    def __init__(self, valores, codigos):
+        self.valores = valores
+        self.mapa = {v: i for i, v in enumerate(valores)}
+        orden = np.argsort(codigos, kind='stable')
+        self.posiciones = orden.astype(np.int64)
+        # codigo -1 (sin valor) queda fuera: bincount sobre codigo + 1
+        conteo = np.bincount(codigos + 1, minlength=len(valores) + 1)
+        self.inicio = np.concatenate(([0], np.cumsum(conteo))).astype(np.int64)
+
+    def de(self, valor):
+        c = self.mapa.get(_clave(valor))
+        if c is None:
+            return np.empty(0, dtype=np.int64)
+        return self.posiciones[self.inicio[c + 1]:self.inicio[c + 2]]
+
+    def conteos(self):
+        return dict(zip(self.valores, np.diff(self.inicio[1:]).tolist()))
+
+
+class IndiceVentas:
+
+    def __init__(self, ids, fechas, totales, codigos, vocabularios, firma=None):
+        self.ids, self.fechas, self.totales = ids, fechas, totales
+        self.codigos, self.vocabularios = codigos, vocabularios
+        self.firma = firma
+        self.orden_fecha = np.argsort(fechas, kind='stable')
+        self.fecha_ordenada = fechas[self.orden_fecha]
+        self.grupos = {c: _Grupos(vocabularios[c], codigos[c]) for c in CAMPOS}
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- Construccion y cache ---
+
+    @classmethod
+    def construir(cls, ventas, firma=None):
+        ids, fechas, totales = array('q'), array('q'), array('q')
+        cods = {c: array('i') for c in CAMPOS}
+        vocab = {c: Codificador() for c in CAMPOS}
+        for v in ventas:
+            ids.append(v['id'] if isinstance(v.get('id'), int) else -1)
+            ts = a_timestamp(v.get('fecha'))
+            fechas.append(SIN_FECHA if ts is None else int(ts))
+            totales.append(a_centavos(v.get('total', 0)))
+            for c in CAMPOS:
+                valor = _clave(v.get(c))
+                cods[c].append(-1 if valor in (None, '') else vocab[c].codigo(valor))
+        return cls(np.frombuffer(ids, dtype=np.int64), np.frombuffer(fechas, dtype=np.int64),
+                   np.frombuffer(totales, dtype=np.int64),
+                   {c: np.frombuffer(cods[c], dtype=np.int32) for c in CAMPOS},
+                   {c: vocab[c].valores for c in CAMPOS}, firma)
+
+    def guardar(self, destino):
+        np.savez(destino, ids=self.ids, fechas=self.fechas, totales=self.totales,
+                 **{f"cod_{c}": self.codigos[c] for c in CAMPOS},
+                 meta=np.array(json.dumps({"firma": self.firma, "vocabularios": self.vocabularios})))
+
+    @classmethod
+    def abrir(cls, origen):
+        with np.load(origen, allow_pickle=False) as z:
+            meta = json.loads(str(z['meta']))
+            return cls(z['ids'], z['fechas'], z['totales'], {c: z[f"cod_{c}"] for c in CAMPOS},
+                       meta["vocabularios"], meta["firma"])
+
+    @classmethod
+    def desde_respaldo(cls, ruta, usar_cache=True):
+        """Abre el indice cacheado del respaldo o lo construye (y lo guarda al lado)."""
+        firma = hash_archivo(ruta)
+        cache = ruta_cache(ruta, firma)
+        if usar_cache and os.path.exists(cache):
+            indice = cls.abrir(cache)
+            if indice.firma == firma:
+                return indice
+        indice = cls.construir(iterar_tabla(ruta, 'ventas'), firma)
+        if usar_cache:
+            # Indices de versiones anteriores del mismo respaldo ya no sirven
+            carpeta, base = os.path.split(os.path.abspath(ruta))
+            for viejo in os.listdir(carpeta):
+                if viejo.startswith(base + '.indice-') and viejo.endswith('.npz'):
+                    os.remove(os.path.join(carpeta, viejo))
+            indice.guardar(cache)
+        return indice
+
+    # --- Consultas (devuelven posiciones ordenadas por fecha) ---
+
+    def _rango(self, desde, hasta):
+        """Posiciones con desde <= fecha < hasta (ISO o epoch ms; None = abierto)."""
+        if desde is None and hasta is None:
+            return self.orden_fecha
+        a = 0 if desde is None else np.searchsorted(self.fecha_ordenada, a_timestamp(desde), 'left')
+        b = (np.searchsorted(self.fecha_ordenada, SIN_FECHA, 'left') if hasta is None
+             else np.searchsorted(self.fecha_ordenada, a_timestamp(hasta), 'left'))
+        return self.orden_fecha[a:b]
+
+    def buscar(self, desde=None, hasta=None, **filtros):
+        """
+        buscar(clienteId=7, desde='2026-01-01', hasta='2026-02-01')
+        buscar(corteId='Z-000010', status='ANULADA')
+        Filtros por igualdad sobre CAMPOS; sin filtros = solo rango de fechas.
+        """
+        desconocidos = set(filtros) - set(CAMPOS)
+        if desconocidos:
+            raise ValueError(f"Campos sin indice: {sorted(desconocidos)}")
+        if not filtros:
+            return self._rango(desde, hasta)
+
+        # Interseccion empezando por el grupo mas chico
+        grupos = sorted((self.grupos[c].de(v) for c, v in filtros.items()), key=len)
+        pos = grupos[0]
+        for otro in grupos[1:]:
+            pos = pos[np.isin(pos, otro, assume_unique=True)]
+        f = self.fechas[pos]
+        dentro = f < SIN_FECHA if hasta is None else f < a_timestamp(hasta)
+        if desde is not None:
+            dentro &= f >= a_timestamp(desde)
+        if desde is None and hasta is None:
+            dentro[:] = True  # Sin rango: tambien las ventas sin fecha (van al final)
+        pos, f = pos[dentro], f[dentro]
+        return pos[np.argsort(f, kind='stable')]
+
+    def resumen(self, posiciones):
+        return {"ventas": int(len(posiciones)), "total": int(self.totales[posiciones].sum()) / 100,
+                "ids": self.ids[posiciones[:20]].tolist()}
+
+
+def registros(ruta, posiciones):
+    """Las ventas completas de esas posiciones (una pasada; para pocas filas usar audit_sales_data)."""
+    buscadas = set(np.asarray(posiciones).tolist())
+    return [v for i, v in enumerate(iterar_tabla(ruta, 'ventas')) if i in buscadas]
+
+
+def run_tests():
+    ventas = [
+        {"id": 10, "fecha": "2026-01-05T10:00:00.000Z", "corteId": "Z-000001", "clienteId": 7,
+         "status": "COMPLETADA", "total": 5},
+        {"id": 11, "fecha": "2026-01-03T10:00:00.000Z", "corteId": "Z-000001", "status": "ANULADA", "total": 2},
+        {"id": 12, "fecha": "2026-02-01T00:00:00.000Z", "clienteId": "7", "status": "COMPLETADA", "total": 1.25},
+        {"id": 13, "corteId": "Z-000002", "clienteId": 9, "total": 4},   # Sin fecha ni status
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, 'capsula.json')
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump({"dexie": {"ventas": ventas}}, f)
+
+        idx = IndiceVentas.desde_respaldo(ruta)
+        ids = lambda pos: idx.ids[pos].tolist()
+        assert ids(idx.buscar(clienteId=7)) == [10, 12], "FALLO CLIENTE (numero y string unificados)"
+        assert ids(idx.buscar(clienteId=7, hasta='2026-02-01')) == [10], "FALLO RANGO ABIERTO [desde, hasta)"
+        assert ids(idx.buscar(corteId='Z-000001')) == [11, 10], "FALLO ORDEN POR FECHA"
+        assert ids(idx.buscar(corteId='Z-000001', status='ANULADA')) == [11]
+        assert ids(idx.buscar(desde='2026-01-04')) == [10, 12], "Las ventas sin fecha no entran en rangos"
+        assert ids(idx.buscar(clienteId=99)) == []
+        assert idx.resumen(idx.buscar(clienteId=7))["total"] == 6.25
+        assert idx.grupos['status'].conteos() == {"COMPLETADA": 2, "ANULADA": 1}
+        assert [v["id"] for v in registros(ruta, idx.buscar(clienteId=9))] == [13]
+
+        # Segunda apertura: viene del cache; si el respaldo cambia, se reconstruye
+        cache = ruta_cache(ruta, idx.firma)
+        assert os.path.exists(cache) and IndiceVentas.desde_respaldo(ruta).firma == idx.firma
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump({"dexie": {"ventas": ventas[:1]}}, f)
+        nuevo = IndiceVentas.desde_respaldo(ruta)
+        assert len(nuevo) == 1 and not os.path.exists(cache), "FALLO INVALIDACION"
+    print("[OK] PRUEBAS EXITOSAS")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas ad-hoc de ventas via indice cacheado")
+    parser.add_argument("respaldo")
+    parser.add_argument("--desde", help="Fecha ISO inclusiva")
+    parser.add_argument("--hasta", help="Fecha ISO exclusiva")
+    for campo in CAMPOS:
+        parser.add_argument(f"--{campo}")
+    parser.add_argument("--detalle", action="store_true", help="Imprimir las ventas completas")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    idx = IndiceVentas.desde_respaldo(args.respaldo)
+    t1 = time.perf_counter()
+    filtros = {c: getattr(args, c) for c in CAMPOS if getattr(args, c) is not None}
+    pos = idx.buscar(args.desde, args.hasta, **filtros)
+    t2 = time.perf_counter()
+    print(f"Indice: {len(idx):,} ventas ({t1 - t0:.2f}s) | consulta: {(t2 - t1) * 1000:.2f} ms")
+    print(json.dumps(idx.resumen(pos), indent=2))
+    if args.detalle:
+        for v in registros(args.respaldo, pos):
+            print(json.dumps(v, ensure_ascii=True))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        run_tests()
+        exit(0)
+    main()
@@ -0,0 +1,314 @@
+# scripts/instrumentacion.py
+import argparse
+import contextlib
+import cProfile
+import io
+import json
+import os
+import platform
+import pstats
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+try:
+    import resource  # Solo Unix; en Windows no hay RSS pico sin psutil
+except ImportError:
+    resource = None
+
+# DIRECTIVA: ENV-PY-001 / TEST-FIN-001
+# Instrumentacion comun para los scripts de auditoria: tiempo por fase
+# (reloj y CPU), filas/s, memoria pico y, opcionalmente, cProfile y
+# tracemalloc. El reporte JSON se agrega a un historial para detectar
+# regresiones a medida que crecen los respaldos.
+#
+# Uso dentro de otro script:
+#   inst = Instrumento('cierre')
+#   with inst.fase('treasury') as f:
+#       engine = auditar_respaldo(...)
+#   inst.guardar()
+
+DIR_REPORTES = os.path.join('.tmp', 'instrumentacion')
+HISTORIAL = os.path.join(DIR_REPORTES, 'historial.jsonl')
+UMBRAL_REGRESION = 0.25  # 25% mas lento por fila que la corrida anterior
+MINIMO_S = 0.05  # Fases mas cortas son puro ruido del reloj
+
+
+def rss_pico_mb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB; macOS, bytes
+    return round(pico / (1 << 20 if sys.platform == 'darwin' else 1 << 10), 1)
+
+
+class Fase:
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.segundos = 0.0
+        self.cpu = 0.0
+        self.filas = None
+        self.pico_python_mb = None  # Solo con tracemalloc
+        self.rss_mb = None
+        self.perfil = None
+
+    def contar(self, iterable):
+        """Envuelve un generador y cuenta los registros que pasan por la fase."""
+        self.filas = self.filas or 0
+        for x in iterable:
+            self.filas += 1
+            yield x
+
+    def a_dict(self):
+        d = {"fase": self.nombre, "segundos": round(self.segundos, 4), "cpu": round(self.cpu, 4)}
+        if self.filas is not None:
+            d["filas"] = self.filas
+            d["filas_por_s"] = round(self.filas / self.segundos, 1) if self.segundos else None
+        if self.pico_python_mb is not None:
+            d["pico_python_mb"] = self.pico_python_mb
+        if self.rss_mb is not None:
+            d["rss_mb"] = self.rss_mb
+        if self.perfil:
+            d["perfil"] = self.perfil
+        return d
+
+
+class Instrumento:
+    def __init__(self, nombre, memoria=False, perfilar=False, dir_perfiles=DIR_REPORTES, top=10):
+        self.nombre = nombre
+        self.memoria = memoria
+        self.perfilar = perfilar
+        self.dir_perfiles = dir_perfiles
+        self.top = top
+        self.fases = []
+        # cProfile y tracemalloc encarecen cada llamada: solo se comparan corridas con las mismas opciones
+        self.contexto = {"perfil": perfilar, "memoria": memoria}
+        if memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def fase(self, nombre):
+        f = Fase(nombre)
+        if self.memoria:
+            tracemalloc.reset_peak()
+        perfil = cProfile.Profile() if self.perfilar else None
+        t0, c0 = time.perf_counter(), time.process_time()
+        if perfil:
+            perfil.enable()
+        try:
+            yield f
+        finally:
+            if perfil:
+                perfil.disable()
+            f.segundos = time.perf_counter() - t0
+            f.cpu = time.process_time() - c0
+            if self.memoria:
+                f.pico_python_mb = round(tracemalloc.get_traced_memory()[1] / (1 << 20), 1)
+            f.rss_mb = rss_pico_mb()
+            if perfil:
+                f.perfil = self._volcar_perfil(perfil, nombre)
+            self.fases.append(f)
+
+    def medir(self, nombre, fn, *args, **kwargs):
+        with self.fase(nombre):
+            return fn(*args, **kwargs)
+
+    def _volcar_perfil(self, perfil, fase):
+        os.makedirs(self.dir_perfiles, exist_ok=True)
+        ruta = os.path.join(self.dir_perfiles, f"{self.nombre}_{fase}.prof")
+        perfil.dump_stats(ruta)  # Abrir con: python -m pstats <ruta>
+        stats = pstats.Stats(perfil, stream=io.StringIO())
+        # Funciones con mas tiempo propio (donde se va el tiempo, no quien llama)
+        filas = sorted(stats.stats.items(), key=lambda x: -x[1][2])[:self.top]
+        return {"archivo": ruta, "top": [
+            {"funcion": f"{os.path.basename(archivo)}:{linea}({func})", "llamadas": nc,
+             "propio_s": round(tt, 4), "acumulado_s": round(ct, 4)}
+            for (archivo, linea, func), (_, nc, tt, ct, _) in filas]}
+
+    def reporte(self):
+        return {
+            "nombre": self.nombre,
+            "fecha": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "plataforma": f"{platform.system()} {platform.release()}",
+            "contexto": self.contexto,
+            "total_s": round(sum(f.segundos for f in self.fases), 4),
+            "rss_pico_mb": rss_pico_mb(),
+            "fases": [f.a_dict() for f in self.fases],
+        }
+
+    def guardar(self, ruta=None, historial=HISTORIAL):
+        """Escribe el reporte (atomico) y lo agrega al historial. Devuelve el reporte."""
+        rep = self.reporte()
+        ruta = ruta or os.path.join(DIR_REPORTES, f"{self.nombre}.json")
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        with open(ruta + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(rep, f, indent=2)
+        os.replace(ruta + '.tmp', ruta)
+        if historial:
+            os.makedirs(os.path.dirname(historial) or '.', exist_ok=True)
+            with open(historial, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({k: v for k, v in rep.items() if k != 'fases'} |
+                                   {"fases": [{k: v for k, v in fase.items() if k != 'perfil'}
+                                              for fase in rep["fases"]]}) + '\n')
+        return rep
+
+    def imprimir(self):
+        print(f"{'fase':<22}{'seg':>9}{'cpu':>9}{'filas':>11}{'filas/s':>11}{'pico MB':>9}")
+        for f in self.fases:
+            pico = f.pico_python_mb if f.pico_python_mb is not None else f.rss_mb
+            print(f"{f.nombre:<22}{f.segundos:>9.3f}{f.cpu:>9.3f}"
+                  f"{'' if f.filas is None else f'{f.filas:,}':>11}"
+                  f"{'' if not f.filas or not f.segundos else f'{f.filas / f.segundos:,.0f}':>11}"
+                  f"{'' if pico is None else pico:>9}")
+
+
+def _costo(fase):
+    # Con filas se compara el costo por fila (el respaldo pudo crecer); si no, el tiempo total
+    return fase["segundos"] / fase["filas"] if fase.get("filas") else fase["segundos"]
+
+
+def _opciones(rep):
+    return rep.get("nombre"), rep["contexto"].get("perfil"), rep["contexto"].get("memoria")
+
+
+def regresiones(reporte, historial=HISTORIAL, umbral=UMBRAL_REGRESION, minimo=MINIMO_S):
+    """
+    Fases mas lentas por fila que en la ultima corrida anterior del mismo
+    instrumento (con las mismas opciones), aunque el respaldo haya crecido.
+    """
+    if not os.path.exists(historial):
+        return []
+    previo = None
+    with open(historial, encoding='utf-8') as f:
+        for linea in f:
+            r = json.loads(linea)
+            if _opciones(r) == _opciones(reporte) and r.get("fecha") != reporte["fecha"]:
+                previo = r
+    if previo is None:
+        return []
+    antes = {f["fase"]: f for f in previo["fases"]}
+    salida = []
+    for fase in reporte["fases"]:
+        ref = antes.get(fase["fase"])
+        if ref is None or not _costo(ref) or fase["segundos"] < minimo:
+            continue
+        cambio = _costo(fase) / _costo(ref) - 1
+        if cambio > umbral:
+            salida.append({"fase": fase["fase"], "antes_s": ref["segundos"], "ahora_s": fase["segundos"],
+                           "cambio": round(cambio, 3)})
+    return salida
+
+
+# --- Suite: auditorias existentes sobre un respaldo ---
+
+def suite_respaldo(inst, ruta):
+    from audit_closing_scenarios import auditar_respaldo, auditar_cortes_respaldo
+    from audit_dashboard_logic import DashboardEngine
+    from audit_history_tasa import auditar_deudas_respaldo, valor_bs
+    from audit_pagos_batch import validar_pagos
+    from indice_tasas import IndiceTasas
+    from lector_capsula import iterar_tabla
+
+    inst.contexto.update({"respaldo": os.path.basename(ruta), "bytes": os.path.getsize(ruta)})
+    with inst.fase('lectura_ventas') as f:
+        for _ in f.contar(iterar_tabla(ruta, 'ventas')):
+            pass
+    with inst.fase('treasury') as f:
+        auditar_respaldo(ruta)
+        f.filas = inst.fases[0].filas
+    with inst.fase('treasury_cortes'):
+        auditar_cortes_respaldo(ruta)
+    with inst.fase('dashboard') as f:
+        DashboardEngine().procesar(f.contar(iterar_tabla(ruta, 'ventas'))).reporte()
+    with inst.fase('indice_tasas'):
+        indice = IndiceTasas.desde_respaldo(ruta)
+    with inst.fase('historial_tasas') as f:
+        for venta in f.contar(iterar_tabla(ruta, 'ventas')):
+            valor_bs(venta, indice)
+    with inst.fase('deudas_clientes'):
+        auditar_deudas_respaldo(ruta)
+    with inst.fase('abonos') as f, open(os.devnull, 'w', newline='') as nulo:
+        f.filas = validar_pagos(iterar_tabla(ruta, 'ventas'), nulo)[0]
+
+
+def suite_demo(inst, repeticiones=200):
+    """Las simulaciones de los escenarios fijos (sin respaldo), repetidas para medir algo estable."""
+    from audit_abono_logic import simulate_abono_logic
+    from audit_closing_scenarios import run_tests as pruebas_tesoreria
+    from audit_dashboard_logic import audit_dashboard_logic
+    from audit_history_tasa import audit_history_logic
+
+    inst.contexto.update({"demo": repeticiones})
+    casos = [(inst.fase('treasury'), pruebas_tesoreria), (inst.fase('dashboard'), audit_dashboard_logic),
+             (inst.fase('historial_tasas'), audit_history_logic),
+             (inst.fase('abonos'), lambda: simulate_abono_logic(5000, 200, 'VES', 'Punto de Venta'))]
+    for fase, fn in casos:
+        # Las simulaciones imprimen su traza; aqui solo interesa el tiempo
+        with fase as f, contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(repeticiones):
+                fn()
+            f.filas = repeticiones
+
+
+def run_tests():
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        hist = os.path.join(tmp, 'historial.jsonl')
+        inst = Instrumento('prueba', memoria=True, perfilar=True, dir_perfiles=tmp)
+        with inst.fase('lista') as f:
+            datos = [i * i for i in f.contar(range(200_000))]
+        assert inst.medir('suma', sum, datos) == sum(datos)
+        rep = inst.guardar(os.path.join(tmp, 'prueba.json'), hist)
+        lista = rep["fases"][0]
+        assert lista["filas"] == 200_000 and lista["pico_python_mb"] > 1, lista
+        assert os.path.exists(lista["perfil"]["archivo"]) and lista["perfil"]["top"]
+        with open(os.path.join(tmp, 'prueba.json'), encoding='utf-8') as fh:
+            assert json.load(fh)["nombre"] == 'prueba'
+
+        # Regresion: misma fase 3x mas lenta por fila que la corrida previa del historial
+        lento = json.loads(json.dumps(rep))
+        lento["fecha"] = 'despues'
+        lento["fases"][0]["segundos"] = lista["segundos"] * 3
+        assert [r["fase"] for r in regresiones(lento, hist, minimo=0)] == ['lista']
+        # Mas filas en el mismo tiempo proporcional no es regresion
+        lento["fases"][0]["filas"] = 600_000
+        assert regresiones(lento, hist, minimo=0) == []
+        assert regresiones(rep, hist, minimo=0) == []  # No se compara consigo misma
+
+        demo = Instrumento('demo')
+        suite_demo(demo, repeticiones=2)
+        assert [f.nombre for f in demo.fases] == ['treasury', 'dashboard', 'historial_tasas', 'abonos']
+    tracemalloc.stop()
+    print("[OK] PRUEBAS EXITOSAS")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempos, memoria y perfiles de las auditorias")
+    parser.add_argument("respaldo", nargs='?', help="Capsula (.json o .lcap); sin ella corre las simulaciones demo")
+    parser.add_argument("--demo", type=int, default=200, help="Repeticiones de cada simulacion demo")
+    parser.add_argument("--memoria", action="store_true", help="tracemalloc: pico de memoria Python por fase")
+    parser.add_argument("--perfil", action="store_true", help="cProfile por fase (.prof + top 10 en el JSON)")
+    parser.add_argument("--salida", help="Ruta del reporte JSON")
+    args = parser.parse_args()
+
+    inst = Instrumento('auditorias' if args.respaldo else 'demo', memoria=args.memoria, perfilar=args.perfil)
+    if args.respaldo:
+        suite_respaldo(inst, args.respaldo)
+    else:
+        suite_demo(inst, args.demo)
+    inst.imprimir()
+    rep = inst.guardar(args.salida)
+    print(f"Total: {rep['total_s']:.2f}s | RSS pico: {rep['rss_pico_mb']} MB")
+    lentas = regresiones(rep)
+    for r in lentas:
+        print(f"[AVISO] REGRESION {r['fase']}: {r['antes_s']}s -> {r['ahora_s']}s (+{r['cambio']:.0%} por fila)")
+    exit(1 if lentas else 0)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        run_tests()
+        exit(0)
+    main()
@@ -0,0 +1,353 @@
+# scripts/lan_load_test.py
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+
+from lan_mock_server import LAN_PORT, ServidorLAN, catalogo_sintetico, leer_cabeceras
+
+# DIRECTIVA: LAN Sync - Prueba de Carga ("sabado lleno")
+# Simula N cajas secundarias contra el Master (electron/lanServer.js o el
+# reemplazo offline de lan_mock_server.py). Cada caja replica lanSyncService.js:
+#   - handshake /api/ping -> token, fullSync inicial (/api/products)
+#   - deltaSync: /api/products/since?t=...; si hasChanges -> fullSync
+#   - flush de ventas: POST /api/stock-update concurrente con las demas cajas
+#   - una conexion SSE /api/events abierta todo el tiempo
+# Cada POST marca cajaId como 'caja-N#seq' (el Master lo devuelve en 'caja'
+# del evento STOCK_UPDATED), asi se mide entrega por cliente SSE: eventos
+# perdidos y latencia POST -> evento.
+
+
+class ConexionHTTP:
+    """Cliente HTTP/1.1 minimo con keep-alive (una peticion a la vez), como fetch en la caja."""
+
+    def __init__(self, host, puerto, token=None):
+        self.host, self.puerto, self.token = host, puerto, token
+        self.reader = self.writer = None
+
+    async def _abrir(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.puerto, limit=1 << 24)
+
+    async def pedir(self, metodo, ruta, datos=None):
+        """Devuelve (status, json, bytes_recibidos). Reconecta una vez si el Master cerro la conexion."""
+        for intento in (0, 1):
+            if self.writer is None or self.writer.is_closing():
+                await self._abrir()
+            try:
+                return await self._pedir(metodo, ruta, datos)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.cerrar()
+                if intento:
+                    raise
+
+    async def _pedir(self, metodo, ruta, datos):
+        cuerpo = json.dumps(datos).encode() if datos is not None else b''
+        cab = f"{metodo} {ruta} HTTP/1.1\r\nHost: {self.host}:{self.puerto}\r\nConnection: keep-alive\r\n"
+        if self.token:
+            cab += f"Authorization: Bearer {self.token}\r\n"
+        if datos is not None:
+            cab += f"Content-Type: application/json\r\nContent-Length: {len(cuerpo)}\r\n"
+        self.writer.write(cab.encode() + b'\r\n' + cuerpo)
+        await self.writer.drain()
+
+        linea, cabeceras = await leer_cabeceras(self.reader)
+        if linea is None:
+            raise ConnectionError("Conexion cerrada por el Master")
+        estado = int(linea.split(' ')[1])
+        if cabeceras.get('transfer-encoding', '').lower() == 'chunked':
+            partes = [p async for p in leer_chunks(self.reader)]
+            crudo = b''.join(partes)
+        else:
+            crudo = await self.reader.readexactly(int(cabeceras.get('content-length') or 0))
+        if cabeceras.get('connection', '').lower() == 'close':
+            self.cerrar()
+        return estado, (json.loads(crudo) if crudo else None), len(crudo)
+
+    def cerrar(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.writer = None
+
+
+async def leer_chunks(reader):
+    """Transfer-Encoding: chunked (Node lo usa para el stream SSE y respuestas sin largo)."""
+    while True:
+        tam = int((await reader.readline()).split(b';')[0].strip() or b'0', 16)
+        if tam == 0:
+            await reader.readline()
+            return
+        yield await reader.readexactly(tam)
+        await reader.readexactly(2)
+
+
+def percentil(valores, q):
+    """Percentil por rango mas cercano (ms)."""
+    if not valores:
+        return None
+    orden = sorted(valores)
+    return orden[max(0, math.ceil(q / 100 * len(orden)) - 1)]
+
+
+class Metricas:
+
+    def __init__(self):
+        self.latencias = {}   # endpoint -> [ms]
+        self.errores = {}     # endpoint -> n
+        self.bytes = 0
+        self.descartados = 0  # updates 'duplicate' en /api/stock-update
+
+    def registrar(self, endpoint, ms, estado, tam):
+        if estado == 200:
+            self.latencias.setdefault(endpoint, []).append(ms)
+            self.bytes += tam
+        else:
+            self.errores[endpoint] = self.errores.get(endpoint, 0) + 1
+
+    def error(self, endpoint):
+        self.errores[endpoint] = self.errores.get(endpoint, 0) + 1
+
+
+class CajaSimulada:
+
+    def __init__(self, n, host, puerto, token, catalogo, metricas, args):
+        self.nombre = f"caja-{n}"
+        self.host, self.puerto, self.token = host, puerto, token
+        self.catalogo, self.m, self.args = catalogo, metricas, args
+        self.rnd = random.Random(args.semilla * 1000 + n)
+        self.ultimo_ts = 0
+        self.seq = 0
+        self.enviados = {}    # 'caja-N#seq' -> instante de envio (perf_counter)
+        self.recibidos = {}   # 'caja-X#seq' -> instante de llegada por SSE
+        self.sse_listo = asyncio.Event()
+
+    async def _medir(self, conexion, endpoint, metodo, ruta, datos=None):
+        t0 = time.perf_counter()
+        try:
+            estado, cuerpo, tam = await asyncio.wait_for(conexion.pedir(metodo, ruta, datos), self.args.timeout)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            conexion.cerrar()
+            self.m.error(endpoint)
+            return None
+        self.m.registrar(endpoint, (time.perf_counter() - t0) * 1000, estado, tam)
+        return cuerpo if estado == 200 else None
+
+    async def full_sync(self, conexion):
+        datos = await self._medir(conexion, 'products', 'GET', '/api/products')
+        if datos:
+            self.ultimo_ts = datos.get('timestamp') or self.ultimo_ts
+
+    async def polling(self, fin):
+        conexion = ConexionHTTP(self.host, self.puerto, self.token)
+        await self.full_sync(conexion)
+        while time.perf_counter() < fin:
+            await asyncio.sleep(self.args.poll * self.rnd.uniform(0.75, 1.25))
+            datos = await self._medir(conexion, 'since', 'GET', f"/api/products/since?t={self.ultimo_ts}")
+            if datos and datos.get('hasChanges'):
+                await self.full_sync(conexion)  # deltaSync -> fullSync (catalogo completo)
+        conexion.cerrar()
+
+    async def ventas(self, fin):
+        conexion = ConexionHTTP(self.host, self.puerto, self.token)
+        while time.perf_counter() < fin:
+            await asyncio.sleep(self.rnd.expovariate(1 / self.args.intervalo_post))
+            self.seq += 1
+            etiqueta = f"{self.nombre}#{self.seq}"
+            updates = [{"nombre": self.rnd.choice(self.catalogo), "delta": -self.rnd.randint(1, 3),
+                        "timestamp": int(time.time() * 1000)}   # Date.now(), como sendStockUpdate
+                       for _ in range(self.rnd.randint(1, self.args.items))]
+            self.enviados[etiqueta] = time.perf_counter()
+            resp = await self._medir(conexion, 'stock-update', 'POST', '/api/stock-update',
+                                     {"updates": updates, "cajaId": etiqueta})
+            if not (resp and resp.get('ok')):
+                del self.enviados[etiqueta]  # Fallo: el Master no difundio nada
+                continue
+            # Mismo nombre+delta+ms desde otra caja = descartado por la dedupKey del Master
+            self.m.descartados += sum(1 for r in resp.get('results', []) if r.get('reason') == 'duplicate')
+        conexion.cerrar()
+
+    async def escuchar(self, parar):
+        try:
+            reader, writer = await asyncio.open_connection(self.host, self.puerto, limit=1 << 24)
+        except OSError:
+            self.m.error('events')
+            self.sse_listo.set()
+            return
+        writer.write((f"GET /api/events HTTP/1.1\r\nHost: {self.host}:{self.puerto}\r\n"
+                      f"Authorization: Bearer {self.token}\r\nAccept: text/event-stream\r\n\r\n").encode())
+        try:
+            linea, cabeceras = await leer_cabeceras(reader)
+            if linea is None or ' 200 ' not in f"{linea} ":
+                self.m.error('events')
+                return
+            fuente = leer_chunks(reader) if cabeceras.get('transfer-encoding', '').lower() == 'chunked' \
+                else _crudo(reader)
+            buffer = b''
+            lector = asyncio.ensure_future(fuente.__anext__())
+            espera_fin = asyncio.ensure_future(parar.wait())
+            while True:
+                hecho, _ = await asyncio.wait({lector, espera_fin}, return_when=asyncio.FIRST_COMPLETED)
+                if lector not in hecho:
+                    lector.cancel()
+                    break
+                try:
+                    buffer += lector.result()
+                except (StopAsyncIteration, ConnectionError, asyncio.IncompleteReadError):
+                    break
+                llegada = time.perf_counter()
+                *eventos, buffer = buffer.split(b'\n\n')
+                for ev in eventos:
+                    self._evento(ev, llegada)
+                lector = asyncio.ensure_future(fuente.__anext__())
+            espera_fin.cancel()
+        finally:
+            self.sse_listo.set()
+            writer.close()
+
+    def _evento(self, ev, llegada):
+        for linea in ev.split(b'\n'):
+            if not linea.startswith(b'data:'):
+                continue  # ': heartbeat'
+            datos = json.loads(linea[5:])
+            if datos.get('type') == 'CONNECTED':
+                self.sse_listo.set()
+            elif datos.get('type') == 'STOCK_UPDATED' and '#' in str(datos.get('caja')):
+                self.recibidos[datos['caja']] = llegada
+
+
+async def _crudo(reader):
+    while True:
+        bloque = await reader.read(65536)
+        if not bloque:
+            return
+        yield bloque
+
+
+async def ejecutar(args, host, puerto):
+    metricas = Metricas()
+    ping = ConexionHTTP(host, puerto)
+    estado, datos, _ = await ping.pedir('GET', '/api/ping')
+    ping.cerrar()
+    if estado != 200 or not datos.get('lanToken'):
+        raise SystemExit(f"[FAIL] Handshake fallido con {host}:{puerto} (HTTP {estado})")
+    token = datos['lanToken']
+
+    conexion = ConexionHTTP(host, puerto, token)
+    _, catalogo, _ = await conexion.pedir('GET', '/api/products')
+    conexion.cerrar()
+    nombres = [p.get('nombre') for p in catalogo.get('productos', []) if p.get('nombre')]
+    if not nombres:
+        raise SystemExit("[FAIL] El Master no tiene productos")
+
+    cajas = [CajaSimulada(i + 1, host, puerto, token, nombres, metricas, args) for i in range(args.cajas)]
+    parar = asyncio.Event()
+    oyentes = [asyncio.create_task(c.escuchar(parar)) for c in cajas]
+    await asyncio.wait_for(asyncio.gather(*(c.sse_listo.wait() for c in cajas)), args.timeout)
+
+    t0 = time.perf_counter()
+    fin = t0 + args.duracion
+    await asyncio.gather(*(c.polling(fin) for c in cajas), *(c.ventas(fin) for c in cajas))
+    duracion = time.perf_counter() - t0
+    await asyncio.sleep(args.drenaje)  # Eventos en vuelo
+    parar.set()
+    await asyncio.gather(*oyentes)
+    return resumen(cajas, metricas, duracion)
+
+
+def resumen(cajas, metricas, duracion):
+    enviados = {}
+    for c in cajas:
+        enviados.update(c.enviados)
+    esperados = perdidos = 0
+    entrega = []
+    for c in cajas:
+        for etiqueta, t_envio in enviados.items():
+            esperados += 1
+            llegada = c.recibidos.get(etiqueta)
+            if llegada is None:
+                perdidos += 1
+            else:
+                entrega.append((llegada - t_envio) * 1000)
+
+    endpoints = {}
+    for ep in sorted(set(metricas.latencias) | set(metricas.errores)):
+        lat = metricas.latencias.get(ep, [])
+        endpoints[ep] = {
+            "ok": len(lat), "errores": metricas.errores.get(ep, 0),
+            "p50_ms": _r(percentil(lat, 50)), "p99_ms": _r(percentil(lat, 99)),
+            "req_s": round(len(lat) / duracion, 1),
+        }
+    total_ok = sum(e["ok"] for e in endpoints.values())
+    return {
+        "cajas": len(cajas),
+        "duracion_s": round(duracion, 2),
+        "throughput_req_s": round(total_ok / duracion, 1),
+        "mb_recibidos": round(metricas.bytes / 1e6, 2),
+        "updates_descartados_dedup": metricas.descartados,
+        "endpoints": endpoints,
+        "sse": {
+            "posts_difundidos": len(enviados), "eventos_esperados": esperados,
+            "eventos_perdidos": perdidos,
+            "entrega_p50_ms": _r(percentil(entrega, 50)), "entrega_p99_ms": _r(percentil(entrega, 99)),
+        },
+    }
+
+
+def _r(x):
+    return None if x is None else round(x, 2)
+
+
+def imprimir(rep):
+    print("=" * 64)
+    print(f"PRUEBA DE CARGA LAN: {rep['cajas']} cajas, {rep['duracion_s']}s")
+    print("=" * 64)
+    print(f"{'endpoint':<14}{'ok':>8}{'err':>6}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+    for ep, e in rep["endpoints"].items():
+        print(f"{ep:<14}{e['ok']:>8}{e['errores']:>6}{e['p50_ms'] or 0:>10.2f}{e['p99_ms'] or 0:>10.2f}{e['req_s']:>9.1f}")
+    s = rep["sse"]
+    print("-" * 64)
+    print(f"Throughput total: {rep['throughput_req_s']} req/s | Recibido: {rep['mb_recibidos']} MB")
+    if rep["updates_descartados_dedup"]:
+        print(f"[AVISO] {rep['updates_descartados_dedup']} updates descartados como duplicados por el Master")
+    print(f"SSE: {s['eventos_esperados'] - s['eventos_perdidos']}/{s['eventos_esperados']} eventos entregados "
+          f"| perdidos: {s['eventos_perdidos']} | entrega p50 {s['entrega_p50_ms']} ms, p99 {s['entrega_p99_ms']} ms")
+    if s["eventos_perdidos"]:
+        print("[FAIL] Hay cajas que no recibieron STOCK_UPDATED.")
+    else:
+        print("[OK] Todas las cajas recibieron todos los eventos.")
+
+
+async def _principal(args):
+    if args.master:
+        host, _, puerto = args.master.partition(':')
+        return await ejecutar(args, host, int(puerto or LAN_PORT))
+    # Modo offline: Master de reemplazo en un puerto libre del mismo proceso
+    servidor = ServidorLAN(catalogo_sintetico(args.productos), config={"nombreNegocio": 'Listo POS (Mock)'})
+    srv = await servidor.iniciar('127.0.0.1', 0)
+    puerto = srv.sockets[0].getsockname()[1]
+    async with srv:
+        return await ejecutar(args, '127.0.0.1', puerto)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga del servidor LAN Master")
+    parser.add_argument("--master", help="host[:puerto] de un Master real (por defecto: mock local)")
+    parser.add_argument("--cajas", type=int, default=10, help="Cajas secundarias simuladas")
+    parser.add_argument("--duracion", type=float, default=20.0, help="Segundos de carga")
+    parser.add_argument("--poll", type=float, default=5.0, help="Intervalo de deltaSync (POLL_INTERVAL = 5s)")
+    parser.add_argument("--intervalo-post", type=float, default=1.0, help="Media de segundos entre ventas por caja")
+    parser.add_argument("--items", type=int, default=5, help="Maximo de productos por stock-update")
+    parser.add_argument("--productos", type=int, default=2000, help="Catalogo del mock local")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--drenaje", type=float, default=2.0, help="Espera final por eventos SSE en vuelo")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--json", help="Guardar el reporte en este archivo")
+    args = parser.parse_args()
+
+    rep = asyncio.run(_principal(args))
+    imprimir(rep)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(rep, f, indent=2)
+    exit(1 if rep["sse"]["eventos_perdidos"] else 0)
@@ -0,0 +1,293 @@
+# scripts/lan_mock_server.py
+import argparse
+import asyncio
+import json
+import re
+import secrets
+import time
+import unicodedata
+
+# DIRECTIVA: LAN Sync (electron/lanServer.js)
+# Servidor Master de reemplazo, solo stdlib (asyncio), para pruebas de carga
+# sin Electron. Reproduce el contrato de lanServer.js v3.0:
+#   GET  /api/ping              -> handshake abierto, entrega lanToken
+#   GET  /api/products          -> catalogo completo (Bearer token)
+#   GET  /api/products/since?t= -> hasChanges + catalogo si lastUpdate > t
+#   POST /api/stock-update      -> delta conmutativo + dedup + broadcast SSE
+#   GET  /api/events            -> SSE (chunked, como Node) con heartbeat
+# Las respuestas JSON llevan Content-Length; el SSE va en chunked encoding.
+#
+# Extension opcional, igual que lanServer.js (solo la usan los clientes que la
+# pidan; lanSyncService.js no cambia). delta=False reproduce un Master sin ella:
+#   - ETag / If-None-Match -> 304 en /api/products y /api/products/since
+#   - /api/products/since?t=..&delta=1 -> solo 'cambios' + 'eliminados' desde t
+
+LAN_PORT = 3847
+SYNC_VERSION = '3.0'
+MAX_BODY_SIZE = 5 * 1024 * 1024
+SSE_TIMEOUT = 60  # segundos entre heartbeats
+DEDUP_MAX, DEDUP_KEEP = 500, 250
+HEARTBEAT = b': heartbeat\n\n'
+
+ESTADOS = {200: 'OK', 204: 'No Content', 304: 'Not Modified', 400: 'Bad Request', 401: 'Unauthorized',
+           404: 'Not Found', 413: 'Payload Too Large'}
+CORS = ('Access-Control-Allow-Origin: *\r\n'
+        'Access-Control-Allow-Methods: GET, POST, OPTIONS\r\n'
+        'Access-Control-Allow-Headers: Content-Type, Authorization\r\n')
+_TILDES = re.compile('[\u0300-\u036f]')
+
+
+def normalizar_nombre(nombre):
+    """Espejo de normalizeName: trim + lower + NFD sin marcas diacriticas."""
+    if not isinstance(nombre, str) or not nombre:
+        return ''
+    return _TILDES.sub('', unicodedata.normalize('NFD', nombre.strip().lower()))
+
+
+def ahora_ms():
+    return int(time.time() * 1000)
+
+
+async def leer_cabeceras(reader):
+    """Lee linea de inicio + cabeceras HTTP/1.1. Devuelve (linea, {cabecera: valor}) o (None, None) si se cerro."""
+    linea = await reader.readline()
+    if not linea:
+        return None, None
+    cabeceras = {}
+    while True:
+        h = await reader.readline()
+        if h in (b'\r\n', b'\n', b''):
+            break
+        k, _, v = h.decode('latin-1').partition(':')
+        cabeceras[k.strip().lower()] = v.strip()
+    return linea.decode('latin-1').rstrip('\r\n'), cabeceras
+
+
+class ServidorLAN:
+
+    def __init__(self, productos=(), categorias=(), config=None, delta=True):
+        self.categorias = list(categorias)
+        self.config = config or {}
+        self.delta = delta          # False = contrato v3.0 estricto (sin ETag ni delta)
+        self.token = secrets.token_hex(32)
+        self.ultimo = 0
+        self.clientes = []          # writers SSE activos
+        self.procesados = {}        # dedupKey -> None (dict ordenado = Set de JS)
+        self.productos, self.marcas, self.eliminados = [], {}, []
+        self.actualizar_catalogo(productos)
+
+    def _tick(self):
+        # Estrictamente creciente: dos cambios en el mismo ms no comparten timestamp
+        self.ultimo = max(ahora_ms(), self.ultimo + 1)
+        return self.ultimo
+
+    def actualizar_catalogo(self, productos, categorias=None):
+        """updateProductCache: reemplaza el catalogo y marca solo las filas que cambiaron."""
+        ts = self._tick()
+        anteriores = {p.get('id'): p for p in self.productos}
+        self.productos = [dict(p) for p in productos]
+        nuevas = {p.get('id') for p in self.productos}
+        for p in self.productos:
+            if anteriores.get(p.get('id')) != p:
+                self.marcas[p.get('id')] = ts
+        for pid in anteriores.keys() - nuevas:
+            self.marcas.pop(pid, None)
+            self.eliminados.append((ts, pid))
+        if categorias is not None:
+            self.categorias = list(categorias)
+        # productCache.find(...): primer producto con ese nombre normalizado
+        self.por_nombre = {}
+        for p in self.productos:
+            self.por_nombre.setdefault(normalizar_nombre(p.get('nombre')), p)
+        self.difundir({"type": 'PRODUCTS_UPDATED', "timestamp": ts, "count": len(self.productos)})
+
+    def cambios_desde(self, desde):
+        return ([p for p in self.productos if self.marcas.get(p.get('id'), 0) > desde],
+                [pid for ts, pid in self.eliminados if ts > desde])
+
+    # --- Logica de negocio (processStockUpdate) ---
+
+    def procesar_stock(self, updates, caja_id='unknown'):
+        ts = self._tick()
+        resultados = []
+        for u in updates:
+            clave = f"{normalizar_nombre(u.get('nombre'))}_{u.get('delta')}_{u.get('timestamp')}"
+            if clave in self.procesados:
+                resultados.append({"nombre": u.get('nombre'), "skipped": True, "reason": 'duplicate'})
+                continue
+            self.procesados[clave] = None
+            if len(self.procesados) > DEDUP_MAX:
+                self.procesados = dict.fromkeys(list(self.procesados)[-DEDUP_KEEP:])
+
+            producto = self.por_nombre.get(normalizar_nombre(u.get('nombre')))
+            if producto is None:
+                resultados.append({"nombre": u.get('nombre'), "skipped": True, "reason": 'not_found'})
+                continue
+            anterior = producto.get('stock') or 0
+            producto['stock'] = anterior + (u.get('delta') or 0)
+            self.marcas[producto.get('id')] = ts
+            resultados.append({"nombre": producto.get('nombre'), "oldStock": anterior,
+                               "newStock": producto['stock'], "delta": u.get('delta')})
+
+        self.difundir({"type": 'STOCK_UPDATED', "timestamp": ts, "updates": resultados, "caja": caja_id})
+        return resultados
+
+    def difundir(self, datos):
+        mensaje = f"data: {json.dumps(datos, separators=(',', ':'))}\n\n".encode()
+        vivos = []
+        for w in self.clientes:
+            if w.is_closing():
+                continue
+            w.write(b'%x\r\n%s\r\n' % (len(mensaje), mensaje))
+            vivos.append(w)
+        self.clientes = vivos
+
+    # --- HTTP ---
+
+    def _json(self, writer, estado, datos, etag=None):
+        cuerpo = json.dumps(datos, separators=(',', ':'), ensure_ascii=False).encode() if estado != 304 else b''
+        extra = f"ETag: {etag}\r\n" if etag else ''
+        writer.write((f"HTTP/1.1 {estado} {ESTADOS.get(estado, '')}\r\n"
+                      f"Content-Type: application/json\r\n{CORS}{extra}"
+                      f"Content-Length: {len(cuerpo)}\r\nConnection: keep-alive\r\n\r\n").encode() + cuerpo)
+
+    def _etag(self, cabeceras):
+        """(etag, no_modificado) segun If-None-Match. Sin extension: (None, False)."""
+        if not self.delta:
+            return None, False
+        etag = f'W/"{self.ultimo}"'
+        return etag, cabeceras.get('if-none-match') == etag
+
+    def _autorizado(self, cabeceras):
+        partes = cabeceras.get('authorization', '').split(' ')
+        return len(partes) == 2 and partes[0] == 'Bearer' and partes[1] == self.token
+
+    async def atender(self, reader, writer):
+        try:
+            while True:
+                linea, cabeceras = await leer_cabeceras(reader)
+                if linea is None:
+                    break
+                metodo, objetivo, _ = (linea.split(' ') + ['', ''])[:3]
+                ruta, _, consulta = objetivo.partition('?')
+                largo = int(cabeceras.get('content-length') or 0)
+                if largo > MAX_BODY_SIZE:
+                    self._json(writer, 413, {"error": 'Body too large'})
+                    break
+                cuerpo = await reader.readexactly(largo) if largo else b''
+                if ruta == '/api/events' and metodo == 'GET' and self._autorizado(cabeceras):
+                    await self._sse(reader, writer)
+                    break
+                self._rutear(writer, metodo, ruta, consulta, cabeceras, cuerpo)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _rutear(self, writer, metodo, ruta, consulta, cabeceras, cuerpo):
+        if metodo == 'OPTIONS':
+            writer.write(f"HTTP/1.1 204 No Content\r\n{CORS}Content-Length: 0\r\n\r\n".encode())
+            return
+        if ruta == '/api/ping' and metodo == 'GET':
+            self._json(writer, 200, {
+                "status": 'ok', "version": SYNC_VERSION, "negocio": self.config.get('nombreNegocio') or 'Listo POS',
+                "productos": len(self.productos), "timestamp": self.ultimo, "ip": '127.0.0.1',
+                "clients": len(self.clientes), "lanToken": self.token,
+            })
+            return
+        if not self._autorizado(cabeceras):
+            self._json(writer, 401, {"error": 'Unauthorized — Missing or invalid LAN token. Reconnect to the master.'})
+            return
+
+        etag, no_modificado = self._etag(cabeceras)
+        if ruta in ('/api/products', '/api/products/since') and metodo == 'GET' and no_modificado:
+            self._json(writer, 304, None, etag)
+        elif ruta == '/api/products' and metodo == 'GET':
+            self._json(writer, 200, {
+                "productos": self.productos, "categorias": self.categorias,
+                "config": {k: self.config.get(k) for k in ('nombreNegocio', 'moneda', 'tasa')},
+                "timestamp": self.ultimo, "total": len(self.productos),
+            }, etag)
+        elif ruta == '/api/products/since' and metodo == 'GET':
+            t = re.search(r'(?:^|&)t=(-?\d+)', consulta)
+            desde = int(t.group(1)) if t else 0
+            if self.ultimo <= desde:
+                self._json(writer, 200, {"hasChanges": False, "timestamp": self.ultimo}, etag)
+            elif self.delta and desde > 0 and re.search(r'(?:^|&)delta=1(?:&|$)', consulta):
+                cambios, eliminados = self.cambios_desde(desde)
+                self._json(writer, 200, {"hasChanges": True, "cambios": cambios, "eliminados": eliminados,
+                                         "categorias": self.categorias, "timestamp": self.ultimo,
+                                         "total": len(self.productos)}, etag)
+            else:
+                self._json(writer, 200, {"hasChanges": True, "productos": self.productos,
+                                         "categorias": self.categorias, "timestamp": self.ultimo}, etag)
+        elif ruta == '/api/stock-update' and metodo == 'POST':
+            try:
+                datos = json.loads(cuerpo or b'null')
+            except ValueError:
+                self._json(writer, 400, {"error": 'Invalid JSON'})
+                return
+            if not isinstance(datos, dict) or not isinstance(datos.get('updates'), list):
+                self._json(writer, 400, {"error": 'Se requiere { updates: [...] }'})
+                return
+            resultados = self.procesar_stock(datos['updates'], datos.get('cajaId') or 'secundaria')
+            self._json(writer, 200, {"ok": True, "processed": len(resultados), "results": resultados})
+        else:
+            self._json(writer, 404, {"error": 'Ruta no encontrada'})
+
+    async def _sse(self, reader, writer):
+        writer.write(("HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                      "Connection: keep-alive\r\nAccess-Control-Allow-Origin: *\r\n"
+                      "Transfer-Encoding: chunked\r\n\r\n").encode())
+        inicial = f"data: {json.dumps({'type': 'CONNECTED', 'timestamp': ahora_ms()})}\n\n".encode()
+        writer.write(b'%x\r\n%s\r\n' % (len(inicial), inicial))
+        self.clientes.append(writer)
+        try:
+            while True:
+                # El cliente no envia nada por el canal SSE: EOF = desconexion
+                try:
+                    if not await asyncio.wait_for(reader.read(1024), SSE_TIMEOUT):
+                        break
+                except asyncio.TimeoutError:
+                    writer.write(b'%x\r\n%s\r\n' % (len(HEARTBEAT), HEARTBEAT))
+                    await writer.drain()
+        finally:
+            if writer in self.clientes:
+                self.clientes.remove(writer)
+
+    async def iniciar(self, host='0.0.0.0', puerto=LAN_PORT):
+        return await asyncio.start_server(self.atender, host, puerto, limit=MAX_BODY_SIZE)
+
+
+def catalogo_sintetico(n):
+    categorias = ['ALIMENTOS', 'BEBIDAS', 'SNACKS', 'LIMPIEZA', 'PERSONAL', 'HOGAR']
+    return [{"id": i, "nombre": f"Producto {i}", "precio": 1.5, "costo": 1.0, "stock": 100,
+             "categoria": categorias[i % len(categorias)]} for i in range(1, n + 1)]
+
+
+async def _servir(args):
+    if args.respaldo:
+        from lector_capsula import iterar_tabla
+        productos = list(iterar_tabla(args.respaldo, 'productos'))
+    else:
+        productos = catalogo_sintetico(args.productos)
+    servidor = ServidorLAN(productos, config={"nombreNegocio": 'Listo POS (Mock)', "tasa": 36},
+                           delta=not args.sin_delta)
+    srv = await servidor.iniciar(args.host, args.puerto)
+    print(f"[LAN MOCK v{SYNC_VERSION}] {len(productos):,} productos en {args.host}:{args.puerto}")
+    async with srv:
+        await srv.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor LAN Master de reemplazo (offline)")
+    parser.add_argument("--host", default='0.0.0.0')
+    parser.add_argument("--puerto", type=int, default=LAN_PORT)
+    parser.add_argument("--productos", type=int, default=2000, help="Catalogo sintetico")
+    parser.add_argument("--respaldo", help="Cargar productos desde una Capsula de Tiempo")
+    parser.add_argument("--sin-delta", action="store_true", help="Contrato v3.0 estricto (sin ETag ni delta=1)")
+    try:
+        asyncio.run(_servir(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,301 @@
+# scripts/lan_sync_client.py
+import asyncio
+import hashlib
+import http.client
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from lan_mock_server import LAN_PORT, ServidorLAN, catalogo_sintetico, normalizar_nombre
+
+# DIRECTIVA: LAN Sync - Cliente con cache local (caja secundaria)
+# Alternativa a fullSync de lanSyncService.js, que baja el catalogo entero
+# (dos veces: /since ya lo trae y luego pide /api/products) ante cualquier cambio.
+#   - Cache SQLite en disco: productos por id (indices por codigo y nombre
+#     normalizado) + huella SHA-1 de cada fila.
+#   - Peticion condicional: If-None-Match (ETag) y /since?t=..&delta=1.
+#   - Si el Master trae 'cambios' -> solo esas filas viajan por la Wi-Fi.
+#   - Si el Master no tiene la extension (lanServer.js anterior, catalogo
+#     completo) -> se reutiliza la respuesta de /since y solo se escriben las
+#     filas cuya huella cambio. El ahorro es de disco, no de red: se avisa.
+
+CACHE_DEFAULT = os.path.join('.tmp', 'lan_cache.sqlite')
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS productos (
+    id PRIMARY KEY,
+    codigo TEXT,
+    nombre_norm TEXT,
+    huella TEXT NOT NULL,
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_productos_codigo ON productos(codigo);
+CREATE INDEX IF NOT EXISTS idx_productos_nombre ON productos(nombre_norm);
+CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT);
+"""
+
+
+def huella(producto):
+    return hashlib.sha1(json.dumps(producto, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+def clave(producto):
+    pid = producto.get('id')
+    return pid if pid is not None else f"codigo:{producto.get('codigo')}"
+
+
+class ClienteSyncLAN:
+
+    def __init__(self, host, puerto=LAN_PORT, cache=CACHE_DEFAULT, timeout=10):
+        if cache != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(cache)), exist_ok=True)
+        self.db = sqlite3.connect(cache)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(ESQUEMA)
+        self.host, self.puerto, self.timeout = host, puerto, timeout
+        self.http = None
+        self.bytes_recibidos = 0
+
+    # --- Meta (equivale a las claves de localStorage de lanSyncService) ---
+
+    def _meta(self, k, defecto=None):
+        fila = self.db.execute("SELECT valor FROM meta WHERE clave = ?", (k,)).fetchone()
+        return fila[0] if fila else defecto
+
+    def _set_meta(self, k, v):
+        self.db.execute("INSERT OR REPLACE INTO meta (clave, valor) VALUES (?, ?)", (k, v))
+
+    # --- HTTP ---
+
+    def _pedir(self, ruta, cabeceras):
+        for intento in (0, 1):
+            if self.http is None:
+                self.http = http.client.HTTPConnection(self.host, self.puerto, timeout=self.timeout)
+            try:
+                self.http.request('GET', ruta, headers=cabeceras)
+                resp = self.http.getresponse()
+                return resp, resp.read()
+            except (http.client.HTTPException, ConnectionError):
+                self.http.close()
+                self.http = None
+                if intento:
+                    raise
+
+    def handshake(self):
+        resp, cuerpo = self._pedir('/api/ping', {})
+        token = json.loads(cuerpo).get('lanToken') if resp.status == 200 else None
+        if not token:
+            raise ConnectionError(f"Handshake fallido con {self.host}:{self.puerto} (HTTP {resp.status})")
+        self._set_meta('token', token)
+        self.db.commit()
+
+    def _get(self, ruta, condicional=True):
+        """GET autenticado. Devuelve (status, json|None). 401 -> nuevo handshake y un reintento."""
+        for intento in (0, 1):
+            if self._meta('token') is None:
+                self.handshake()
+            cabeceras = {"Authorization": f"Bearer {self._meta('token')}", "Accept": 'application/json'}
+            if condicional and self._meta('etag'):
+                cabeceras["If-None-Match"] = self._meta('etag')
+            resp, cuerpo = self._pedir(ruta, cabeceras)
+            self.bytes_recibidos += len(cuerpo)
+            if resp.status == 401 and not intento:
+                self._set_meta('token', None)
+                continue
+            if resp.getheader('ETag'):
+                self._set_meta('etag', resp.getheader('ETag'))
+            return resp.status, (json.loads(cuerpo) if cuerpo else None)
+
+    # --- Sincronizacion ---
+
+    def sincronizar(self):
+        """Un ciclo de deltaSync. Devuelve el resumen de lo aplicado a la cache."""
+        bytes_antes = self.bytes_recibidos
+        ultimo = int(self._meta('ultimo_ts') or 0)
+        if ultimo == 0 or self.total() == 0:
+            estado, datos = self._get('/api/products', condicional=False)
+            modo = 'completo'
+        else:
+            estado, datos = self._get(f"/api/products/since?t={ultimo}&delta=1")
+            modo = 'delta' if datos and 'cambios' in datos else 'catalogo'
+
+        if estado == 304 or (estado == 200 and not datos.get('hasChanges', True)):
+            resumen = {"modo": 'sin_cambios', "insertados": 0, "actualizados": 0, "eliminados": 0, "iguales": 0}
+        elif estado != 200:
+            raise ConnectionError(f"Master respondio HTTP {estado}")
+        elif modo == 'delta':
+            resumen = self.aplicar_cambios(datos['cambios'], datos.get('eliminados') or [])
+        else:
+            resumen = self.aplicar_catalogo(datos.get('productos') or [])
+        resumen["modo"] = resumen.get("modo", modo)
+
+        if estado == 200 and datos.get('timestamp'):
+            self._set_meta('ultimo_ts', str(datos['timestamp']))
+        if estado == 200 and datos.get('categorias') is not None:
+            self._set_meta('categorias', json.dumps(datos['categorias']))
+        self.db.commit()
+        resumen["bytes"] = self.bytes_recibidos - bytes_antes
+        return resumen
+
+    def _upsert(self, filas):
+        self.db.executemany(
+            "INSERT OR REPLACE INTO productos (id, codigo, nombre_norm, huella, datos) VALUES (?, ?, ?, ?, ?)",
+            ((clave(p), p.get('codigo'), normalizar_nombre(p.get('nombre')), h,
+              json.dumps(p, separators=(',', ':'), ensure_ascii=False)) for p, h in filas))
+
+    def _diferencias(self, productos):
+        """Separa (insertar, actualizar, iguales) comparando huellas con la cache."""
+        actuales = dict(self.db.execute("SELECT id, huella FROM productos"))
+        nuevos, cambiados, iguales = [], [], 0
+        for p in productos:
+            h = huella(p)
+            previa = actuales.get(clave(p))
+            if previa is None:
+                nuevos.append((p, h))
+            elif previa != h:
+                cambiados.append((p, h))
+            else:
+                iguales += 1
+        return actuales, nuevos, cambiados, iguales
+
+    def aplicar_catalogo(self, productos):
+        """Catalogo completo (Master v3.0): escribe solo filas nuevas/cambiadas y borra las ausentes."""
+        actuales, nuevos, cambiados, iguales = self._diferencias(productos)
+        ausentes = actuales.keys() - {clave(p) for p in productos}
+        with self.db:
+            self._upsert(nuevos + cambiados)
+            self.db.executemany("DELETE FROM productos WHERE id = ?", ((k,) for k in ausentes))
+        return {"insertados": len(nuevos), "actualizados": len(cambiados),
+                "eliminados": len(ausentes), "iguales": iguales}
+
+    def aplicar_cambios(self, cambios, eliminados):
+        """Respuesta delta: solo las filas tocadas desde el ultimo timestamp."""
+        _, nuevos, cambiados, iguales = self._diferencias(cambios)
+        with self.db:
+            self._upsert(nuevos + cambiados)
+            borrados = self.db.executemany("DELETE FROM productos WHERE id = ?", ((k,) for k in eliminados)).rowcount
+        return {"insertados": len(nuevos), "actualizados": len(cambiados),
+                "eliminados": max(borrados, 0), "iguales": iguales}
+
+    # --- Consultas locales ---
+
+    def total(self):
+        return self.db.execute("SELECT COUNT(*) FROM productos").fetchone()[0]
+
+    def _uno(self, where, valor):
+        fila = self.db.execute(f"SELECT datos FROM productos WHERE {where} = ? LIMIT 1", (valor,)).fetchone()
+        return json.loads(fila[0]) if fila else None
+
+    def producto(self, pid):
+        return self._uno('id', pid)
+
+    def por_codigo(self, codigo):
+        return self._uno('codigo', codigo)
+
+    def por_nombre(self, nombre):
+        return self._uno('nombre_norm', normalizar_nombre(nombre))
+
+    def cerrar(self):
+        if self.http is not None:
+            self.http.close()
+        self.db.close()
+
+
+# --- PRUEBAS (Master mock en un hilo aparte) ---
+
+def _master_en_hilo(servidor):
+    loop = asyncio.new_event_loop()
+    srv = loop.run_until_complete(servidor.iniciar('127.0.0.1', 0))
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop, srv.sockets[0].getsockname()[1]
+
+
+def _en_master(loop, fn, *args):
+    """Ejecuta una mutacion del Master dentro de su propio event loop."""
+    async def _llamar():
+        return fn(*args)
+    return asyncio.run_coroutine_threadsafe(_llamar(), loop).result()
+
+
+def run_tests():
+    catalogo = catalogo_sintetico(2000)
+    for p in catalogo:
+        p["codigo"] = f"IMP-{p['id']:03d}"
+    servidor = ServidorLAN(catalogo)
+    loop, puerto = _master_en_hilo(servidor)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = os.path.join(tmp, 'cache.sqlite')
+        cliente = ClienteSyncLAN('127.0.0.1', puerto, cache)
+        r = cliente.sincronizar()
+        assert (r["modo"], r["insertados"], cliente.total()) == ('completo', 2000, 2000), r
+        completo = r["bytes"]
+
+        r = cliente.sincronizar()
+        assert r["modo"] == 'sin_cambios' and r["bytes"] == 0, f"FALLO CONDICIONAL: {r}"
+
+        time.sleep(0.002)
+        cambio = [dict(p) for p in servidor.productos]
+        cambio[41]["precio"] = 2.75
+        _en_master(loop, servidor.actualizar_catalogo, cambio)
+        r = cliente.sincronizar()
+        assert (r["modo"], r["actualizados"], r["insertados"]) == ('delta', 1, 0), f"FALLO DELTA: {r}"
+        assert r["bytes"] * 50 < completo, f"FALLO DELTA: {r['bytes']} vs {completo} bytes"
+        assert cliente.por_codigo('IMP-042')["precio"] == 2.75
+
+        _en_master(loop, servidor.procesar_stock, [{"nombre": 'PRODUCTO 7', "delta": -3, "timestamp": 1}])
+        _en_master(loop, servidor.actualizar_catalogo, servidor.productos[1:])
+        r = cliente.sincronizar()
+        assert (r["actualizados"], r["eliminados"]) == (1, 1), f"FALLO STOCK/BORRADO: {r}"
+        assert cliente.por_nombre('Producto 7')["stock"] == 97 and cliente.producto(1) is None
+        cliente.cerrar()
+
+        # Cache persistida: reabrir no vuelve a bajar el catalogo
+        cliente = ClienteSyncLAN('127.0.0.1', puerto, cache)
+        r = cliente.sincronizar()
+        assert r["modo"] == 'sin_cambios' and cliente.total() == 1999, r
+        cliente.cerrar()
+
+    # Master v3.0 (sin extension): llega el catalogo, pero solo se escribe la fila cambiada
+    legado = ServidorLAN(catalogo, delta=False)
+    loop, puerto = _master_en_hilo(legado)
+    cliente = ClienteSyncLAN('127.0.0.1', puerto, ':memory:')
+    cliente.sincronizar()
+    time.sleep(0.002)
+    cambio = [dict(p) for p in legado.productos]
+    cambio[0]["precio"] = 9.99
+    _en_master(loop, legado.actualizar_catalogo, cambio)
+    r = cliente.sincronizar()
+    assert (r["modo"], r["actualizados"], r["iguales"]) == ('catalogo', 1, 1999), f"FALLO LEGADO: {r}"
+    cliente.cerrar()
+    print("[OK] PRUEBAS EXITOSAS")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        run_tests()
+        exit(0)
+    # Uso: python scripts/lan_sync_client.py host[:puerto] [cache.sqlite] [segundos]
+    host, _, puerto = sys.argv[1].partition(':')
+    cache = sys.argv[2] if len(sys.argv) > 2 else CACHE_DEFAULT
+    cada = float(sys.argv[3]) if len(sys.argv) > 3 else 0
+    cliente = ClienteSyncLAN(host, int(puerto or LAN_PORT), cache)
+    try:
+        while True:
+            r = cliente.sincronizar()
+            print(f"[{time.strftime('%H:%M:%S')}] {r['modo']}: +{r['insertados']} ~{r['actualizados']} "
+                  f"-{r['eliminados']} ({r['bytes']:,} bytes) | cache: {cliente.total():,} productos")
+            if r['modo'] == 'catalogo':
+                print("  [AVISO] El Master no soporta delta=1 (lanServer.js sin la extension): "
+                      "se bajo el catalogo completo, sin ahorro de red.")
+            if not cada:
+                break
+            time.sleep(cada)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cliente.cerrar()
@@ -0,0 +1,292 @@
+# scripts/lector_capsula.py
+import json
+import re
+
+import numpy as np
+
+# DIRECTIVA: TIME_CAPSULE_SOP
+# Lector incremental de Capsulas de Tiempo (generarCapsulaDeTiempo).
+# Recorre el JSON por bloques y entrega los registros de las tablas pedidas
+# uno a uno, sin cargar el respaldo completo en memoria.
+#
+# Soporta los mismos formatos que detecta analyze_backup_payload.js:
+#   - V2 'v2-unified': tablas dentro de data.dexie como Array Nativo.
+#   - Legacy: tablas codificadas como String JSON (y tablas en la raiz, V1).
+
+TAM_BLOQUE = 1 << 16
+
+_DECODER = json.JSONDecoder()
+_ESPACIOS = re.compile(r'[ \t\n\r]*')
+# Tramo de una cadena JSON con escapes completos (se corta antes de uno partido)
+_TRAMO_CADENA = re.compile(r'(?:[^"\\]+|\\(?:u[0-9a-fA-F]{4}|[^u]))*')
+
+
+class RespaldoInvalido(ValueError):
+    pass
+
+
+class _Lector:
+    """Tokenizador minimo sobre un flujo de texto con buffer acotado."""
+
+    def __init__(self, fuente, tam_bloque=TAM_BLOQUE):
+        self.fuente = fuente
+        self.tam_bloque = tam_bloque
+        self.buf = ''
+        self.pos = 0
+        self.base = 0  # Caracteres ya descartados del buffer (offset absoluto = base + pos)
+        self.eof = False
+
+    def _cargar(self):
+        # Descarta lo consumido; si un valor no cabe, el bloque crece (lectura amortizada)
+        if self.eof:
+            return False
+        bloque = self.fuente.read(max(self.tam_bloque, len(self.buf) - self.pos))
+        if not bloque:
+            self.eof = True
+            return False
+        self.base += self.pos
+        self.buf = self.buf[self.pos:] + bloque
+        self.pos = 0
+        return True
+
+    def caracter(self):
+        while True:
+            self.pos = _ESPACIOS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._cargar():
+                raise RespaldoInvalido("Fin inesperado del respaldo")
+
+    def esperar(self, c):
+        if self.caracter() != c:
+            raise RespaldoInvalido(f"Se esperaba '{c}' en la posicion {self.pos}")
+        self.pos += 1
+
+    def valor(self):
+        """Decodifica el siguiente valor JSON completo."""
+        self.caracter()
+        while True:
+            try:
+                obj, fin = _DECODER.raw_decode(self.buf, self.pos)
+                # Un numero al borde del buffer podria continuar en el siguiente bloque
+                if fin < len(self.buf) or self.eof:
+                    self.pos = fin
+                    return obj
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise RespaldoInvalido(f"JSON corrupto: {e}") from e
+            self._cargar()
+
+    def saltar(self):
+        """Consume el siguiente valor sin construirlo (tablas que no interesan)."""
+        c = self.caracter()
+        if c == '"':
+            self._saltar_cadena()
+            return
+        if c not in '[{':
+            self.valor()
+            return
+
+        self._saltar_contenedor()
+
+    def _saltar_contenedor(self):
+        """
+        Salta un objeto/array completo escaneando cada bloque con NumPy:
+        comillas no escapadas -> paridad de cadena; corchetes fuera de
+        cadenas -> profundidad acumulada. Sin bucle Python por token.
+        """
+        profundidad, en_cadena = 0, 0
+        while True:
+            tramo = self.buf[self.pos:]
+            # Una racha de '\\' al final puede escapar el primer caracter del bloque siguiente
+            n = len(tramo.rstrip('\\'))
+            if n:
+                cod = np.frombuffer(tramo[:n].encode('utf-32-le'), dtype=np.uint32)
+                comilla = cod == 34
+                barra = cod == 92
+                if barra.any():
+                    # Una racha de barras de largo impar escapa el caracter siguiente
+                    borde = np.diff(barra.view(np.int8), prepend=0, append=0)
+                    inicios, fines = np.flatnonzero(borde == 1), np.flatnonzero(borde == -1)
+                    escapados = fines[(fines - inicios) % 2 == 1]
+                    comilla[escapados[escapados < n]] = False
+                # Solo se recorren las posiciones relevantes (comillas y corchetes)
+                idx = np.flatnonzero(comilla | (cod == 91) | (cod == 93) | (cod == 123) | (cod == 125))
+                sel = cod[idx]
+                es_comilla = sel == 34
+                fuera = ((np.cumsum(es_comilla, dtype=np.int32) + en_cadena) & 1) == 0
+                paso = np.where(fuera & ((sel == 91) | (sel == 123)), 1,
+                                np.where(fuera & ((sel == 93) | (sel == 125)), -1, 0))
+                nivel = profundidad + np.cumsum(paso, dtype=np.int32)
+                cierre = np.flatnonzero((nivel == 0) & ~es_comilla)
+                if len(cierre):
+                    self.pos += int(idx[cierre[0]]) + 1
+                    return
+                if len(idx):
+                    profundidad, en_cadena = int(nivel[-1]), int(not fuera[-1])
+                self.pos += n
+            if not self._cargar():
+                raise RespaldoInvalido("Fin inesperado del respaldo")
+
+    def _saltar_cadena(self):
+        rel = 1  # Offset relativo a self.pos (el buffer se rebasa al cargar)
+        while True:
+            j = self.buf.find('"', self.pos + rel)
+            if j < 0:
+                rel = len(self.buf) - self.pos
+                if not self._cargar():
+                    raise RespaldoInvalido("Cadena sin cerrar")
+                continue
+            k = j - 1
+            while self.buf[k] == '\\':
+                k -= 1
+            if (j - 1 - k) % 2 == 0:
+                self.pos = j + 1
+                return
+            rel = j + 1 - self.pos
+
+    def claves(self):
+        """Itera las claves de un objeto. El llamador consume cada valor."""
+        self.esperar('{')
+        if self.caracter() == '}':
+            self.pos += 1
+            return
+        while True:
+            clave = self.valor()
+            self.esperar(':')
+            yield clave
+            c = self.caracter()
+            self.pos += 1
+            if c == '}':
+                return
+            if c != ',':
+                raise RespaldoInvalido(f"Se esperaba ',' o '}}' en la posicion {self.pos}")
+
+    def elementos(self):
+        """Itera los elementos de un array, uno a la vez."""
+        self.esperar('[')
+        if self.caracter() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.valor()
+            c = self.caracter()
+            self.pos += 1
+            if c == ']':
+                return
+            if c != ',':
+                raise RespaldoInvalido(f"Se esperaba ',' o ']' en la posicion {self.pos}")
+
+
+class _CadenaJSON:
+    """Expone el contenido de una cadena JSON (tabla legacy) como flujo de texto."""
+
+    def __init__(self, lector):
+        self.lector = lector
+        self.cerrada = False
+        lector.esperar('"')
+
+    def read(self, n):
+        lec = self.lector
+        while not self.cerrada:
+            if lec.pos >= len(lec.buf) and not lec._cargar():
+                raise RespaldoInvalido("Tabla legacy sin cerrar")
+            fin = _TRAMO_CADENA.match(lec.buf, lec.pos, min(len(lec.buf), lec.pos + n)).end()
+            tramo = lec.buf[lec.pos:fin]
+            lec.pos = fin
+            if fin < len(lec.buf) and lec.buf[fin] == '"':
+                lec.pos += 1
+                self.cerrada = True
+            if tramo:
+                return json.loads('"' + tramo + '"')
+            if not self.cerrada and not lec._cargar():
+                raise RespaldoInvalido("Tabla legacy sin cerrar")
+        return ''
+
+    def drenar(self):
+        while self.read(TAM_BLOQUE):
+            pass
+
+
+def _registros(lec):
+    c = lec.caracter()
+    if c == '[':
+        yield from lec.elementos()
+    elif c == '"':
+        # Formato String Legacy: JSON.parse(target[t] || '[]')
+        cadena = _CadenaJSON(lec)
+        interno = _Lector(cadena)
+        interno._cargar()
+        if interno.buf.strip():
+            yield from interno.elementos()
+        cadena.drenar()
+    else:
+        lec.saltar()  # null / tabla vacia
+
+
+def _es_bloques(ruta):
+    with open(ruta, 'rb') as f:
+        return f.read(6) == b'LCAP1\n'
+
+
+def iterar_tablas(ruta, tablas):
+    """
+    Recorre el respaldo una sola vez y entrega (tabla, registro) para las tablas
+    pedidas, en el orden en que aparecen en el archivo. '_meta' y 'localStorage'
+    se entregan como un unico registro. Acepta tambien Capsulas por Bloques (.lcap).
+    """
+    tablas = set(tablas)
+    if _es_bloques(ruta):
+        from capsula_bloques import CapsulaBloques
+        yield from CapsulaBloques(ruta).iterar_tablas(tablas)
+        return
+    with open(ruta, encoding='utf-8-sig') as f:
+        lec = _Lector(f)
+        for clave in lec.claves():
+            if clave == 'dexie':
+                for tabla in lec.claves():
+                    if tabla in tablas:
+                        for registro in _registros(lec):
+                            yield tabla, registro
+                    else:
+                        lec.saltar()
+            elif clave in ('_meta', 'localStorage') and clave in tablas:
+                # Cabecera de la capsula (schema_version, terminal, fecha) / llaves de localStorage
+                yield clave, lec.valor()
+            elif clave in tablas:
+                # Legacy V1: tablas en la raiz del JSON
+                for registro in _registros(lec):
+                    yield clave, registro
+            else:
+                lec.saltar()
+
+
+def iterar_tabla(ruta, tabla='ventas'):
+    """Entrega los registros de una tabla del respaldo, uno a uno."""
+    for _, registro in iterar_tablas(ruta, (tabla,)):
+        yield registro
+
+
+def estructura(ruta):
+    """
+    Claves de la raiz y tablas de 'dexie' con su tamano en caracteres,
+    sin construir registros: ([clave, ...], {tabla: caracteres}).
+    """
+    if _es_bloques(ruta):
+        from capsula_bloques import CapsulaBloques
+        cap = CapsulaBloques(ruta)
+        raiz = ['dexie'] + [k for k in ('localStorage', '_meta') if cap.toc.get(k) is not None]
+        return raiz, {t: sum(b["largo"] for b in cap.bloques(t)) for t in cap.tablas()}
+    raiz, tablas = [], {}
+    with open(ruta, encoding='utf-8-sig') as f:
+        lec = _Lector(f)
+        for clave in lec.claves():
+            raiz.append(clave)
+            if clave == 'dexie' and lec.caracter() == '{':
+                for tabla in lec.claves():
+                    inicio = lec.base + lec.pos
+                    lec.saltar()
+                    tablas[tabla] = lec.base + lec.pos - inicio
+            else:
+                lec.saltar()
+    return raiz, tablas
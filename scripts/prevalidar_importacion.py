@@ -0,0 +1,619 @@
+# scripts/prevalidar_importacion.py
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import unicodedata
+import xml.etree.ElementTree as ET
+import zipfile
+from difflib import SequenceMatcher
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from generate_mock_import import COLUMNS
+from lector_capsula import iterar_tabla
+
+# DIRECTIVA: Importacion masiva (BulkImportModal.jsx) - Pre-validacion offline
+# La app lee el Excel entero con XLSX.read + sheet_to_json y arma el preview en
+# el hilo de la UI: con 100k filas se congela. Esta etapa corre ANTES, en streaming:
+#   - Lectura xlsx en streaming (iterparse de la hoja; --openpyxl usa openpyxl
+#     read_only, mas lento sin lxml) o CSV. Mismos sinonimos de columna
+#     y misma limpieza que analyzeData (nombre/categoria en mayusculas, minimo || 5,
+#     codigo automatico IMP-<ts>-<fila>).
+#   - Tipos: donde cleanNumber() importaria un 0 o un numero equivocado en
+#     silencio ('12abc', '1.234,50' -> 1.234), aqui es ERROR o ADVERTENCIA.
+#   - Margen (markup, como fiscalEngine): precio < costo o markup > --margen-max.
+#   - codigo repetido en la hoja -> DUPLICADO (se conserva la primera fila).
+#     codigo ya existente en 'productos' -> va a los archivos de actualizacion.
+#   - Nombres casi iguales (acentos, puntuacion, orden, un token con error) contra
+#     el catalogo y contra la misma hoja: indice de bloques por tokens, y solo los
+#     candidatos del mismo bloque se comparan con SequenceMatcher.
+# Salida: Excel limpios de --tam-lote filas (nuevos_0001.xlsx, actualizaciones_0001.xlsx)
+# en el formato de la plantilla, + reporte.csv con cada problema + resumen.json.
+#
+# Uso: python scripts/prevalidar_importacion.py proveedor.xlsx --productos respaldo.json
+#      [--tam-lote 5000] [--margen-max 500] [--excluir-similares] [--openpyxl]
+# Los codigos ya existentes en el catalogo salen en actualizaciones_*.xlsx; el
+# resto en nuevos_*.xlsx, todo bajo .tmp/importacion/.
+
+SALIDA_DEFAULT = os.path.join('.tmp', 'importacion')
+TAM_LOTE_DEFAULT = 5_000
+MARGEN_MAX_DEFAULT = 500  # % de markup; mas arriba suele ser una coma corrida
+SIMILITUD_MIN = 0.9
+MAX_BLOQUE = 64  # Candidatos por clave de bloque (bloques genericos no crecen sin limite)
+
+# Espejo de columnMap (analyzeData)
+SINONIMOS = {
+    'nombre': ['nombre', 'producto', 'articulo', 'descripcion', 'name', 'item'],
+    'codigo': ['codigo', 'cod', 'sku', 'id_externo', 'barcode', 'ean'],
+    'precio': ['precio', 'p.venta', 'venta', 'p.publico', 'price', 'precioventa'],
+    'costo': ['costo', 'p.compra', 'compra', 'p.costo', 'cost', 'preciocosto'],
+    'stock': ['stock', 'cantidad', 'cant', 'existencia', 'qty', 'amount'],
+    'categoria': ['categoria', 'cat', 'rubro', 'category', 'departamento'],
+    'minimo': ['minimo', 'stockminimo', 'min', 'alerta'],
+}
+
+ERROR, ADVERTENCIA, DUPLICADO = 'ERROR', 'ADVERTENCIA', 'DUPLICADO'
+
+_NUMERO = re.compile(r'^-?\d+(?:[.,]\d+)?$')
+_MILES = re.compile(r'^-?\d{1,3}(?:([.,])\d{3})+(?:(?!\1)[.,]\d+)?$')
+_NO_ALNUM = re.compile(r'[^0-9A-Z]+')
+
+
+def mapear_columnas(encabezado):
+    """Encabezado de la hoja -> {campo: indice}. La primera columna que coincide gana (keys.find)."""
+    mapa = {}
+    for campo, sinonimos in SINONIMOS.items():
+        for i, titulo in enumerate(encabezado):
+            if titulo is None:
+                continue
+            normal = re.sub(r'[\s_/]', '', str(titulo).lower())
+            if normal in sinonimos or normal == campo:
+                mapa[campo] = i
+                break
+    return mapa
+
+
+def numero_app(val):
+    """cleanNumber() de analyzeData, tal cual (incluye sus errores silenciosos)."""
+    if val is None:
+        return 0
+    if isinstance(val, (int, float)) and not isinstance(val, bool):
+        return val
+    limpio = re.sub(r'[$\sBs]', '', str(val)).replace(',', '.', 1)
+    m = re.match(r'^\s*[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?', limpio)
+    return float(m.group()) if m else 0
+
+
+def limpiar_numero(val):
+    """-> (valor, problema|None). Estricto: solo acepta lo que la app leeria bien."""
+    if val is None or (isinstance(val, str) and not val.strip()):
+        return 0, None
+    if isinstance(val, bool):
+        return 0, (ERROR, f"booleano {val!r}")
+    if isinstance(val, (int, float)):
+        return val, None
+    texto = re.sub(r'\s|\$|Bs\.?', '', str(val), flags=re.IGNORECASE)
+    if _NUMERO.match(texto):
+        return float(texto.replace(',', '.')), None
+    m = _MILES.match(texto)
+    if m:
+        # '1.234,50' / '1,234.50': separador de miles; la app leeria otra cosa
+        decimal = ',' if m.group(1) == '.' else '.'
+        entero, _, fraccion = texto.partition(decimal)
+        valor = float(entero.replace(m.group(1), '') + ('.' + fraccion if fraccion else ''))
+        return valor, (ADVERTENCIA, f"separador de miles '{val}' -> {valor:g} (la app leeria {numero_app(val):g})")
+    return 0, (ERROR, f"no numerico '{val}' (la app importaria {numero_app(val):g})")
+
+
+def normalizar_nombre(nombre):
+    """Mayusculas sin acentos ni puntuacion -> tokens."""
+    texto = str(nombre).upper()
+    if not texto.isascii():
+        texto = ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c))
+    return _NO_ALNUM.sub(' ', texto).split()
+
+
+def claves_bloque(tokens):
+    """
+    Tokens con digitos (tallas, pesos, numeros) se conservan siempre: '1KG' y '2KG'
+    nunca caen juntos. Del resto: la lista completa (orden y puntuacion distintos) y
+    la lista sin uno de ellos (un token con error de tipeo, de mas o de menos).
+    """
+    # Los tokens ya son [0-9A-Z]+: isalpha() == sin digitos
+    numeros = tuple(sorted(t for t in tokens if not t.isalpha()))
+    palabras = sorted({t for t in tokens if t.isalpha()})
+    claves = {(numeros, tuple(palabras))}
+    if len(palabras) > 1:
+        for i in range(len(palabras)):
+            claves.add((numeros, tuple(palabras[:i] + palabras[i + 1:])))
+    return claves
+
+
+class IndiceNombres:
+    """Indice de bloques: clave -> [(origen, referencia, nombre normalizado)]."""
+
+    def __init__(self, similitud=SIMILITUD_MIN, max_bloque=MAX_BLOQUE):
+        self.bloques = {}
+        self.similitud = similitud
+        self.max_bloque = max_bloque
+        self.saturados = 0
+        self.comparaciones = 0
+
+    def agregar(self, origen, referencia, tokens, claves=None):
+        entrada = (origen, referencia, ' '.join(tokens))
+        for clave in claves or claves_bloque(tokens):
+            lista = self.bloques.setdefault(clave, [])
+            if len(lista) < self.max_bloque:
+                lista.append(entrada)
+            elif len(lista) == self.max_bloque:
+                lista.append(None)  # Marca de bloque saturado (se cuenta una vez)
+                self.saturados += 1
+
+    def buscar(self, tokens, excluir=None, claves=None):
+        """Mejor candidato (similitud, origen, referencia, nombre) o None."""
+        texto = ' '.join(tokens)
+        vistos, mejor = set(), None
+        for clave in claves or claves_bloque(tokens):
+            for entrada in self.bloques.get(clave, ()):
+                if entrada is None or entrada[:2] in vistos or entrada[1] == excluir:
+                    continue
+                vistos.add(entrada[:2])
+                sm = SequenceMatcher(None, texto, entrada[2], autojunk=False)
+                if sm.real_quick_ratio() < self.similitud or sm.quick_ratio() < self.similitud:
+                    continue
+                self.comparaciones += 1
+                r = sm.ratio()
+                if r >= self.similitud and (mejor is None or r > mejor[0]):
+                    mejor = (r, entrada[0], entrada[1], entrada[2])
+        return mejor
+
+
+def cargar_catalogo(ruta, indice):
+    """productos de una Capsula (.json/.lcap): codigo -> id, y nombres al indice."""
+    codigos = {}
+    for p in iterar_tabla(ruta, 'productos'):
+        if p.get('codigo'):
+            codigos[str(p['codigo']).strip()] = p.get('id')
+        if p.get('nombre'):
+            indice.agregar('catalogo', str(p.get('codigo') or p.get('id')), normalizar_nombre(p['nombre']))
+    return codigos
+
+
+_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+
+@lru_cache(maxsize=None)
+def _indice_columna(letras):
+    n = 0
+    for c in letras.upper():
+        n = n * 26 + ord(c) - 64
+    return n - 1
+
+
+def _columna(ref):
+    """'AB12' -> 27 (base 0)."""
+    return _indice_columna(ref.rstrip('0123456789'))
+
+
+def _texto(el):
+    """<si>/<is>: texto plano o runs de texto enriquecido (sin la guia fonetica rPh)."""
+    t = el.find(_NS + 't')
+    if t is not None:
+        return t.text or ''
+    return ''.join(r.findtext(_NS + 't') or '' for r in el.findall(_NS + 'r'))
+
+
+def _filas_xlsx(ruta):
+    """
+    Primera hoja leyendo el XML del zip con iterparse (expat en C). Mismos valores que
+    openpyxl read_only + values_only, unas 4 veces mas rapido cuando no hay lxml.
+    Diferencia conocida: una fecha con formato llega como su numero de serie.
+    """
+    with zipfile.ZipFile(ruta) as z:
+        libro = ET.fromstring(z.read('xl/workbook.xml'))
+        rid = libro.find(f'{_NS}sheets/{_NS}sheet').get(_NS_REL + 'id')
+        rels = ET.fromstring(z.read('xl/_rels/workbook.xml.rels'))
+        destino = next(r.get('Target') for r in rels if r.get('Id') == rid)
+        hoja = destino.lstrip('/') if destino.startswith('/') else 'xl/' + destino
+
+        compartidas = []
+        if 'xl/sharedStrings.xml' in z.namelist():
+            for _, el in ET.iterparse(z.open('xl/sharedStrings.xml')):
+                if el.tag == _NS + 'si':
+                    compartidas.append(_texto(el))
+                    el.clear()
+
+        fila, ultima, col = {}, 0, -1
+        for _, el in ET.iterparse(z.open(hoja)):
+            tag = el.tag
+            if tag == _NS + 'c':
+                ref = el.get('r')
+                col = _columna(ref) if ref else col + 1
+                tipo = el.get('t')
+                if tipo == 'inlineStr':
+                    valor = _texto(el.find(_NS + 'is'))
+                else:
+                    v = el.findtext(_NS + 'v')
+                    if v is None:
+                        valor = None
+                    elif tipo == 's':
+                        valor = compartidas[int(v)]
+                    elif tipo == 'b':
+                        valor = v == '1'
+                    elif tipo in ('str', 'e'):
+                        valor = v
+                    else:
+                        valor = float(v) if '.' in v or 'E' in v or 'e' in v else int(v)
+                if valor is not None:
+                    fila[col] = valor
+                el.clear()
+            elif tag == _NS + 'row':
+                r = int(el.get('r') or ultima + 1)
+                for _ in range(ultima + 1, r):
+                    yield ()  # Filas vacias intermedias: conservan la numeracion de Excel
+                yield tuple(fila.get(i) for i in range(max(fila) + 1)) if fila else ()
+                fila, ultima, col = {}, r, -1
+                el.clear()
+
+
+def leer_filas(ruta, motor='rapido'):
+    """Filas crudas (tuplas) de la primera hoja del Excel, o de un CSV."""
+    if ruta.lower().endswith('.csv'):
+        with open(ruta, newline='', encoding='utf-8-sig') as f:
+            yield from csv.reader(f)
+        return
+    if motor == 'rapido':
+        yield from _filas_xlsx(ruta)
+        return
+    from openpyxl import load_workbook
+    # read_only: XML en streaming, sin cargar la hoja entera en memoria
+    wb = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        yield from wb.worksheets[0].iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+# XLSX minimo (una hoja, celdas inlineStr): openpyxl write_only tarda ~0.2 ms por fila
+# sin lxml; plantillas de texto dentro del zip lo dejan en una fraccion.
+_XLSX_FIJOS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        'officeDocument" Target="xl/workbook.xml"/></Relationships>'),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Productos" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        'worksheet" Target="worksheets/sheet1.xml"/></Relationships>'),
+}
+_XML_INVALIDO = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _fila_xml(numero, valores):
+    celdas = []
+    for col, v in zip('ABCDEFGHIJKLMNOPQRSTUVWXYZ', valores):
+        ref = f'{col}{numero}'
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            celdas.append(f'<c r="{ref}"><v>{v!r}</v></c>')
+        elif v is not None:
+            texto = escape(_XML_INVALIDO.sub('', str(v)))
+            celdas.append(f'<c r="{ref}" t="inlineStr"><is><t>{texto}</t></is></c>')
+    return f'<row r="{numero}">{"".join(celdas)}</row>'
+
+
+class EscritorLotes:
+    """Excel de la plantilla (COLUMNS) en partes de 'tam_lote' filas, escritas en streaming."""
+
+    def __init__(self, directorio, prefijo, tam_lote):
+        self.directorio, self.prefijo, self.tam_lote = directorio, prefijo, tam_lote
+        self.archivos = []
+        self.filas = 0
+        self._zip = self._hoja = None
+        self._en_lote = 0
+
+    def agregar(self, fila):
+        if self._hoja is None or self._en_lote == self.tam_lote:
+            self._cerrar()
+            ruta = os.path.join(self.directorio, f"{self.prefijo}_{len(self.archivos) + 1:04d}.xlsx")
+            self.archivos.append(ruta)
+            self._zip = zipfile.ZipFile(ruta, 'w', zipfile.ZIP_DEFLATED)
+            for nombre, contenido in _XLSX_FIJOS.items():
+                self._zip.writestr(nombre, contenido)
+            self._hoja = io.TextIOWrapper(self._zip.open('xl/worksheets/sheet1.xml', 'w'), encoding='utf-8')
+            self._hoja.write('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                             '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                             '<sheetData>' + _fila_xml(1, COLUMNS))
+            self._en_lote = 0
+        self._en_lote += 1
+        self.filas += 1
+        self._hoja.write(_fila_xml(self._en_lote + 1, fila))
+
+    def _cerrar(self):
+        if self._hoja is not None:
+            self._hoja.write('</sheetData></worksheet>')
+            self._hoja.close()
+            self._zip.close()
+            self._zip = self._hoja = None
+
+    def cerrar(self):
+        self._cerrar()
+        return self.archivos
+
+
+def prevalidar(ruta, productos=None, salida=SALIDA_DEFAULT, tam_lote=TAM_LOTE_DEFAULT,
+               margen_max=MARGEN_MAX_DEFAULT, similitud=SIMILITUD_MIN, excluir_similares=False,
+               motor='rapido'):
+    t0 = time.perf_counter()
+    os.makedirs(salida, exist_ok=True)
+    for viejo in os.listdir(salida):
+        if viejo.endswith('.xlsx') and viejo.startswith(('nuevos_', 'actualizaciones_')):
+            os.remove(os.path.join(salida, viejo))
+
+    indice = IndiceNombres(similitud)
+    codigos_catalogo = cargar_catalogo(productos, indice) if productos else {}
+    t_catalogo = time.perf_counter() - t0
+
+    nuevos = EscritorLotes(salida, 'nuevos', tam_lote)
+    actualizaciones = EscritorLotes(salida, 'actualizaciones', tam_lote)
+    conteo = {'filas': 0, 'nuevos': 0, 'actualizaciones': 0, 'sin_nombre': 0,
+              ERROR: 0, ADVERTENCIA: 0, DUPLICADO: 0, 'similares': 0}
+    codigos_hoja = {}
+    marca = int(time.time() * 1000)
+
+    with open(os.path.join(salida, 'reporte.csv'), 'w', newline='', encoding='utf-8') as f_rep:
+        reporte = csv.writer(f_rep)
+        reporte.writerow(['fila', 'codigo', 'nombre', 'severidad', 'problema'])
+
+        filas = leer_filas(ruta, motor)
+        columnas = mapear_columnas(next(filas, None) or ())
+        if 'nombre' not in columnas:
+            raise ValueError(f"{ruta}: no hay columna de nombre (sinonimos: {', '.join(SINONIMOS['nombre'])})")
+
+        def celda(fila, campo):
+            i = columnas.get(campo)
+            return fila[i] if i is not None and i < len(fila) else None
+
+        for n, fila in enumerate(filas):
+            numero_fila = n + 2  # Fila de Excel (1 = encabezado)
+            if not fila or all(v is None or v == '' for v in fila):
+                continue
+            conteo['filas'] += 1
+            nombre = str(celda(fila, 'nombre') or '').strip().upper()
+            codigo = str(celda(fila, 'codigo') or '').strip()
+            problemas = []
+
+            def anotar(severidad, texto):
+                problemas.append(severidad)
+                conteo[severidad] += 1
+                reporte.writerow([numero_fila, codigo, nombre, severidad, texto])
+
+            if not nombre:
+                # La app la salta en silencio (REQUISITO: Nombre es vital)
+                conteo['sin_nombre'] += 1
+                anotar(ERROR, "sin nombre")
+                continue
+            if not codigo:
+                codigo = f"IMP-{marca}-{n}"
+
+            valores = {}
+            for campo in ('costo', 'precio', 'stock', 'minimo'):
+                valor, problema = limpiar_numero(celda(fila, campo))
+                valores[campo] = valor
+                if problema:
+                    anotar(problema[0], f"{campo}: {problema[1]}")
+                elif valor < 0:
+                    anotar(ERROR, f"{campo} negativo ({valor:g})")
+            costo, precio = valores['costo'], valores['precio']
+            if precio == 0:
+                anotar(ADVERTENCIA, "precio 0")
+            elif costo == 0:
+                anotar(ADVERTENCIA, "costo 0 (margen sin base)")
+            elif costo > 0 and precio > 0:
+                markup = (precio - costo) * 100 / costo
+                if precio < costo:
+                    anotar(ADVERTENCIA, f"margen negativo: precio {precio:g} < costo {costo:g}")
+                elif markup > margen_max:
+                    anotar(ADVERTENCIA, f"markup {markup:.0f}% > {margen_max}% (coma corrida?)")
+
+            if codigo in codigos_hoja:
+                anotar(DUPLICADO, f"codigo repetido (primera vez en fila {codigos_hoja[codigo]})")
+                continue
+            codigos_hoja[codigo] = numero_fila
+
+            tokens = normalizar_nombre(nombre)
+            existente = codigo in codigos_catalogo
+            # Casi-duplicado contra el catalogo (otro codigo) o contra la misma hoja
+            claves = claves_bloque(tokens)
+            similar = indice.buscar(tokens, excluir=codigo, claves=claves)
+            if similar:
+                r, origen, ref, otro = similar
+                donde = f"catalogo {ref}" if origen == 'catalogo' else f"fila {ref}"
+                conteo['similares'] += 1
+                anotar(ADVERTENCIA, f"nombre similar ({r:.0%}) a {donde}: {otro}")
+            indice.agregar('hoja', numero_fila, tokens, claves)
+
+            if ERROR in problemas or (similar and excluir_similares):
+                continue
+            categoria = str(celda(fila, 'categoria') or 'General').strip().upper()
+            limpia = [codigo, nombre, categoria, costo, precio, valores['stock'], valores['minimo'] or 5]
+            if existente:
+                conteo['actualizaciones'] += 1
+                actualizaciones.agregar(limpia)
+            else:
+                conteo['nuevos'] += 1
+                nuevos.agregar(limpia)
+
+    resumen = {
+        "origen": os.path.abspath(ruta),
+        "conteo": conteo,
+        "archivos": {"nuevos": nuevos.cerrar(), "actualizaciones": actualizaciones.cerrar()},
+        "catalogo": len(codigos_catalogo),
+        "indice": {"bloques": len(indice.bloques), "saturados": indice.saturados,
+                   "comparaciones": indice.comparaciones},
+        "lector": motor,
+        "segundos": {"catalogo": round(t_catalogo, 2), "total": round(time.perf_counter() - t0, 2)},
+    }
+    with open(os.path.join(salida, 'resumen.json'), 'w', encoding='utf-8') as f:
+        json.dump(resumen, f, indent=2, ensure_ascii=False)
+    return resumen
+
+
+def run_tests():
+    # Numeros: lo que la app leeria en silencio vs lo que se valida aqui
+    assert limpiar_numero('$ 12,5') == (12.5, None) and limpiar_numero(7) == (7, None)
+    assert limpiar_numero('1.234,50')[0] == 1234.5 and numero_app('1.234,50') == 1.234
+    assert limpiar_numero('1,234.50')[0] == 1234.5 and limpiar_numero('1.234') == (1.234, None)
+    assert limpiar_numero('12abc') == (0, (ERROR, "no numerico '12abc' (la app importaria 12)"))
+    assert limpiar_numero(None) == (0, None) and limpiar_numero('  ') == (0, None)
+
+    # Bloques: acentos/orden/puntuacion y un token con error caen juntos; tallas no
+    a, b = normalizar_nombre('Harina P.A.N. 1kg'), normalizar_nombre('HARINA PAN 1KG')
+    assert a == ['HARINA', 'P', 'A', 'N', '1KG'] and b == ['HARINA', 'PAN', '1KG']
+    assert claves_bloque(normalizar_nombre('Café Molido 500g')) & claves_bloque(normalizar_nombre('MOLIDO CAFE 500G'))
+    assert claves_bloque(normalizar_nombre('ACEITE VATEL 1L')) & claves_bloque(normalizar_nombre('ACEITE VATELL 1L'))
+    assert not claves_bloque(normalizar_nombre('ACEITE VATEL 1L')) & claves_bloque(normalizar_nombre('ACEITE VATEL 2L'))
+    assert mapear_columnas(['SKU', 'Descripcion', 'P. Venta', 'Costo', 'Existencia']) == \
+        {'nombre': 1, 'codigo': 0, 'precio': 2, 'costo': 3, 'stock': 4}
+
+    try:
+        from openpyxl import Workbook, load_workbook
+    except ImportError:
+        print("[OK] PRUEBAS EXITOSAS (sin openpyxl: se omite la prueba de Excel)")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        respaldo = os.path.join(tmp, 'respaldo.json')
+        with open(respaldo, 'w', encoding='utf-8') as f:
+            json.dump({"dexie": {"productos": [
+                {"id": 1, "codigo": "750001", "nombre": "HARINA PAN 1KG"},
+                {"id": 2, "codigo": "750002", "nombre": "CAFÉ MOLIDO 500G"},
+            ]}}, f, ensure_ascii=False)
+
+        hoja = os.path.join(tmp, 'proveedor.xlsx')
+        wb = Workbook()
+        ws = wb.active
+        ws.append(['SKU', 'Producto', 'Categoria', 'P.Compra', 'P.Venta', 'Cant', 'Minimo'])
+        filas = [
+            ['750001', 'Harina PAN 1kg', 'viveres', 1, 1.5, 10, None],      # 2: existe -> actualizacion
+            ['880001', 'Cafe molido 500g', 'viveres', 3, 4.5, 5, 3],         # 3: similar a catalogo 750002
+            ['880002', 'ARROZ MARY 1KG', None, '1,10', '$ 1,60', 20, 5],     # 4: limpio
+            ['880002', 'ARROZ MARY 1KG', None, 1.1, 1.6, 20, 5],             # 5: codigo repetido
+            ['880003', 'ARROZ MARY 2KG', None, 2, 1.5, 20, 5],               # 6: margen negativo (2KG != 1KG)
+            ['880004', 'QUESO', None, 4, '12abc', 3, 1],                     # 7: precio no numerico
+            [None, None, None, 1, 2, 3, 4],                                  # 8: sin nombre
+            [None, 'PASTA 500G', None, '1.250,00', 1.8, 4, None],            # 9: separador de miles + sin codigo
+            ['880005', 'PASTA 500G', None, 0.5, 10, 4, None],                # 10: markup 1900% + similar a fila 9
+        ]
+        for fila in filas:
+            ws.append(fila)
+        wb.save(hoja)
+
+        # Lector rapido == openpyxl read_only (celdas sueltas, compartidas e inline, filas vacias)
+        ws.append([])
+        ws['B13'] = 'SUELTA'
+        wb.save(hoja)
+        def recortar(filas):  # openpyxl rellena con None hasta el ancho de la hoja
+            salida = []
+            for f in filas:
+                f = list(f)
+                while f and f[-1] is None:
+                    f.pop()
+                salida.append(f)
+            return salida
+        assert recortar(leer_filas(hoja)) == recortar(leer_filas(hoja, 'openpyxl'))
+        ws.delete_rows(12, 2)
+        wb.save(hoja)
+
+        salida = os.path.join(tmp, 'salida')
+        res = prevalidar(hoja, respaldo, salida, tam_lote=2)
+        c = res["conteo"]
+        assert c['filas'] == 9 and c['sin_nombre'] == 1 and c[DUPLICADO] == 1, c
+        assert c['actualizaciones'] == 1 and c['nuevos'] == 5 and c['similares'] == 2, c
+
+        with open(os.path.join(salida, 'reporte.csv'), encoding='utf-8') as f:
+            rep = {}
+            for r in csv.DictReader(f):
+                clave = (int(r['fila']), r['severidad'])
+                rep[clave] = rep.get(clave, '') + r['problema'] + '; '
+
+        assert 'catalogo 750002' in rep[(3, ADVERTENCIA)] and 'fila 9' in rep[(10, ADVERTENCIA)]
+        assert (4, ADVERTENCIA) not in rep and 'margen negativo' in rep[(6, ADVERTENCIA)]
+        assert 'la app importaria 12' in rep[(7, ERROR)] and rep[(8, ERROR)] == 'sin nombre; '
+        assert 'la app leeria 1.25' in rep[(9, ADVERTENCIA)]
+
+        # Lotes de 2 filas en el formato de la plantilla; la fila con ERROR no sale
+        assert [os.path.basename(p) for p in res["archivos"]["nuevos"]] == \
+            ['nuevos_0001.xlsx', 'nuevos_0002.xlsx', 'nuevos_0003.xlsx']
+        limpias = []
+        for parte in res["archivos"]["nuevos"]:
+            wb = load_workbook(parte, read_only=True)
+            encabezado, *datos = list(wb.worksheets[0].iter_rows(values_only=True))
+            wb.close()
+            assert list(encabezado) == COLUMNS and len(datos) <= 2
+            limpias.extend(datos)
+        assert [r[0] for r in limpias][:3] == ['880001', '880002', '880003'] and limpias[3][0].startswith('IMP-')
+        assert limpias[1] == ('880002', 'ARROZ MARY 1KG', 'GENERAL', 1.1, 1.6, 20, 5)
+        assert limpias[3][3] == 1250 and limpias[3][6] == 5  # minimo || 5
+
+        # --excluir-similares deja fuera los casi-duplicados
+        res = prevalidar(hoja, respaldo, salida, excluir_similares=True)
+        assert res["conteo"]['nuevos'] == 3 and len(res["archivos"]["nuevos"]) == 1
+    print("[OK] PRUEBAS EXITOSAS")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        run_tests()
+        exit(0)
+    parser = argparse.ArgumentParser(description="Pre-validacion del Excel de importacion masiva")
+    parser.add_argument('archivo', help="Excel (.xlsx) o CSV del proveedor")
+    parser.add_argument('--productos', help="Capsula de Tiempo con el catalogo actual (.json o .lcap)")
+    parser.add_argument('--salida', default=SALIDA_DEFAULT)
+    parser.add_argument('--tam-lote', type=int, default=TAM_LOTE_DEFAULT, help="Filas por Excel de salida")
+    parser.add_argument('--margen-max', type=float, default=MARGEN_MAX_DEFAULT, help="Markup %% maximo sin advertencia")
+    parser.add_argument('--similitud', type=float, default=SIMILITUD_MIN)
+    parser.add_argument('--excluir-similares', action='store_true')
+    parser.add_argument('--openpyxl', action='store_true', help="Leer con openpyxl read_only (mas lento)")
+    args = parser.parse_args()
+
+    try:
+        res = prevalidar(args.archivo, args.productos, args.salida, args.tam_lote,
+                         args.margen_max, args.similitud, args.excluir_similares,
+                         'openpyxl' if args.openpyxl else 'rapido')
+    except ImportError:
+        print("ERROR: openpyxl not installed.")
+        exit(2)
+    c = res["conteo"]
+    print(f"{c['filas']:,} filas en {res['segundos']['total']:.1f}s (catalogo: {res['catalogo']:,} codigos, "
+          f"{res['segundos']['catalogo']:.1f}s)")
+    print(f"  - Nuevos: {c['nuevos']:,} en {len(res['archivos']['nuevos'])} archivo(s)")
+    print(f"  - Actualizaciones (codigo existente): {c['actualizaciones']:,} en "
+          f"{len(res['archivos']['actualizaciones'])} archivo(s)")
+    print(f"  - Errores: {c[ERROR]:,} | Advertencias: {c[ADVERTENCIA]:,} | Codigos repetidos: {c[DUPLICADO]:,} | "
+          f"Nombres similares: {c['similares']:,}")
+    print(f"Reporte: {os.path.join(args.salida, 'reporte.csv')}")
+    exit(1 if c[ERROR] or c[DUPLICADO] else 0)
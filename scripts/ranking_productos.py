@@ -0,0 +1,433 @@
+# scripts/ranking_productos.py
+import argparse
+import heapq
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from itertools import count
+
+from dinero import Dinero, centavos, redondear
+from lector_capsula import iterar_tabla
+
+# DIRECTIVA: Ranking de productos (Top-N y ABC sobre venta.items)
+# Misma linea de venta que fiscalEngine.js (calcularKPIs) y el ranking de
+# useUnifiedAnalytics.js:
+#   - Solo ventas validas (isValidSale: COMPLETADA, sin ANULADO ni COBRO_DEUDA).
+#   - Clave: item.id || item.codigo || item.nombre. Nombre/codigo se completan
+#     con la tabla 'productos' (por id o por codigo).
+#   - Ingreso = precio x cantidad. Costo = (costo || costoUnitario || costo del
+#     catalogo) x contenido del bulto/paquete x cantidad. Margen = ingreso - costo.
+# Montos en enteros: centavos x milesimas de cantidad (5 decimales de USD).
+#
+# Modos:
+#   - exacto: un acumulador por producto (memoria = productos distintos).
+#   - aproximado: Space-Saving ponderado con 'capacidad' contadores por medida.
+#     Memoria fija sin importar los anios de historia. Cada estimado trae su
+#     error maximo: real <= estimado <= real + error, y todo producto con mas
+#     de total/capacidad en esa medida esta garantizado en el resumen.
+#     Las lineas con perdida (margen < 0) no suman peso al ranking por margen.
+#
+# Uso: python scripts/ranking_productos.py respaldo.json [--top 20] [--abc margen]
+#      python scripts/ranking_productos.py respaldo.json --aproximado --capacidad N
+# Top-N por unidades, ingresos y margen + clases ABC (80/95 % acumulado).
+# En modo aproximado un '?' indica que la capacidad no alcanza para garantizar
+# ese producto (o su clase ABC): subir --capacidad o correr el modo exacto.
+
+MEDIDAS = ('unidades', 'ingresos', 'margen')
+MIL = 1000  # Cantidades en milesimas (ventas por peso: 0.250 kg)
+CAPACIDAD_DEFAULT = 10_000
+LIMITES_ABC = (80, 95)  # % acumulado del total: A hasta 80, B hasta 95, C el resto
+
+
+def es_venta_valida(v):
+    """isValidSale (fiscalEngine.js)."""
+    return v.get('status') == 'COMPLETADA' and v.get('tipo') not in ('ANULADO', 'COBRO_DEUDA')
+
+
+def _clave(valor):
+    # Los ids llegan como numero o string segun el origen: se unifican
+    if isinstance(valor, str) and valor.isdigit():
+        return int(valor)
+    return valor
+
+
+def clave_item(item):
+    if item.get('id'):
+        return _clave(item['id'])
+    # El codigo de barras es texto aunque sea numerico ('0750...')
+    return str(item['codigo']) if item.get('codigo') else item.get('nombre')
+
+
+def _milesimas(cantidad):
+    try:
+        return round(float(cantidad or 0) * MIL)
+    except (TypeError, ValueError):
+        return 0
+
+
+def factor_costo(item):
+    """Contenido del bulto/paquete (fiscalEngine: costFactor)."""
+    unidad = str(item.get('unidadVenta') or 'unidad').lower()
+    contenido = ((item.get('jerarquia') or {}).get(unidad) or {}).get('contenido')
+    if unidad in ('bulto', 'paquete') and contenido:
+        try:
+            return float(contenido) or 1
+        except (TypeError, ValueError):
+            return 1
+    return 1
+
+
+class Catalogo:
+    """productos por id y por codigo: nombre, codigo y costo (centavos) para el join."""
+
+    def __init__(self, productos=()):
+        self.por_id, self.por_codigo = {}, {}
+        for p in productos:
+            ficha = (p.get('nombre'), p.get('codigo'), centavos(p.get('costo')) if p.get('costo') is not None else None)
+            if p.get('id') is not None:
+                self.por_id[_clave(p['id'])] = ficha
+            if p.get('codigo'):
+                self.por_codigo[str(p['codigo'])] = ficha
+
+    def __len__(self):
+        return len(self.por_id) or len(self.por_codigo)
+
+    def buscar(self, clave):
+        ficha = self.por_id.get(clave)
+        if ficha is None and clave is not None:
+            ficha = self.por_codigo.get(str(clave))
+        return ficha
+
+    @classmethod
+    def desde_respaldo(cls, ruta):
+        return cls(iterar_tabla(ruta, 'productos'))
+
+
+def linea(item, catalogo):
+    """item -> (clave, milesimas, ingreso, costo|None) en centavos x milesimas."""
+    clave = clave_item(item)
+    mil = _milesimas(item.get('cantidad'))
+    ingreso = centavos(item.get('precio') or 0) * mil
+    costo_u = item.get('costo') or item.get('costoUnitario')
+    if costo_u:
+        costo_u = centavos(costo_u)
+    else:
+        ficha = catalogo.buscar(clave)
+        costo_u = ficha[2] if ficha else None
+    if costo_u is None:
+        return clave, mil, ingreso, None
+    factor = factor_costo(item)
+    costo = costo_u * mil if factor == 1 else round(costo_u * factor * mil)
+    return clave, mil, ingreso, costo
+
+
+def a_dinero(monto):
+    return Dinero(redondear(monto, MIL))
+
+
+def clasificar_abc(valores, total, limites=LIMITES_ABC):
+    """[(clave, valor)] ordenado desc -> {clave: 'A'|'B'|'C'} por % acumulado ANTES del producto."""
+    clases, acumulado = {}, 0
+    for clave, valor in valores:
+        pct = acumulado * 100 / total if total > 0 else 100
+        clases[clave] = 'A' if pct < limites[0] else 'B' if pct < limites[1] else 'C'
+        acumulado += max(valor, 0)
+    return clases
+
+
+class RankingExacto:
+
+    def __init__(self):
+        # clave -> [milesimas, ingreso, costo (lineas con costo), ingreso de lineas con costo]
+        self.acum = {}
+        self.nombres = {}
+        self.lineas = self.lineas_sin_costo = 0
+
+    def agregar(self, item, catalogo):
+        clave, mil, ingreso, costo = linea(item, catalogo)
+        a = self.acum.get(clave)
+        if a is None:
+            a = self.acum[clave] = [0, 0, 0, 0]
+            self.nombres[clave] = item.get('nombre')
+        a[0] += mil
+        a[1] += ingreso
+        self.lineas += 1
+        if costo is None:
+            self.lineas_sin_costo += 1
+        else:
+            a[2] += costo
+            a[3] += ingreso
+
+    def valor(self, clave, medida):
+        a = self.acum[clave]
+        return a[0] if medida == 'unidades' else a[1] if medida == 'ingresos' else a[3] - a[2]
+
+    def total(self, medida):
+        return sum(self.valor(c, medida) for c in self.acum)
+
+    def orden(self, medida):
+        return sorted(((c, self.valor(c, medida)) for c in self.acum), key=lambda x: (-x[1], str(x[0])))
+
+    def top(self, medida, n=20):
+        return [{"clave": c, "valor": v, "error": 0} for c, v in self.orden(medida)[:n]]
+
+    def abc(self, medida='ingresos'):
+        orden = self.orden(medida)
+        return clasificar_abc(orden, sum(max(v, 0) for _, v in orden))
+
+
+class SpaceSaving:
+    """Heavy hitters ponderado (Metwally et al.): a lo sumo 'capacidad' contadores."""
+
+    def __init__(self, capacidad):
+        self.capacidad = capacidad
+        self.conteo, self.error = {}, {}
+        self.heap = []  # (conteo, orden, clave); entradas viejas se refrescan al salir
+        self.total = 0
+        self._orden = count()
+
+    def agregar(self, clave, peso):
+        if peso <= 0:
+            return
+        self.total += peso
+        actual = self.conteo.get(clave)
+        if actual is not None:
+            self.conteo[clave] = actual + peso
+            return
+        minimo = 0
+        if len(self.conteo) >= self.capacidad:
+            # Expulsa el contador minimo; el nuevo hereda su valor como error
+            while True:
+                minimo, _, victima = heapq.heappop(self.heap)
+                vigente = self.conteo[victima]
+                if vigente == minimo:
+                    break
+                heapq.heappush(self.heap, (vigente, next(self._orden), victima))
+            del self.conteo[victima], self.error[victima]
+        self.conteo[clave] = minimo + peso
+        self.error[clave] = minimo
+        heapq.heappush(self.heap, (minimo + peso, next(self._orden), clave))
+
+    def umbral(self):
+        """Todo elemento con peso real > umbral esta en el resumen."""
+        return self.total / self.capacidad
+
+    def orden(self):
+        return sorted(((c, v, self.error[c]) for c, v in self.conteo.items()), key=lambda x: (-x[1], str(x[0])))
+
+
+class RankingAproximado:
+
+    def __init__(self, capacidad=CAPACIDAD_DEFAULT):
+        self.resumenes = {m: SpaceSaving(capacidad) for m in MEDIDAS}
+        self.nombres = {}  # Solo claves vigentes en algun resumen (se poda al consultar)
+        self.totales = dict.fromkeys(MEDIDAS, 0)  # Exactos, con signo
+        self.lineas = self.lineas_sin_costo = 0
+
+    def agregar(self, item, catalogo):
+        clave, mil, ingreso, costo = linea(item, catalogo)
+        self.lineas += 1
+        r = self.resumenes
+        r['unidades'].agregar(clave, mil)
+        r['ingresos'].agregar(clave, ingreso)
+        self.totales['unidades'] += mil
+        self.totales['ingresos'] += ingreso
+        if costo is None:
+            self.lineas_sin_costo += 1
+        else:
+            r['margen'].agregar(clave, ingreso - costo)
+            self.totales['margen'] += ingreso - costo
+        if clave not in self.nombres and item.get('nombre'):
+            self.nombres[clave] = item['nombre']
+            if len(self.nombres) > 4 * len(MEDIDAS) * r['ingresos'].capacidad:
+                self._podar_nombres()
+
+    def _podar_nombres(self):
+        vivos = set().union(*(r.conteo for r in self.resumenes.values()))
+        self.nombres = {c: n for c, n in self.nombres.items() if c in vivos}
+
+    def total(self, medida):
+        return self.totales[medida]
+
+    def top(self, medida, n=20):
+        r = self.resumenes[medida]
+        umbral = r.umbral()
+        return [{"clave": c, "valor": v, "error": e, "garantizado": v - e > umbral}
+                for c, v, e in r.orden()[:n]]
+
+    def abc(self, medida='ingresos'):
+        """
+        Clases por estimado sobre los productos rastreados (el resto es C). Solo se
+        confia en los exactos (error 0) o garantizados (cota inferior > umbral); el
+        resto queda '?'. Muchos '?' = capacidad insuficiente para este flujo.
+        """
+        r = self.resumenes[medida]
+        orden = r.orden()
+        umbral = r.umbral()
+        clases = clasificar_abc([(c, v) for c, v, _ in orden], r.total)
+        return {c: clases[c] if e == 0 or v - e > umbral else '?' for c, v, e in orden}
+
+
+def analizar(ruta, modo='exacto', capacidad=CAPACIDAD_DEFAULT, catalogo=None):
+    catalogo = Catalogo.desde_respaldo(ruta) if catalogo is None else catalogo
+    ranking = RankingExacto() if modo == 'exacto' else RankingAproximado(capacidad)
+    ventas = 0
+    for v in iterar_tabla(ruta, 'ventas'):
+        if not es_venta_valida(v):
+            continue
+        items = v.get('items')
+        if not isinstance(items, list):
+            continue
+        ventas += 1
+        for item in items:
+            if isinstance(item, dict):
+                ranking.agregar(item, catalogo)
+    return ranking, catalogo, ventas
+
+
+def reporte(ranking, catalogo, n=20, medida_abc='ingresos'):
+    def ficha(fila, medida):
+        clave = fila["clave"]
+        prod = catalogo.buscar(clave)
+        nombre = (prod and prod[0]) or ranking.nombres.get(clave) or str(clave)
+        valor = fila["valor"] / MIL if medida == 'unidades' else float(a_dinero(fila["valor"]))
+        salida = {"clave": clave, "codigo": prod[1] if prod else None, "nombre": nombre, "valor": valor}
+        if fila["error"]:
+            salida["error"] = fila["error"] / MIL if medida == 'unidades' else float(a_dinero(fila["error"]))
+            salida["garantizado"] = fila["garantizado"]
+        return salida
+
+    rep = {"lineas": ranking.lineas, "lineas_sin_costo": ranking.lineas_sin_costo, "top": {}}
+    for medida in MEDIDAS:
+        rep["top"][medida] = [ficha(f, medida) for f in ranking.top(medida, n)]
+    clases = ranking.abc(medida_abc)
+    conteo = {c: 0 for c in 'ABC?'}
+    for clase in clases.values():
+        conteo[clase] += 1
+    rep["abc"] = {"medida": medida_abc, "productos": conteo, "limites_pct": list(LIMITES_ABC)}
+    return rep, clases
+
+
+def imprimir(rep, modo):
+    print(f"Lineas: {rep['lineas']:,} | sin costo: {rep['lineas_sin_costo']:,} | modo: {modo}")
+    for medida, filas in rep["top"].items():
+        print(f"Top {len(filas)} por {medida}:")
+        for i, f in enumerate(filas, 1):
+            error = f" (+-{f['error']:,.2f}{'' if f['garantizado'] else ' ?'})" if 'error' in f else ''
+            print(f"  {i:>3}. {str(f['codigo'] or f['clave'])[:14]:<14} {str(f['nombre'])[:32]:<32} "
+                  f"{f['valor']:>16,.2f}{error}")
+    abc = rep["abc"]
+    print(f"ABC por {abc['medida']} (A<{abc['limites_pct'][0]}%, B<{abc['limites_pct'][1]}%): "
+          + ", ".join(f"{k}={v:,}" for k, v in abc["productos"].items() if k != '?' or v))
+    dudosos = sum(1 for f in rep["top"][abc["medida"]] if not f.get("garantizado", True))
+    if dudosos:
+        print(f"[ALERTA] {dudosos} del Top por {abc['medida']} sin garantia: subir --capacidad "
+              "(el flujo no tiene productos dominantes para este tamano de resumen)")
+
+
+def run_tests():
+    catalogo = Catalogo([
+        {"id": 1, "codigo": "750001", "nombre": "HARINA PAN", "costo": 0.8},
+        {"id": 2, "codigo": "750002", "nombre": "ARROZ", "costo": 1},
+        {"id": 3, "codigo": "750003", "nombre": "QUESO (KG)", "costo": 4},
+    ])
+    ventas = [
+        {"status": "COMPLETADA", "items": [
+            {"id": 1, "nombre": "HARINA PAN", "cantidad": 10, "precio": 1.2, "costo": 0.8},
+            # Sin costo en el item: se toma del catalogo por codigo
+            {"codigo": "750002", "nombre": "ARROZ", "cantidad": 2, "precio": 1.5},
+            # Venta por peso
+            {"id": "3", "nombre": "QUESO (KG)", "cantidad": 0.25, "precio": 6},
+        ]},
+        # Bulto de 20 harinas: el costo unitario se multiplica por el contenido
+        {"status": "COMPLETADA", "items": [
+            {"id": 1, "nombre": "HARINA PAN", "cantidad": 1, "precio": 22, "costo": 0.8,
+             "unidadVenta": "bulto", "jerarquia": {"bulto": {"contenido": 20}}},
+            {"nombre": "BOLSA", "cantidad": 1, "precio": 0.1},  # Sin id ni catalogo: sin costo
+        ]},
+        {"status": "ANULADA", "items": [{"id": 2, "cantidad": 100, "precio": 1.5}]},
+        {"status": "COMPLETADA", "tipo": "COBRO_DEUDA", "items": [{"id": 2, "cantidad": 100, "precio": 1.5}]},
+    ]
+    exacto = RankingExacto()
+    for v in ventas:
+        if es_venta_valida(v):
+            for item in v["items"]:
+                exacto.agregar(item, catalogo)
+    assert exacto.valor(1, 'unidades') == 11 * MIL and a_dinero(exacto.valor(1, 'ingresos')) == 34
+    assert a_dinero(exacto.valor(1, 'margen')) == Dinero.de('10.00')  # 12-8 + 22-16
+    assert a_dinero(exacto.valor('750002', 'margen')) == 1 and exacto.valor(3, 'unidades') == 250
+    assert a_dinero(exacto.valor(3, 'ingresos')) == Dinero.de('1.50') and a_dinero(exacto.valor(3, 'margen')) == Dinero.de('0.50')
+    assert exacto.lineas == 5 and exacto.lineas_sin_costo == 1
+    assert [f["clave"] for f in exacto.top('ingresos', 2)] == [1, '750002']
+    rep, clases = reporte(exacto, catalogo, 3)
+    assert rep["top"]["ingresos"][1]["nombre"] == 'ARROZ' and rep["top"]["ingresos"][1]["codigo"] == '750002'
+    # 34 de 38.6 -> HARINA es A; ARROZ arranca en 88% -> B; el resto -> C
+    assert clases == {1: 'A', '750002': 'B', 3: 'C', 'BOLSA': 'C'}, clases
+
+    # Space-Saving: cotas de error y garantia sobre un flujo sesgado (Zipf)
+    rnd = random.Random(7)
+    pesos = [1 / (i + 1) ** 1.1 for i in range(5000)]
+    flujo = rnd.choices(range(5000), weights=pesos, k=60_000)
+    real = {}
+    ss = SpaceSaving(200)
+    for k in flujo:
+        w = 1 + k % 3
+        real[k] = real.get(k, 0) + w
+        ss.agregar(k, w)
+    assert len(ss.conteo) == 200 and len(ss.heap) == 200 and ss.total == sum(real.values())
+    for k, v, e in ss.orden():
+        assert real[k] <= v <= real[k] + e, (k, real[k], v, e)
+    assert all(k in ss.conteo for k, v in real.items() if v > ss.umbral())
+    top_real = sorted(real, key=lambda k: -real[k])[:10]
+    assert [c for c, _, _ in ss.orden()[:10]] == top_real
+
+    # Modo aproximado con capacidad de sobra == exacto
+    aprox = RankingAproximado(capacidad=10)
+    for v in ventas:
+        if es_venta_valida(v):
+            for item in v["items"]:
+                aprox.agregar(item, catalogo)
+    for medida in MEDIDAS:
+        assert [(f["clave"], f["valor"]) for f in aprox.top(medida, 3)] == \
+            [(f["clave"], f["valor"]) for f in exacto.top(medida, 3)], medida
+    assert aprox.abc() == clases and aprox.total('margen') == exacto.total('margen')
+
+    # Respaldo en disco: analizar() hace el join con 'productos'
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, 'respaldo.json')
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump({"dexie": {"ventas": ventas, "productos": [
+                {"id": 1, "codigo": "750001", "nombre": "HARINA PAN", "costo": 0.8}]}}, f)
+        ranking, cat, n = analizar(ruta)
+        assert n == 2 and len(cat) == 1 and reporte(ranking, cat, 1)[0]["top"]["ingresos"][0]["codigo"] == '750001'
+    print("[OK] PRUEBAS EXITOSAS")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        run_tests()
+        exit(0)
+    parser = argparse.ArgumentParser(description="Top-N y ABC de productos sobre venta.items")
+    parser.add_argument('respaldo', help="Capsula de Tiempo (.json o .lcap)")
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--aproximado', action='store_true', help="Space-Saving con memoria fija")
+    parser.add_argument('--capacidad', type=int, default=CAPACIDAD_DEFAULT, help="Contadores por medida")
+    parser.add_argument('--abc', choices=MEDIDAS, default='ingresos')
+    parser.add_argument('--salida', help="JSON con el reporte y la clase ABC de cada producto")
+    args = parser.parse_args()
+
+    modo = 'aproximado' if args.aproximado else 'exacto'
+    t0 = time.perf_counter()
+    ranking, catalogo, ventas = analizar(args.respaldo, modo, args.capacidad)
+    rep, clases = reporte(ranking, catalogo, args.top, args.abc)
+    print(f"{ventas:,} ventas validas, {len(catalogo):,} productos en catalogo, "
+          f"{time.perf_counter() - t0:.1f}s")
+    imprimir(rep, modo)
+    if args.salida:
+        rep["clases"] = {str(k): v for k, v in clases.items()}
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(rep, f, indent=2, ensure_ascii=False)
+        print(f"Reporte: {args.salida}")
@@ -0,0 +1,469 @@
+# scripts/rollups_ventas.py
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from audit_closing_scenarios import TreasuryEngine, conciliar_cortes
+from audit_dashboard_logic import DashboardEngine
+from dinero import Dinero
+from indice_tasas import a_timestamp
+from lector_capsula import iterar_tablas
+
+# DIRECTIVA: Rollups diarios (Reportes y Total Diario / Corte Z)
+# Los reportes (07-reportes-estadisticas, 12-total-diario-corte-z) recalculan
+# sobre las ventas crudas. Aqui se materializan una sola vez por (dia, corteId):
+#   - rollup_dia:    conteos + brutas/recaudado (TreasuryEngine) + KPIs del
+#                    Dashboard (total, credito, abonos), en centavos enteros.
+#   - rollup_metodo: Pie Chart por metodo (unidades finas de dinero.py, se cierra
+#                    a 2 decimales al consultar) y breakdown de Tesoreria.
+# Todo es aditivo: un rango (YTD, mes a mes, un Corte Z) es un SUM sobre filas
+# pequenas y da EXACTAMENTE lo mismo que correr los motores sobre las ventas.
+#
+# Incremental (marca de agua ++id, como auditar_incremental):
+#   - capa 0 (sellada): ventas con corteId y ++id <= marca. No se vuelven a leer.
+#   - capa 1 (volatil): desde la primera venta del turno abierto en adelante.
+#     Se borra y recalcula en cada corrida: el Corte Z les asignara corteId.
+# Una venta anulada DESPUES de su Corte Z no se re-resta: usar --reconstruir.
+
+DESTINO_DEFAULT = os.path.join('.tmp', 'rollups.sqlite')
+SIN_FECHA = '0000-00-00'
+TAM_LOTE = 10_000
+
+SELLADA, VOLATIL = 0, 1
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS rollup_dia (
+    capa INTEGER NOT NULL,
+    dia TEXT NOT NULL,
+    corte TEXT NOT NULL,
+    transacciones INTEGER NOT NULL DEFAULT 0,
+    anuladas INTEGER NOT NULL DEFAULT 0,
+    brutas INTEGER NOT NULL DEFAULT 0,
+    recaudado INTEGER NOT NULL DEFAULT 0,
+    total_ventas INTEGER NOT NULL DEFAULT 0,
+    credito INTEGER NOT NULL DEFAULT 0,
+    abonos INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (capa, dia, corte)
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_dia_dia ON rollup_dia(dia);
+CREATE INDEX IF NOT EXISTS idx_rollup_dia_corte ON rollup_dia(corte);
+CREATE TABLE IF NOT EXISTS rollup_metodo (
+    capa INTEGER NOT NULL,
+    dia TEXT NOT NULL,
+    corte TEXT NOT NULL,
+    fuente TEXT NOT NULL,
+    metodo TEXT NOT NULL,
+    monto INTEGER NOT NULL,
+    PRIMARY KEY (capa, dia, corte, fuente, metodo)
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_metodo_dia ON rollup_metodo(dia);
+CREATE TABLE IF NOT EXISTS cortes (id TEXT PRIMARY KEY, datos TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT);
+"""
+
+MEDIDAS = ('transacciones', 'anuladas', 'brutas', 'recaudado', 'total_ventas', 'credito', 'abonos')
+
+SQL_DIA = (f"INSERT INTO rollup_dia (capa, dia, corte, {', '.join(MEDIDAS)}) "
+           f"VALUES ({', '.join('?' * (len(MEDIDAS) + 3))}) "
+           f"ON CONFLICT (capa, dia, corte) DO UPDATE SET "
+           + ', '.join(f"{m} = {m} + excluded.{m}" for m in MEDIDAS))
+SQL_METODO = ("INSERT INTO rollup_metodo (capa, dia, corte, fuente, metodo, monto) VALUES (?, ?, ?, ?, ?, ?) "
+              "ON CONFLICT (capa, dia, corte, fuente, metodo) DO UPDATE SET monto = monto + excluded.monto")
+
+
+def dia_de(fecha, desfase_min=0):
+    """Fecha de la venta -> 'YYYY-MM-DD' en la zona de la caja (desfase en minutos vs UTC)."""
+    if not desfase_min and isinstance(fecha, str) and fecha.endswith('Z') and len(fecha) >= 10:
+        return fecha[:10]  # Camino rapido: timeProvider.toISOString() ya es UTC
+    ts = a_timestamp(fecha)
+    if ts is None:
+        return SIN_FECHA
+    return datetime.fromtimestamp(ts / 1000 + desfase_min * 60, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+class _Grupo:
+    """Motores de un (dia, corteId): los mismos de las auditorias, sin logica duplicada."""
+    __slots__ = ('tesoreria', 'dashboard', 'anuladas')
+
+    def __init__(self, corte):
+        self.tesoreria = TreasuryEngine(corte_id=corte)
+        self.dashboard = DashboardEngine()
+        self.anuladas = 0
+
+    def procesar(self, venta):
+        if venta.get('status') == 'ANULADA':
+            self.anuladas += 1
+        self.tesoreria.procesar_transaccion(venta)
+        self.dashboard.procesar_venta(venta)
+
+    def filas(self, capa, dia, corte):
+        t, d = self.tesoreria, self.dashboard
+        fila = (capa, dia, corte, d.transacciones, self.anuladas, t._brutas, t._recaudado,
+                d._total, d._credito, d._abonos)
+        metodos = [(capa, dia, corte, 'pie', k, v) for k, v in d._metodos.items()]
+        metodos += [(capa, dia, corte, 'tesoreria', k, v) for k, v in t._breakdown.items()]
+        return fila, metodos
+
+
+class RollupsVentas:
+
+    def __init__(self, destino=DESTINO_DEFAULT):
+        if destino != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(destino)), exist_ok=True)
+        self.db = sqlite3.connect(destino)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(ESQUEMA)
+
+    def close(self):
+        self.db.close()
+
+    # --- Meta ---
+
+    def _meta(self, k, defecto=None):
+        fila = self.db.execute("SELECT valor FROM meta WHERE clave = ?", (k,)).fetchone()
+        return json.loads(fila[0]) if fila else defecto
+
+    def _set_meta(self, k, v):
+        self.db.execute("INSERT OR REPLACE INTO meta (clave, valor) VALUES (?, ?)", (k, json.dumps(v)))
+
+    @property
+    def marca(self):
+        return self._meta('ultimo_id', 0)
+
+    def _vaciar(self):
+        for tabla in ('rollup_dia', 'rollup_metodo', 'cortes', 'meta'):
+            self.db.execute(f"DELETE FROM {tabla}")
+
+    # --- Carga incremental ---
+
+    def actualizar(self, registros, desfase_min=0, reconstruir=False):
+        """
+        Consume (tabla, registro) de iterar_tablas(ruta, ('ventas', 'cortes')) en orden ++id.
+        Devuelve {'nuevas', 'volatiles', 'marca', 'reconstruido'}.
+        """
+        with self.db:
+            if reconstruir or self._meta('desfase_min', desfase_min) != desfase_min:
+                self._vaciar()
+                reconstruir = True
+            self.db.execute("DELETE FROM rollup_dia WHERE capa = ?", (VOLATIL,))
+            self.db.execute("DELETE FROM rollup_metodo WHERE capa = ?", (VOLATIL,))
+
+            marca = self.marca
+            origen = self._meta('origen')
+            grupos = {}
+            turno_abierto = False
+            nuevas = volatiles = 0
+            max_id = None
+            for tabla, registro in registros:
+                if tabla == 'cortes':
+                    self.db.execute("INSERT OR REPLACE INTO cortes (id, datos) VALUES (?, ?)",
+                                    (str(registro.get('corteRef') or registro.get('id')),
+                                     json.dumps(registro, separators=(',', ':'), ensure_ascii=False)))
+                    continue
+                vid = registro.get('id')
+                es_int = isinstance(vid, int) and not isinstance(vid, bool)
+                if es_int:
+                    if origen is None:
+                        # Primera venta del respaldo: identifica el dispositivo/base
+                        origen = [vid, registro.get('fecha')]
+                        self._set_meta('origen', origen)
+                    elif max_id is None and origen != [vid, registro.get('fecha')]:
+                        raise _OtroRespaldo()
+                    max_id = vid if max_id is None else max(max_id, vid)
+                corte = registro.get('corteId') or None
+                # Desde la primera venta del turno abierto, todo es volatil (orden ++id).
+                # cerrarCaja solo sella las COMPLETADA: una ANULADA sin corteId ya es definitiva.
+                sin_corte = corte is None and registro.get('status') != 'ANULADA'
+                turno_abierto = turno_abierto or sin_corte or not es_int
+                if not turno_abierto and vid <= marca:
+                    continue
+                capa = VOLATIL if turno_abierto else SELLADA
+                if capa == SELLADA:
+                    marca = vid
+                    nuevas += 1
+                else:
+                    volatiles += 1
+                clave = (capa, dia_de(registro.get('fecha'), desfase_min), corte or '')
+                grupo = grupos.get(clave)
+                if grupo is None:
+                    grupo = grupos[clave] = _Grupo(corte)
+                grupo.procesar(registro)
+                if len(grupos) >= TAM_LOTE:
+                    self._volcar(grupos)
+
+            if max_id is not None and max_id < self.marca:
+                # Respaldo mas viejo que lo materializado (restauracion): no se puede restar
+                raise _OtroRespaldo()
+            self._volcar(grupos)
+            self._set_meta('ultimo_id', marca)
+            self._set_meta('desfase_min', desfase_min)
+            self._set_meta('actualizado', time.strftime('%Y-%m-%dT%H:%M:%S'))
+        return {'nuevas': nuevas, 'volatiles': volatiles, 'marca': marca, 'reconstruido': reconstruir}
+
+    def _volcar(self, grupos):
+        filas, metodos = [], []
+        for (capa, dia, corte), grupo in grupos.items():
+            f, m = grupo.filas(capa, dia, corte)
+            filas.append(f)
+            metodos.extend(m)
+        self.db.executemany(SQL_DIA, filas)
+        self.db.executemany(SQL_METODO, metodos)
+        grupos.clear()
+
+    def actualizar_respaldo(self, ruta, desfase_min=0, reconstruir=False):
+        try:
+            return self.actualizar(iterar_tablas(ruta, ('ventas', 'cortes')), desfase_min, reconstruir)
+        except _OtroRespaldo:
+            # La transaccion ya se revirtio: se rehace desde cero con este respaldo
+            return self.actualizar(iterar_tablas(ruta, ('ventas', 'cortes')), desfase_min, True)
+
+    # --- Consultas (milisegundos: solo filas de rollup) ---
+
+    @staticmethod
+    def _filtro(desde=None, hasta=None, corte=None):
+        """Rango de dias [desde, hasta] inclusivo ('YYYY-MM-DD' o prefijo 'YYYY-MM')."""
+        sql, params = [], []
+        if desde:
+            sql.append("dia >= ?")
+            params.append(desde)
+        if hasta:
+            # '2026-03' incluye todo marzo: se compara solo el prefijo
+            sql.append("substr(dia, 1, ?) <= ?")
+            params += [len(hasta), hasta]
+        if corte is not None:
+            sql.append("corte = ?")
+            params.append(corte or '')
+        return (" WHERE " + " AND ".join(sql)) if sql else "", params
+
+    def resumen(self, desde=None, hasta=None, corte=None):
+        where, params = self._filtro(desde, hasta, corte)
+        fila = self.db.execute(
+            f"SELECT {', '.join(f'COALESCE(SUM({m}), 0)' for m in MEDIDAS)} FROM rollup_dia{where}", params).fetchone()
+        rep = dict(zip(MEDIDAS, fila))
+        metodos = {'pie': {}, 'tesoreria': {}}
+        for fuente, metodo, monto in self.db.execute(
+                f"SELECT fuente, metodo, SUM(monto) FROM rollup_metodo{where} GROUP BY fuente, metodo", params):
+            metodos[fuente][metodo] = Dinero.desde_fino(monto) if fuente == 'pie' else Dinero(monto)
+        return {
+            "transacciones": rep['transacciones'],
+            "anuladas": rep['anuladas'],
+            "ventas_brutas": Dinero(rep['brutas']),
+            "recaudado": Dinero(rep['recaudado']),
+            "total_ventas": Dinero(rep['total_ventas']),
+            "ventas_credito": Dinero(rep['credito']),
+            "abonos": Dinero(rep['abonos']),
+            "pie": metodos['pie'],
+            "breakdown": metodos['tesoreria'],
+        }
+
+    def por_periodo(self, largo=7, desde=None, hasta=None):
+        """largo=7 -> mes ('YYYY-MM'), 4 -> anio, 10 -> dia. Con variacion vs el periodo anterior."""
+        where, params = self._filtro(desde, hasta)
+        filas = self.db.execute(
+            f"SELECT substr(dia, 1, {int(largo)}) AS p, SUM(transacciones), SUM(brutas), SUM(recaudado) "
+            f"FROM rollup_dia{where} GROUP BY p ORDER BY p", params).fetchall()
+        salida, previo = [], None
+        for periodo, n, brutas, recaudado in filas:
+            if periodo.startswith(SIN_FECHA[:largo]):
+                continue
+            var = None if not previo else round((brutas - previo) * 100 / previo, 1)
+            salida.append({"periodo": periodo, "transacciones": n, "ventas_brutas": Dinero(brutas),
+                           "recaudado": Dinero(recaudado), "variacion_pct": var})
+            previo = brutas
+        return salida
+
+    def acumulado_anual(self, anio, hasta=None):
+        """YTD: 1 de enero -> 'hasta' (por defecto, el ultimo dia con ventas)."""
+        return self.resumen(f"{anio}-01-01", hasta or f"{anio}-12-31")
+
+    def corte_z(self, corte_id):
+        """Reconstruye el TreasuryEngine de un Corte Z sin tocar las ventas."""
+        engine = TreasuryEngine(corte_id=corte_id)
+        where, params = self._filtro(corte=corte_id)
+        engine._brutas, engine._recaudado = self.db.execute(
+            f"SELECT COALESCE(SUM(brutas), 0), COALESCE(SUM(recaudado), 0) FROM rollup_dia{where}", params).fetchone()
+        engine._breakdown = dict(self.db.execute(
+            f"SELECT metodo, SUM(monto) FROM rollup_metodo{where} AND fuente = 'tesoreria' GROUP BY metodo", params))
+        return engine
+
+    def cortes(self):
+        return [r[0] for r in self.db.execute(
+            "SELECT DISTINCT corte FROM rollup_dia WHERE corte != '' ORDER BY corte")]
+
+    def conciliar(self):
+        """conciliar_cortes (audit_closing_scenarios) sobre los rollups + tabla 'cortes'."""
+        motores = {c: self.corte_z(c) for c in self.cortes()}
+        registros = [json.loads(r[0]) for r in self.db.execute("SELECT datos FROM cortes")]
+        return conciliar_cortes(motores, registros)
+
+
+class _OtroRespaldo(Exception):
+    pass
+
+
+def imprimir(rollups, anio=None):
+    periodos = rollups.por_periodo()
+    if not periodos:
+        print("Sin ventas materializadas.")
+        return
+    anio = anio or periodos[-1]["periodo"][:4]
+    print(f"{'Mes':<8} {'Trans.':>9} {'Brutas':>16} {'Recaudado':>16} {'Var %':>7}")
+    for p in periodos:
+        var = '' if p["variacion_pct"] is None else f"{p['variacion_pct']:+.1f}"
+        print(f"{p['periodo']:<8} {p['transacciones']:>9,} {p['ventas_brutas']:>16,.2f} "
+              f"{p['recaudado']:>16,.2f} {var:>7}")
+    ytd = rollups.acumulado_anual(anio)
+    print(f"YTD {anio}: brutas {ytd['ventas_brutas']:,.2f} | recaudado {ytd['recaudado']:,.2f} | "
+          f"credito {ytd['ventas_credito']:,.2f} | abonos {ytd['abonos']:,.2f}")
+    for metodo, valor in sorted(ytd["pie"].items()):
+        print(f"  - {metodo}: {valor:,.2f}")
+
+
+def run_tests():
+    ventas = [
+        {"id": 1, "fecha": "2026-01-30T10:00:00.000Z", "corteId": "Z-1", "status": "COMPLETADA", "tasa": 40,
+         "total": 10, "pagos": [{"metodo": "Pago Móvil", "monto": 400, "tipo": "BS"}]},
+        {"id": 2, "fecha": "2026-01-30T23:30:00.000Z", "corteId": "Z-1", "status": "COMPLETADA", "tasa": 3,
+         "total": 33.33, "pagos": [{"metodo": "Punto de Venta", "monto": 100, "tipo": "BS"}]},
+        {"id": 3, "fecha": "2026-01-31T09:00:00.000Z", "corteId": "Z-1", "status": "ANULADA", "total": 99},
+        {"id": 4, "fecha": "2026-01-31T09:05:00.000Z", "corteId": "Z-1", "status": "COMPLETADA", "tasa": 40,
+         "total": 20, "esCredito": True, "deudaPendiente": 15,
+         "pagos": [{"metodo": "Efectivo Divisa", "monto": 5, "tipo": "DIVISA"}], "clienteId": 7},
+        {"id": 5, "fecha": "2026-02-01T12:00:00.000Z", "corteId": "Z-2", "status": "COMPLETADA", "tasa": 3,
+         "total": 33.33, "pagos": [{"metodo": "Punto de Venta", "monto": 100, "tipo": "BS"}]},
+        {"id": 6, "fecha": "2026-02-02T12:00:00.000Z", "corteId": "Z-2", "tipo": "COBRO_DEUDA",
+         "status": "COMPLETADA", "tasa": 40, "total": 15, "clienteId": 7,
+         "pagos": [{"metodo": "Zelle", "monto": 15, "tipo": "DIVISA"}]},
+    ]
+    abiertas = [
+        {"id": 7, "fecha": "2026-03-01T12:00:00.000Z", "status": "COMPLETADA", "tasa": 41, "total": 8,
+         "pagos": [{"metodo": "Efectivo Divisa", "monto": 10, "tipo": "DIVISA"}], "cambio": 2},
+        {"id": 8, "fecha": "2026-03-01T13:00:00.000Z", "status": "COMPLETADA", "tasa": 41, "total": 4,
+         "pagos": [{"metodo": "Zelle", "monto": 4, "tipo": "DIVISA"}]},
+    ]
+    cortes = [{"id": "Z-100", "corteRef": "Z-1", "totalVentas": 63.33,
+               "metodosPago": [{"name": "Pago Móvil", "value": 10}, {"name": "Punto de Venta", "value": 33.33},
+                               {"name": "Efectivo (Implícito)", "value": 5},
+                               {"name": "Crédito", "value": 15}]},
+              {"id": "Z-200", "corteRef": "Z-2", "totalVentas": 33.33,
+               "metodosPago": [{"name": "Punto de Venta", "value": 40}]}]
+
+    def registros(lista):
+        return [('ventas', v) for v in lista] + [('cortes', c) for c in cortes]
+
+    def tesoreria(lista, corte):
+        t = TreasuryEngine(corte_id=corte)
+        for v in lista:
+            t.procesar_transaccion(v)
+        return t
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, 'rollups.sqlite')
+
+        # 1. Carga inicial (turno abierto incluido en la capa volatil)
+        r = RollupsVentas(ruta)
+        info = r.actualizar(registros(ventas + abiertas))
+        assert info == {'nuevas': 6, 'volatiles': 2, 'marca': 6, 'reconstruido': False}, info
+
+        # Rango == DashboardEngine sobre las mismas ventas (Pie cerrado una sola vez: 33.33 + 33.33)
+        todo = r.resumen()
+        dash = DashboardEngine().procesar(ventas + abiertas)
+        assert todo["pie"] == dash.map_metodos, (todo["pie"], dash.map_metodos)
+        assert todo["total_ventas"] == dash.total_ventas and todo["abonos"] == dash.abonos == 15
+        assert todo["ventas_credito"] == dash.ventas_credito and todo["anuladas"] == 1
+
+        # Corte Z reconstruido == TreasuryEngine del corte
+        for corte in ('Z-1', 'Z-2'):
+            t = tesoreria(ventas, corte)
+            z = r.corte_z(corte)
+            assert z.reporte() == t.reporte(), (corte, z.reporte(), t.reporte())
+        assert [c["estado"] for c in r.conciliar()] == ['OK', 'DESCUADRE']  # Z-2: abono no esta en metodosPago
+
+        # Mes a mes / YTD
+        meses = r.por_periodo()
+        assert [m["periodo"] for m in meses] == ['2026-01', '2026-02', '2026-03']
+        assert meses[0]["ventas_brutas"] == Dinero.de('63.33') and meses[1]["variacion_pct"] == -47.4
+        assert r.acumulado_anual(2026, '2026-01')["transacciones"] == 3
+        assert r.resumen('2026-01-31', '2026-01-31')["recaudado"] == 5
+
+        # Desfase de zona: 23:30Z es el dia 30 en UTC y el 31 en UTC+1
+        assert dia_de("2026-01-30T23:30:00.000Z") == '2026-01-30'
+        assert dia_de("2026-01-30T23:30:00.000Z", 60) == '2026-01-31' and dia_de(None) == SIN_FECHA
+        r.close()
+
+        # 2. Corte Z del turno abierto + venta nueva: solo se procesan las volatiles
+        selladas = [dict(v, corteId='Z-3') for v in abiertas]
+        nueva = {"id": 9, "fecha": "2026-03-02T08:00:00.000Z", "status": "COMPLETADA", "total": 1}
+        r = RollupsVentas(ruta)
+        info = r.actualizar(registros(ventas + selladas + [nueva]))
+        assert info == {'nuevas': 2, 'volatiles': 1, 'marca': 8, 'reconstruido': False}, info
+        completo = RollupsVentas(':memory:')
+        completo.actualizar(registros(ventas + selladas + [nueva]))
+        assert r.resumen() == completo.resumen() and r.por_periodo() == completo.por_periodo()
+        t = tesoreria(selladas, 'Z-3')
+        assert r.corte_z('Z-3').reporte() == t.reporte()
+
+        # 3. Sin cambios: nada nuevo que sellar
+        assert r.actualizar(registros(ventas + selladas + [nueva]))['nuevas'] == 0
+
+        # Anulada antes de su Corte Z: queda sin corteId pero no abre el turno
+        cerradas = [{"id": i, "fecha": "2026-04-01T10:00:00.000Z", "corteId": "Z-4", "status": "COMPLETADA",
+                     "total": 1} for i in range(1, 50)]
+        cerradas[2] = {"id": 3, "fecha": "2026-04-01T10:00:00.000Z", "status": "ANULADA", "total": 1}
+        anulada = RollupsVentas(':memory:')
+        info = anulada.actualizar([('ventas', v) for v in cerradas])
+        assert info == {'nuevas': 49, 'volatiles': 0, 'marca': 49, 'reconstruido': False}, info
+        info = anulada.actualizar([('ventas', v) for v in cerradas])
+        assert info['nuevas'] == info['volatiles'] == 0 and anulada.resumen()["anuladas"] == 1, info
+        assert r.resumen() == completo.resumen()
+
+        # 4. Otro respaldo (otra base / restauracion) -> se reconstruye solo
+        otro = [dict(v, id=v['id'] + 1000) for v in ventas]
+        try:
+            r.actualizar(registros(otro))
+            raise AssertionError("Debio detectar otro respaldo")
+        except _OtroRespaldo:
+            pass
+        assert r.resumen() == completo.resumen()  # La transaccion se revirtio
+        assert r.actualizar(registros(otro), reconstruir=True)['nuevas'] == 6
+        assert r.resumen()["ventas_brutas"] == Dinero.de('96.66')
+        r.close()
+        completo.close()
+    print("[OK] PRUEBAS EXITOSAS")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        run_tests()
+        exit(0)
+    parser = argparse.ArgumentParser(description="Rollups diarios de ventas (Reportes / Corte Z)")
+    parser.add_argument('respaldo', help="Capsula de Tiempo (.json o .lcap)")
+    parser.add_argument('--destino', default=DESTINO_DEFAULT)
+    parser.add_argument('--desfase', type=int, default=0, help="Minutos vs UTC del dia de la caja (ej. -240)")
+    parser.add_argument('--reconstruir', action='store_true', help="Descarta lo materializado y recalcula")
+    parser.add_argument('--anio', help="Anio del acumulado (por defecto, el ultimo con ventas)")
+    parser.add_argument('--cortes', action='store_true', help="Concilia cada Corte Z desde los rollups")
+    args = parser.parse_args()
+
+    rollups = RollupsVentas(args.destino)
+    t0 = time.perf_counter()
+    info = rollups.actualizar_respaldo(args.respaldo, args.desfase, args.reconstruir)
+    print(f"Rollups {'reconstruidos' if info['reconstruido'] else 'actualizados'} en "
+          f"{time.perf_counter() - t0:.1f}s -> {args.destino} | selladas nuevas: {info['nuevas']:,} | "
+          f"turno abierto: {info['volatiles']:,} | marca ++id: {info['marca']}")
+
+    t0 = time.perf_counter()
+    imprimir(rollups, args.anio)
+    if args.cortes:
+        filas = rollups.conciliar()
+        malos = [f for f in filas if f["estado"] != "OK"]
+        print(f"Cortes Z: {len(filas) - len(malos)} OK, {len(malos)} con diferencias")
+        for f in malos[:20]:
+            print(f"  [ALERTA] {f['corteId']}: {f['estado']} {f['diferencias']}")
+    print(f"Consultas en {(time.perf_counter() - t0) * 1000:.1f} ms")
+    rollups.close()
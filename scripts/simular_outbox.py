@@ -0,0 +1,299 @@
+# scripts/simular_outbox.py
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+
+from lan_load_test import ConexionHTTP
+from lan_mock_server import leer_cabeceras
+from lector_capsula import iterar_tabla
+
+# DIRECTIVA: Cola de Sincronizacion (outbox -> nube)
+# Reproduce una cola 'outbox' (Dexie: ++id, collection, status, timestamp)
+# contra un endpoint local que imita la latencia de la nube y mide cuanto
+# tarda en vaciarse con cada estrategia:
+#   - app: useSyncEngine.procesarCola -> 5 pendientes cada 10 s, uno a uno
+#     (se modela con la latencia medida; esperar el ciclo real tomaria horas)
+#   - secuencial: un addDoc tras otro, sin temporizador
+#   - lotes: commits de hasta 500 escrituras (limite de un batch de Firestore)
+#   - concurrente: N peticiones en vuelo (asyncio)
+# Cada estrategia se corre tambien con coalescencia: varias filas del mismo
+# documento (collection + data.id) se reducen a la ultima.
+# Las escrituras concurrentes al mismo documento pueden llegar desordenadas:
+# el endpoint las cuenta ('fuera_de_orden').
+
+TICK_APP_S = 10
+LOTE_APP = 5
+MAX_LOTE = 500
+
+
+class EndpointNube:
+    """Mock HTTP: POST /docs/<coleccion> (una escritura) y POST /commit {writes: [...]}."""
+
+    def __init__(self, latencia_ms=40, costo_escritura_ms=0.05):
+        self.latencia = latencia_ms / 1000
+        self.costo = costo_escritura_ms / 1000
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.peticiones = self.escrituras = self.fuera_de_orden = 0
+        self.docs = {}  # (coleccion, id) -> (orden_local, data)
+
+    def _aplicar(self, coleccion, fila):
+        self.escrituras += 1
+        data = fila.get('data') or {}
+        if data.get('id') is None:
+            return
+        clave, orden = (coleccion, data['id']), fila.get('orden', 0)
+        previo = self.docs.get(clave)
+        if previo is not None and previo[0] > orden:
+            self.fuera_de_orden += 1  # Una version vieja pisa a una nueva
+        self.docs[clave] = (orden, data)
+
+    async def atender(self, reader, writer):
+        try:
+            while True:
+                linea, cab = await leer_cabeceras(reader)
+                if linea is None:
+                    return
+                _, ruta, _ = linea.split(' ', 2)
+                cuerpo = json.loads(await reader.readexactly(int(cab.get('content-length') or 0)) or b'null')
+                self.peticiones += 1
+                if ruta == '/commit':
+                    escrituras = cuerpo.get('writes') or []
+                    if len(escrituras) > MAX_LOTE:
+                        estado, resp = 400, {"error": f"max {MAX_LOTE} escrituras por commit"}
+                    else:
+                        await asyncio.sleep(self.latencia + self.costo * len(escrituras))
+                        for w in escrituras:
+                            self._aplicar(w['collection'], w)
+                        estado, resp = 200, {"ok": len(escrituras)}
+                elif ruta.startswith('/docs/'):
+                    await asyncio.sleep(self.latencia + self.costo)
+                    self._aplicar(ruta[len('/docs/'):], cuerpo)
+                    estado, resp = 200, {"ok": 1}
+                else:
+                    estado, resp = 404, {"error": "ruta"}
+                datos = json.dumps(resp).encode()
+                writer.write(f"HTTP/1.1 {estado} OK\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(datos)}\r\n\r\n".encode() + datos)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def iniciar(self, host='127.0.0.1', puerto=0):
+        return await asyncio.start_server(self.atender, host, puerto)
+
+
+# --- Cola ---
+
+def outbox_sintetico(n, docs=2000, semilla=42, proporcion_ventas=0.4):
+    """Cola tras un corte de red: ventas nuevas + actualizaciones repetidas de productos/clientes."""
+    rnd = random.Random(semilla)
+    ts = 1_767_600_000_000
+    filas = []
+    for i in range(1, n + 1):
+        ts += rnd.randint(200, 4000)
+        if rnd.random() < proporcion_ventas:
+            col, data = 'ventas', {"id": ts, "total": rnd.randint(100, 20000) / 100}
+        elif rnd.random() < 0.7:
+            # Pocos productos concentran la mayoria de los cambios de stock
+            pid = min(int(rnd.paretovariate(1.2)), docs)
+            col, data = 'productos', {"id": pid, "stock": rnd.randint(0, 200)}
+        else:
+            col, data = 'clientes', {"id": rnd.randint(1, max(1, docs // 4)), "deuda": rnd.randint(0, 5000) / 100}
+        filas.append({"id": i, "collection": col, "data": data, "status": 'pending', "timestamp": ts})
+    return filas
+
+
+def cargar_outbox(ruta):
+    return [f for f in iterar_tabla(ruta, 'outbox') if f.get('status', 'pending') == 'pending']
+
+
+def clave_doc(fila):
+    data = fila.get('data')
+    if isinstance(data, dict) and data.get('id') is not None:
+        return fila.get('collection'), data['id']
+    return None
+
+
+def coalescer(filas):
+    """Una fila por documento (la ultima); las filas sin id de documento se conservan. Mantiene el orden."""
+    ultima = {}
+    for i, f in enumerate(filas):
+        clave = clave_doc(f)
+        if clave is not None:
+            ultima[clave] = i
+    return [f for i, f in enumerate(filas) if (clave := clave_doc(f)) is None or ultima[clave] == i]
+
+
+def analizar(filas):
+    por_coleccion = {}
+    for f in filas:
+        c = por_coleccion.setdefault(f.get('collection'), {"filas": 0, "docs": set()})
+        c["filas"] += 1
+        if clave_doc(f) is not None:
+            c["docs"].add(clave_doc(f))
+    reducidas = len(coalescer(filas))
+    return {
+        "filas": len(filas), "tras_coalescer": reducidas, "superadas": len(filas) - reducidas,
+        "por_coleccion": {k: {"filas": v["filas"], "docs": len(v["docs"])} for k, v in
+                          sorted(por_coleccion.items(), key=lambda x: -x[1]["filas"])},
+    }
+
+
+# --- Estrategias (devuelven filas enviadas; paran al agotar el presupuesto) ---
+
+def _escritura(f):
+    return {"collection": f.get('collection'), "data": f.get('data'), "orden": f["orden"]}
+
+
+async def secuencial(host, puerto, filas, presupuesto):
+    conn, t0, enviadas = ConexionHTTP(host, puerto), time.perf_counter(), 0
+    for f in filas:
+        if time.perf_counter() - t0 > presupuesto:
+            break
+        await conn.pedir('POST', f"/docs/{f.get('collection')}", _escritura(f))
+        enviadas += 1
+    conn.cerrar()
+    return enviadas
+
+
+async def lotes(host, puerto, filas, presupuesto, tam=MAX_LOTE):
+    conn, t0, enviadas = ConexionHTTP(host, puerto), time.perf_counter(), 0
+    for i in range(0, len(filas), tam):
+        if time.perf_counter() - t0 > presupuesto:
+            break
+        lote = filas[i:i + tam]
+        estado, _, _ = await conn.pedir('POST', '/commit', {"writes": [_escritura(f) for f in lote]})
+        if estado == 200:
+            enviadas += len(lote)
+    conn.cerrar()
+    return enviadas
+
+
+async def concurrente(host, puerto, filas, presupuesto, en_vuelo=16):
+    t0, siguiente, enviadas = time.perf_counter(), 0, 0
+
+    async def trabajador():
+        nonlocal siguiente, enviadas
+        conn = ConexionHTTP(host, puerto)
+        while siguiente < len(filas) and time.perf_counter() - t0 <= presupuesto:
+            f = filas[siguiente]
+            siguiente += 1
+            await conn.pedir('POST', f"/docs/{f.get('collection')}", _escritura(f))
+            enviadas += 1
+        conn.cerrar()
+
+    await asyncio.gather(*(trabajador() for _ in range(en_vuelo)))
+    return enviadas
+
+
+def modelo_app(filas, latencia_s):
+    """procesarCola: cada 10 s toma 5 pendientes y las sube una a una."""
+    ciclos = math.ceil(filas / LOTE_APP)
+    return ciclos * max(TICK_APP_S, LOTE_APP * latencia_s)
+
+
+async def comparar(filas, latencia_ms=40, presupuesto=5.0, en_vuelo=16):
+    for i, f in enumerate(filas):
+        f["orden"] = i
+    endpoint = EndpointNube(latencia_ms)
+    servidor = await endpoint.iniciar()
+    host, puerto = servidor.sockets[0].getsockname()[:2]
+    reducidas = coalescer(filas)
+
+    resultados = []
+    estrategias = [('secuencial', secuencial, {}), ('lotes', lotes, {}),
+                   ('concurrente', concurrente, {"en_vuelo": en_vuelo})]
+    for nombre, fn, extra in estrategias:
+        for coalescida, cola in ((False, filas), (True, reducidas)):
+            endpoint.reiniciar()
+            t0 = time.perf_counter()
+            enviadas = await fn(host, puerto, cola, presupuesto, **extra)
+            seg = time.perf_counter() - t0
+            # Tasa en filas ORIGINALES de la cola: coalescer drena varias por escritura
+            factor = len(filas) / len(cola) if cola else 1
+            tasa = enviadas * factor / seg if seg else 0
+            resultados.append({
+                "estrategia": nombre + (' + coalescer' if coalescida else ''),
+                "escrituras": enviadas, "peticiones": endpoint.peticiones, "segundos": round(seg, 2),
+                "filas_por_s": round(tasa, 1),
+                "vaciado_s": round(len(filas) / tasa, 1) if tasa else None,
+                "extrapolado": enviadas < len(cola), "fuera_de_orden": endpoint.fuera_de_orden,
+            })
+    latencia_medida = resultados[0]["segundos"] / max(resultados[0]["escrituras"], 1)
+    app_s = modelo_app(len(filas), latencia_medida)
+    resultados.insert(0, {"estrategia": 'app (5 cada 10 s)', "escrituras": len(filas), "peticiones": len(filas),
+                          "segundos": None, "filas_por_s": round(len(filas) / app_s, 2),
+                          "vaciado_s": round(app_s, 1), "extrapolado": True, "fuera_de_orden": 0})
+    servidor.close()
+    await servidor.wait_closed()
+    return resultados
+
+
+def imprimir(analisis, resultados):
+    print(f"Cola: {analisis['filas']:,} filas -> {analisis['tras_coalescer']:,} tras coalescer "
+          f"({analisis['superadas']:,} superadas)")
+    for col, info in analisis["por_coleccion"].items():
+        print(f"  - {col}: {info['filas']:,} filas sobre {info['docs']:,} documentos")
+    print(f"{'estrategia':<26}{'filas/s':>10}{'vaciado':>12}{'peticiones':>12}{'desorden':>10}")
+    for r in resultados:
+        vaciado = f"{r['vaciado_s']:,.0f}s" + ('*' if r["extrapolado"] else '')
+        print(f"{r['estrategia']:<26}{r['filas_por_s']:>10,.1f}{vaciado:>12}{r['peticiones']:>12,}"
+              f"{r['fuera_de_orden']:>10,}")
+    print("* extrapolado desde lo medido dentro del presupuesto de tiempo")
+
+
+def run_tests():
+    filas = outbox_sintetico(600, docs=50, semilla=1)
+    a = analizar(filas)
+    assert a["superadas"] > 0 and a["filas"] == 600
+    reducidas = coalescer(filas)
+    # La coalescencia conserva el ultimo valor de cada documento y todas las filas sin id
+    ultimo = {clave_doc(f): f["data"] for f in filas}
+    assert {clave_doc(f): f["data"] for f in reducidas} == ultimo
+    assert len({clave_doc(f) for f in reducidas}) == len(reducidas)
+    assert modelo_app(30_000, 0.05) == 6000 * 10
+
+    res = {r["estrategia"]: r for r in asyncio.run(comparar(filas, latencia_ms=5, presupuesto=10))}
+    assert not res["lotes"]["extrapolado"] and res["lotes"]["peticiones"] == 2
+    assert res["lotes + coalescer"]["peticiones"] == 1
+    assert res["secuencial"]["fuera_de_orden"] == 0 and res["lotes"]["fuera_de_orden"] == 0
+    assert res["lotes"]["filas_por_s"] > res["secuencial"]["filas_por_s"] > res["app (5 cada 10 s)"]["filas_por_s"]
+    print("[OK] PRUEBAS EXITOSAS")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador de vaciado de la cola outbox")
+    parser.add_argument("respaldo", nargs='?', help="Capsula con dexie.outbox (si no, cola sintetica)")
+    parser.add_argument("--filas", type=int, default=30_000, help="Tamano de la cola sintetica")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--latencia", type=float, default=40, help="ms por peticion (ida y vuelta a la nube)")
+    parser.add_argument("--en-vuelo", type=int, default=16)
+    parser.add_argument("--presupuesto", type=float, default=5, help="Segundos maximos por estrategia")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    filas = cargar_outbox(args.respaldo) if args.respaldo else outbox_sintetico(args.filas, args.docs, args.semilla)
+    if not filas:
+        print("La cola outbox del respaldo esta vacia.")
+        return
+    resultados = asyncio.run(comparar(filas, args.latencia, args.presupuesto, args.en_vuelo))
+    if args.json:
+        print(json.dumps({"analisis": analizar(filas), "resultados": resultados}, indent=2, default=str))
+    else:
+        imprimir(analizar(filas), resultados)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        run_tests()
+        exit(0)
+    main()
@@ -35,6 +35,14 @@ def check_health():
     except Exception as e:
         print(f"[ERROR] Libreria Decimal: {e}")
 
+    # 5. Dinero en centavos enteros (motores de auditoria, espejo de mathCore.js)
+    try:
+        from dinero import Dinero
+        if Dinero.de(0.1) + 0.2 == Dinero.de('0.30') and str(Dinero.de(1.005)) == '1.01':
+            print("[OK] Dinero (centavos): Operando correctamente.")
+    except Exception as e:
+        print(f"[ERROR] Dinero (centavos): {e}")
+
     print("-" * 40)
     print("ESTADO: El interprete funciona correctamente para scripts de auditoria.")
     print("        Ignora los errores de 'connection got disposed' del editor.")
@@ -0,0 +1,214 @@
+# scripts/treasury_columnar.py
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+from array import array
+
+import numpy as np
+
+from audit_closing_scenarios import TreasuryEngine
+from dinero import centavos as a_centavos  # Reexportado para exportar_columnar / indice_ventas
+
+# DIRECTIVA: TEST-FIN-001
+# Modo Lote (Columnar) del TreasuryEngine.
+# Carga las ventas en arrays de centavos enteros y calcula recaudado,
+# ventas_brutas y desglose con mascaras NumPy. Resultado exacto al centavo
+# contra el camino fila a fila (procesar_transaccion).
+# Camino rapido: el export de exportar_columnar.py (se convierte UNA vez por
+# respaldo) se abre con np.memmap y ColumnasVentas sale sin recorrer filas.
+# cargar_columnas (dicts en memoria) es un bucle Python por fila: no es mas
+# rapido que el motor fila a fila; queda para pruebas y ventas ya cargadas.
+
+class Codificador:
+    """Factoriza valores categoricos (tipo, status, corteId) a codigos enteros."""
+
+    def __init__(self):
+        self.codigos = {}
+        self.valores = []
+
+    def codigo(self, valor):
+        c = self.codigos.get(valor)
+        if c is None:
+            c = self.codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+        return c
+
+
+class ColumnasVentas:
+    """Ventas en formato columnar: montos en centavos (int64) y categorias codificadas."""
+
+    def __init__(self, total, deuda, es_credito, tipo, status, corte, tipos, estados, cortes):
+        self.total = total
+        self.deuda = deuda
+        self.es_credito = es_credito
+        self.tipo = tipo
+        self.status = status
+        self.corte = corte      # -1 = sin corteId (sesion abierta)
+        self.tipos = tipos
+        self.estados = estados
+        self.cortes = cortes
+
+    def __len__(self):
+        return len(self.total)
+
+    def mascara(self, campo, valor):
+        vocab = {'tipo': self.tipos, 'status': self.estados}[campo]
+        if valor not in vocab:
+            return np.zeros(len(self), dtype=bool)
+        return getattr(self, campo) == vocab.index(valor)
+
+
+def cargar_columnas(ventas):
+    """Convierte un iterable de ventas (dicts) en ColumnasVentas en una sola pasada."""
+    total, deuda = array('q'), array('q')
+    credito, tipo, status, corte = array('b'), array('h'), array('h'), array('q')
+    tipos, estados, cortes = Codificador(), Codificador(), Codificador()
+
+    for tx in ventas:
+        total.append(a_centavos(tx.get('total', 0)))
+        deuda.append(a_centavos(tx.get('deudaPendiente', 0)))
+        credito.append(1 if tx.get('esCredito', False) else 0)
+        tipo.append(tipos.codigo(tx.get('tipo', 'VENTA')))
+        status.append(estados.codigo(tx.get('status', 'COMPLETADA')))
+        corte_id = tx.get('corteId')
+        corte.append(cortes.codigo(corte_id) if corte_id else -1)
+
+    return ColumnasVentas(
+        total=np.frombuffer(total, dtype=np.int64),
+        deuda=np.frombuffer(deuda, dtype=np.int64),
+        es_credito=np.frombuffer(credito, dtype=np.int8).astype(bool),
+        tipo=np.frombuffer(tipo, dtype=np.int16),
+        status=np.frombuffer(status, dtype=np.int16),
+        corte=np.frombuffer(corte, dtype=np.int64),
+        tipos=tipos.valores,
+        estados=estados.valores,
+        cortes=cortes.valores,
+    )
+
+
+def cierre_columnar(cols, corte_codigo=-1):
+    """
+    Espejo vectorizado de TreasuryEngine.procesar_transaccion.
+    Devuelve centavos enteros: (recaudado, ventas_brutas, desglose).
+    """
+    validas = (cols.corte == corte_codigo) & ~cols.mascara('status', 'ANULADA')
+    cobro = validas & cols.mascara('tipo', 'COBRO_DEUDA')
+    venta = validas & ~cobro
+
+    credito = venta & cols.es_credito
+    pagado = cols.total - cols.deuda
+    implicito = credito & (pagado > 1)  # pagado_implicito > 0.01
+    contado = venta & ~cols.es_credito
+
+    desglose = {}
+    # Solo aparecen las claves que el motor fila a fila habria creado
+    for clave, mascara, montos in (
+        ('Abonos (Deuda)', cobro, cols.total),
+        ('Efectivo (Implícito)', implicito, pagado),
+        ('Efectivo (Venta)', contado, cols.total),
+    ):
+        if mascara.any():
+            desglose[clave] = int(montos[mascara].sum())
+
+    ventas_brutas = int(cols.total[venta].sum())
+    return sum(desglose.values()), ventas_brutas, desglose
+
+
+def reporte_columnar(cols, corte_codigo=-1):
+    """Mismo formato que TreasuryEngine.reporte()."""
+    recaudado, brutas, desglose = cierre_columnar(cols, corte_codigo)
+    return {
+        "recaudado": recaudado / 100,
+        "ventas_brutas": brutas / 100,
+        "detalles": {k: v / 100 for k, v in desglose.items()}
+    }
+
+
+# --- BENCHMARK ---
+
+def ventas_sinteticas(n, semilla=42):
+    rnd = random.Random(semilla)
+    cortes = [None] * 6 + ['Z-100001', 'Z-100002']
+    for i in range(1, n + 1):
+        total = rnd.randint(50, 50000) / 100
+        es_credito = rnd.random() < 0.2
+        yield {
+            "id": i,
+            "tipo": 'COBRO_DEUDA' if rnd.random() < 0.1 else 'VENTA',
+            "status": 'ANULADA' if rnd.random() < 0.03 else 'COMPLETADA',
+            "total": total,
+            "esCredito": es_credito,
+            "deudaPendiente": rnd.randint(0, int(total * 100)) / 100 if es_credito else 0,
+            "corteId": rnd.choice(cortes),
+        }
+
+
+def benchmark(n=1_000_000):
+    from exportar_columnar import ExportColumnar, exportar
+
+    print(f"Generando {n:,} ventas sinteticas...")
+    ventas = list(ventas_sinteticas(n))
+
+    t0 = time.perf_counter()
+    engine = TreasuryEngine()
+    for tx in ventas:
+        engine.procesar_transaccion(tx)
+    t_filas = time.perf_counter() - t0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, 'capsula.json')
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump({"dexie": {"ventas": ventas}}, f)
+        destino = os.path.join(tmp, 'columnar')
+        t0 = time.perf_counter()
+        exportar(ruta, destino, tablas=('ventas',))
+        t_export = time.perf_counter() - t0
+
+        # Cada auditoria posterior: abrir columnas (memmap) + cierre
+        t0 = time.perf_counter()
+        cols = ExportColumnar(destino).columnas_ventas()
+        t_carga = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        recaudado, brutas, desglose = cierre_columnar(cols)
+        t_columnar = time.perf_counter() - t0
+        del cols  # Soltar los memmap antes de borrar el directorio
+
+    # Exactitud al centavo contra el camino fila a fila (y contra la carga desde dicts)
+    assert recaudado == a_centavos(engine.recaudado), "FALLO RECAUDADO"
+    assert brutas == a_centavos(engine.ventas_brutas), "FALLO BRUTO"
+    assert desglose == {k: a_centavos(v) for k, v in engine.breakdown.items()}, "FALLO DESGLOSE"
+    assert cierre_columnar(cargar_columnas(ventas)) == (recaudado, brutas, desglose), "FALLO CARGA DICTS"
+
+    print("[OK] Resultados identicos al centavo")
+    print(f"Motor (fila a fila):   {t_filas:8.3f} s")
+    print(f"Export columnar:       {t_export:8.3f} s (una vez por respaldo)")
+    print(f"Carga memmap:          {t_carga:8.3f} s")
+    print(f"Cierre NumPy:          {t_columnar:8.3f} s")
+    print(f"Aceleracion (total):   {t_filas / (t_carga + t_columnar):8.1f}x (carga memmap + cierre, por auditoria)")
+
+
+if __name__ == "__main__":
+    # Uso: python scripts/treasury_columnar.py --bench [N]
+    #      python scripts/treasury_columnar.py respaldo.json   (exporta a .tmp/columnar si hace falta)
+    #      python scripts/treasury_columnar.py .tmp/columnar   (export de exportar_columnar.py)
+    if len(sys.argv) > 1 and sys.argv[1] != '--bench':
+        from exportar_columnar import ExportColumnar, exportar
+        t0 = time.perf_counter()
+        if os.path.isdir(sys.argv[1]):
+            export = ExportColumnar(sys.argv[1])
+        else:
+            # Reutiliza el export si ya es del mismo archivo (firma: ruta, bytes, mtime)
+            export = exportar(sys.argv[1], tablas=('ventas',))
+        cols = export.columnas_ventas()
+        t_carga = time.perf_counter() - t0
+        reporte = reporte_columnar(cols)
+        t_total = time.perf_counter() - t0
+        print(json.dumps(reporte, indent=2))
+        print(f"Carga: {t_carga:.3f} s | Cierre: {t_total - t_carga:.3f} s | Total: {t_total:.3f} s",
+              file=sys.stderr)
+    else:
+        benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000)
@@ -0,0 +1,272 @@
+# scripts/verificar_capsula.py
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from audit_history_tasa import clave_cliente
+from audit_kardex_logic import clave_producto
+from lector_capsula import RespaldoInvalido, estructura, iterar_tablas
+
+# DIRECTIVA: TIME_CAPSULE_SOP
+# Verificador previo a restaurarCapsulaDeTiempo (backupUtils.js).
+# La restauracion hace clear() de TODAS las tablas y luego bulkAdd(): una clave
+# primaria repetida aborta la transaccion y la caja queda vacia. Este script
+# recorre el respaldo en streaming (tablas repartidas por tamano entre
+# procesos, una sola pasada por proceso) y responde:
+#   - FATAL: JSON corrupto, falta 'dexie'/'localStorage', PK duplicada o
+#     ausente en tablas sin '++' (cortes.id, config.key, ...).
+#   - ADVERTENCIA: referencias rotas ventas->clientes, ventas->cortes,
+#     logs->productos (un producto eliminado con PRODUCTO_ELIMINADO no cuenta).
+#   - Hash SHA-256 por tabla (JSON canonico, en el orden del archivo).
+# Uso como compuerta: python scripts/verificar_capsula.py respaldo.json && <restaurar>
+
+REPORTE_DEFAULT = os.path.join('.tmp', 'verificacion_capsula.json')
+MAX_DETALLE = 20
+
+# Clave primaria de cada tabla de src/db.js ('++' = autoincremental: puede faltar)
+CLAVES = {
+    'productos': '++id', 'ventas': '++id', 'clientes': '++id', 'config': 'key', 'logs': '++id',
+    'tickets_espera': '++id', 'outbox': '++id', 'cortes': 'id', 'caja_sesion': 'key',
+    'empleados_finanzas': 'userId', 'historial_nomina': '++id', 'nomina_ledger': '++id',
+    'periodos_nomina': '++id', 'ghost_config': 'key', 'ghost_history': '++id', 'ghost_audit_log': '++id',
+}
+
+# origen.campo -> tabla destino (normalizacion de la clave como la hace la app)
+REFERENCIAS = {
+    ('ventas', 'clienteId'): ('clientes', clave_cliente),   # parseInt(clienteId)
+    ('ventas', 'corteId'): ('cortes', str),                 # cortes.id o cortes.corteRef
+    ('logs', 'productId'): ('productos', clave_producto),   # Number(id) || id
+}
+
+
+class _EstadoTabla:
+    """Acumulado de una tabla: filas, hash, PKs repetidas/ausentes y claves para las referencias."""
+
+    def __init__(self, tabla):
+        pk = CLAVES[tabla]
+        self.tabla, self.auto, self.pk = tabla, pk.startswith('++'), pk.lstrip('+')
+        self.hash = hashlib.sha256()
+        self.filas = self.sin_clave = 0
+        self.enteros, self.otros = array('q'), Counter()
+        self.refs = {campo: Counter() for (origen, campo) in REFERENCIAS if origen == tabla}
+        self.destino = any(t == tabla for t, _ in REFERENCIAS.values())
+        self.claves, self.eliminados = set(), set()
+
+    def agregar(self, r):
+        self.filas += 1
+        self.hash.update(json.dumps(r, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode())
+        self.hash.update(b'\n')
+        k = r.get(self.pk) if isinstance(r, dict) else None
+        if k is None:
+            self.sin_clave += 1
+            return
+        # IndexedDB distingue 1 de "1": solo los enteros van al array
+        if isinstance(k, int) and not isinstance(k, bool):
+            self.enteros.append(k)
+        else:
+            self.otros[json.dumps(k) if isinstance(k, (list, dict)) else k] += 1
+        if self.destino:
+            if self.tabla == 'productos':
+                self.claves.add(clave_producto(k))
+            elif self.tabla == 'clientes':
+                self.claves.add(clave_cliente(k))
+            else:
+                self.claves.update(str(c) for c in (k, r.get('corteRef')) if c is not None)
+        for campo, conteo in self.refs.items():
+            valor = r.get(campo)
+            if valor not in (None, ''):
+                conteo[REFERENCIAS[(self.tabla, campo)][1](valor)] += 1
+        if self.tabla == 'logs' and 'ELIMINADO' in str(r.get('tipo') or '').upper():
+            self.eliminados.add(clave_producto(r.get('productId')))
+
+    def resultado(self):
+        arr = np.sort(np.frombuffer(self.enteros, dtype=np.int64))
+        dup = np.unique(arr[1:][arr[1:] == arr[:-1]]).tolist() + [k for k, n in self.otros.items() if n > 1]
+        return {
+            "tabla": self.tabla, "filas": self.filas, "sha256": self.hash.hexdigest(),
+            "duplicados": len(dup), "ejemplos_duplicados": dup[:MAX_DETALLE],
+            "sin_clave": 0 if self.auto else self.sin_clave,
+            "claves": self.claves, "referencias": self.refs, "eliminados": self.eliminados,
+        }
+
+
+def verificar_grupo(args):
+    """Trabajador: una pasada de streaming sobre su grupo de tablas."""
+    ruta, tablas = args
+    estados = {t: _EstadoTabla(t) for t in tablas}
+    try:
+        for tabla, r in iterar_tablas(ruta, tablas):
+            estados[tabla].agregar(r)
+    except (RespaldoInvalido, UnicodeDecodeError) as e:
+        return [{"tabla": t, "error": str(e)} for t in tablas]
+    return [e.resultado() for e in estados.values()]
+
+
+def repartir(tamanos, procesos):
+    """Grupos de tablas de carga parecida (la mas grande al grupo mas liviano)."""
+    grupos = [[0, []] for _ in range(max(1, min(procesos, len(tamanos))))]
+    for tabla, n in sorted(tamanos.items(), key=lambda x: -x[1]):
+        grupo = min(grupos, key=lambda g: g[0])
+        grupo[0] += n
+        grupo[1].append(tabla)
+    return [g[1] for g in grupos if g[1]]
+
+
+def verificar_capsula(ruta, procesos=None, estricto=False):
+    fatales, advertencias = [], []
+    try:
+        raiz, en_archivo = estructura(ruta)
+    except (RespaldoInvalido, UnicodeDecodeError) as e:
+        return {"restaurable": False, "fatales": [f"Respaldo ilegible: {e}"], "advertencias": [],
+                "tablas": {}, "referencias": []}
+    for clave in ('dexie', 'localStorage'):
+        if clave not in raiz:
+            fatales.append(f"Falta '{clave}' en la raiz: restaurarCapsulaDeTiempo lo rechaza")
+    ignoradas = [t for t in en_archivo if t not in CLAVES]
+    if ignoradas:
+        advertencias.append(f"Tablas que la restauracion ignora (no existen en db.js): {ignoradas}")
+
+    # Solo las tablas presentes; las de referencia siempre existen (aunque vacias)
+    tamanos = {t: n for t, n in en_archivo.items() if t in CLAVES}
+    grupos = repartir(tamanos, procesos or os.cpu_count() or 1)
+    if len(grupos) > 1:
+        with ProcessPoolExecutor(max_workers=len(grupos)) as pool:
+            resultados = [r for parte in pool.map(verificar_grupo, [(ruta, g) for g in grupos]) for r in parte]
+    else:
+        resultados = verificar_grupo((ruta, grupos[0] if grupos else []))
+    errores = [r for r in resultados if "error" in r]
+    if errores:
+        fatales.append(f"Respaldo ilegible: {errores[0]['error']}")
+        return {"restaurable": False, "fatales": fatales, "advertencias": advertencias,
+                "tablas": {}, "referencias": []}
+
+    por_tabla = {r["tabla"]: r for r in resultados}
+    for t in {t for par in REFERENCIAS.items() for t in (par[0][0], par[1][0])} - set(por_tabla):
+        por_tabla[t] = _EstadoTabla(t).resultado()
+    tablas_rep = {}
+    for t in tamanos:
+        r = por_tabla[t]
+        tablas_rep[t] = {k: r[k] for k in ("filas", "sha256", "duplicados", "ejemplos_duplicados", "sin_clave")}
+        if r["duplicados"]:
+            fatales.append(f"{t}: {r['duplicados']} clave(s) primaria(s) repetida(s); bulkAdd abortaria "
+                           f"la restauracion (ej. {r['ejemplos_duplicados'][:5]})")
+        if r["sin_clave"]:
+            fatales.append(f"{t}: {r['sin_clave']} registro(s) sin '{CLAVES[t]}'")
+
+    integridad = []
+    eliminados = por_tabla['logs']["eliminados"]
+    for (origen, campo), (destino, _) in REFERENCIAS.items():
+        conteo = por_tabla[origen]["referencias"][campo]
+        validas = por_tabla[destino]["claves"]
+        rotas = {v: n for v, n in conteo.items()
+                 if v not in validas and not (destino == 'productos' and v in eliminados)}
+        integridad.append({"origen": f"{origen}.{campo}", "destino": destino,
+                           "filas_rotas": sum(rotas.values()), "valores_rotos": len(rotas),
+                           "ejemplos": sorted(rotas, key=lambda v: -rotas[v])[:MAX_DETALLE]})
+        if rotas:
+            msg = (f"{origen}.{campo} -> {destino}: {sum(rotas.values()):,} fila(s) apuntan a "
+                   f"{len(rotas):,} valor(es) inexistente(s)")
+            (fatales if estricto else advertencias).append(msg)
+
+    global_hash = hashlib.sha256(''.join(f"{t}:{v['sha256']}\n" for t, v in sorted(tablas_rep.items())).encode())
+    return {"restaurable": not fatales, "fatales": fatales, "advertencias": advertencias,
+            "sha256": global_hash.hexdigest(), "tablas": tablas_rep, "referencias": integridad}
+
+
+def run_tests():
+    base = {
+        "dexie": {
+            "productos": [{"id": 1, "nombre": "HARINA"}, {"id": 2, "nombre": "ARROZ"}],
+            "ventas": [
+                {"id": 10, "clienteId": "7", "corteId": "Z-000001"},   # clienteId string (parseInt)
+                {"id": 11, "clienteId": 8, "corteId": "Z-000009"},
+                {"id": 12},                                           # Turno abierto, sin cliente
+            ],
+            "clientes": json.dumps([{"id": 7, "nombre": "ANA"}]),     # String Legacy
+            "logs": [{"id": 1, "tipo": "SALIDA_VENTA", "productId": 1},
+                     {"id": 2, "tipo": "PRODUCTO_ELIMINADO", "productId": "3"},
+                     {"id": 3, "tipo": "SALIDA_VENTA", "productId": 3},
+                     {"id": 4, "tipo": "SALIDA_VENTA", "productId": 4}],
+            "cortes": [{"id": "Z-000001", "corteRef": "Z-000001"}],
+            "config": [{"key": "general", "tasa": 100}],
+            "tabla_vieja": [],
+        },
+        "localStorage": {},
+        "_meta": {"schema_version": "v2-unified"},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, 'capsula.json')
+
+        def verificar(capsula, **kw):
+            with open(ruta, 'w', encoding='utf-8') as f:
+                json.dump(capsula, f)
+            return verificar_capsula(ruta, procesos=2, **kw)
+
+        rep = verificar(base)
+        assert rep["restaurable"], rep["fatales"]
+        rotas = {r["origen"]: r["ejemplos"] for r in rep["referencias"]}
+        assert rotas == {"ventas.clienteId": [8], "ventas.corteId": ["Z-000009"], "logs.productId": [4]}, rotas
+        assert len(rep["advertencias"]) == 4  # 3 referencias + tabla ignorada
+        assert rep["tablas"]["clientes"]["filas"] == 1 and "outbox" not in rep["tablas"]
+        assert not verificar(base, estricto=True)["restaurable"]
+
+        # Mismo contenido -> mismo hash; un cambio -> otro hash solo en esa tabla
+        otra = json.loads(json.dumps(base))
+        otra["dexie"]["productos"][1]["nombre"] = "ARROZ 1KG"
+        rep2 = verificar(otra)
+        assert rep2["tablas"]["ventas"]["sha256"] == rep["tablas"]["ventas"]["sha256"]
+        assert rep2["tablas"]["productos"]["sha256"] != rep["tablas"]["productos"]["sha256"]
+
+        # PK repetida (1 y "1" son claves distintas en IndexedDB) y corte sin id
+        otra["dexie"]["ventas"] += [{"id": 11}, {"id": "10"}]
+        otra["dexie"]["cortes"].append({"corteRef": "Z-000002"})
+        del otra["localStorage"]
+        rep3 = verificar(otra)
+        assert not rep3["restaurable"] and len(rep3["fatales"]) == 3, rep3["fatales"]
+        assert rep3["tablas"]["ventas"]["ejemplos_duplicados"] == [11]
+
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write('{"dexie": {"ventas": [{"id": 1}, {"id": ')
+        assert not verificar_capsula(ruta, procesos=1)["restaurable"]
+    print("[OK] PRUEBAS EXITOSAS")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica una Capsula de Tiempo antes de restaurarla")
+    parser.add_argument("respaldo")
+    parser.add_argument("--reporte", default=REPORTE_DEFAULT)
+    parser.add_argument("--procesos", type=int, default=None, help="Default: uno por CPU")
+    parser.add_argument("--estricto", action="store_true", help="Referencias rotas tambien bloquean")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    rep = verificar_capsula(args.respaldo, args.procesos, args.estricto)
+    os.makedirs(os.path.dirname(os.path.abspath(args.reporte)), exist_ok=True)
+    with open(args.reporte, 'w', encoding='utf-8') as f:
+        json.dump(rep, f, indent=2, ensure_ascii=False, default=str)
+
+    print(f"Verificado en {time.perf_counter() - t0:.1f}s -> {args.reporte}")
+    for t, info in rep["tablas"].items():
+        print(f"  - {t}: {info['filas']:,} filas | sha256 {info['sha256'][:16]}")
+    for msg in rep["advertencias"]:
+        print(f"[ADVERTENCIA] {msg}")
+    for msg in rep["fatales"]:
+        print(f"[FATAL] {msg}")
+    print("[OK] RESTAURABLE" if rep["restaurable"] else "[ERROR] NO RESTAURAR")
+    exit(0 if rep["restaurable"] else 1)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        run_tests()
+        exit(0)
+    main()